@@ -0,0 +1,33 @@
+"""
+pytest的公共fixture：示例程序与由自带文法构造的Parser
+测试中的文件都用绝对路径，与运行pytest时的当前目录无关
+"""
+
+import contextlib
+import io
+import os
+
+import pytest
+
+from myParser import Parser
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR = os.path.join(ROOT, "mytest.cfg")
+SAMPLE = os.path.join(ROOT, "mytest.c")
+
+
+def quietly(func, *args, **kwargs):
+    """调用func并丢弃其输出（构造分析表与分析时的诊断信息）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def parser():
+    return quietly(Parser, GRAMMAR)
+
+
+@pytest.fixture(scope="session")
+def sample_lines():
+    with open(SAMPLE, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
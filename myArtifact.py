@@ -0,0 +1,108 @@
+"""
+中间产物（lexer_out.json、parser_out.json、quaternation_out.json、code.asm等）的写出层
+各阶段只调用sink的dump/dumpRecords/dumpText，由sink决定是否写出以及写出的格式：
+- ArtifactSink: 不写出（默认）
+- JsonSink: 紧凑JSON写入指定目录
+- NdjsonSink: 序列按记录逐行流式写出为NDJSON
+- UnitDirectorySink: 每个编译单元单独一个子目录
+"""
+
+import json
+import os
+from enum import Enum
+
+
+def to_json_value(obj):
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, "toDict"):
+        return obj.toDict()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+class ArtifactSink(object):
+    '''不写出任何中间产物'''
+
+    def beginUnit(self, name=None):
+        '''开始一个新的编译单元'''
+        pass
+
+    def dump(self, name, data):
+        '''写出一个可JSON序列化的对象'''
+        pass
+
+    def dumpRecords(self, name, records):
+        '''写出一个序列，records可以是迭代器'''
+        pass
+
+    def dumpText(self, name, lines):
+        '''写出文本行'''
+        pass
+
+
+class JsonSink(ArtifactSink):
+    '''以紧凑JSON（无缩进）写入directory目录'''
+
+    def __init__(self, directory="."):
+        self.directory = directory
+
+    def path(self, name):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, name)
+
+    def dump(self, name, data):
+        with open(self.path(name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"), default=to_json_value)
+
+    def dumpRecords(self, name, records):
+        self.dump(name, list(records))
+
+    def dumpText(self, name, lines):
+        with open(self.path(name), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+
+
+class NdjsonSink(JsonSink):
+    '''序列逐条写出，每行一个JSON记录，不在内存中拼出整个文件；文件扩展名为.ndjson'''
+
+    def path(self, name):
+        root, ext = os.path.splitext(name)
+        return super().path(root + ".ndjson" if ext == ".json" else name)
+
+    def dump(self, name, data):
+        self.dumpRecords(name, [data])
+
+    def dumpRecords(self, name, records):
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=to_json_value)
+        with open(self.path(name), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(encoder.encode(record))
+                f.write("\n")
+
+
+class UnitDirectorySink(JsonSink):
+    '''每个编译单元的产物写入root下单独的子目录，未指定名字时按unit_0001、unit_0002……编号'''
+
+    def __init__(self, root="artifacts"):
+        super().__init__(os.path.join(root, "unit_0000"))
+        self.root = root
+        self.count = 0
+
+    def beginUnit(self, name=None):
+        self.count += 1
+        self.directory = os.path.join(self.root, name or f"unit_{self.count:04d}")
+
+
+ARTIFACT_MODES = {
+    "disabled": ArtifactSink,
+    "json": JsonSink,
+    "ndjson": NdjsonSink,
+    "unit": UnitDirectorySink,
+}
+
+
+def makeSink(mode="disabled", *args):
+    '''根据模式名创建sink，其余参数为写出目录'''
+    if mode not in ARTIFACT_MODES:
+        raise ValueError(f"Unknown artifact mode: {mode}")
+    return ARTIFACT_MODES[mode](*args)
@@ -0,0 +1,734 @@
+"""
+词法分析器与语法分析器的性能对比（结果的一致性由test_lexer.py、test_parser.py与test_incremental.py检查）
+
+用法：
+    python myBenchmark.py lexer [重复次数]      各backend的吞吐量对比
+    python myBenchmark.py tokens [token数]      TokenStore与逐token dict的内存、速度对比
+    python myBenchmark.py terminal [token数]    token到终结符id映射的单token耗时对比
+    python myBenchmark.py incremental [行数]    单字符编辑后增量重新扫描与完整扫描的耗时对比
+    python myBenchmark.py construct [次数]      Lexer首次构造与之后构造的耗时
+    python myBenchmark.py automaton [行数]      关键字状态/关键字查表两种自动机的状态数与吞吐量
+    python myBenchmark.py parser [层数]         在自带文法与合成文法（层数为表达式优先级层数）上测量分析表的构造时间
+    python myBenchmark.py cache                 分析表重新构造与从磁盘缓存载入的耗时对比
+    python myBenchmark.py lalr                  规范LR(1)与LALR(1)分析表的状态数、内存与构造时间对比
+    python myBenchmark.py parse [函数个数]      分析表的内存占用与语法分析的步数/秒
+    python myBenchmark.py trace                 不同输入规模下关闭/开启分析过程记录的分析耗时，以及按页取行的耗时
+    python myBenchmark.py cst                   语法树arena与原先逐层拼接content的dict格式的内存、分析耗时与转换耗时
+    python myBenchmark.py modes [规模]          在生成的语料上对比recognize/semantic/full三种分析模式（及full加规约过程记录）
+                                                的tokens/s与峰值内存
+    python myBenchmark.py push [函数个数]       先扫描整个文件再getParse，与边读文件边扫描边PushParser.feed两种方式的耗时与峰值内存
+    python myBenchmark.py parallel [副本数]     用1/2/4/8个进程构造合成文法（表达式层级副本数，默认20）的项目集族
+    python myBenchmark.py frozen                由文法构造、从磁盘缓存载入与导入生成的分析表模块三种启动方式的耗时
+    python myBenchmark.py reparse [函数个数]    编辑一个函数后增量重新分析（含目标代码生成）与整个重新分析的耗时，
+                                                函数个数为最大的规模（默认320）
+    python myBenchmark.py corpus [规模] [backend] [结果文件]
+                                                在生成的语料上测量Lexer.getLex的tokens/s、MB/s与峰值内存，
+                                                结果追加到结果文件（默认benchmark_results.json）并与上一次同配置的结果对比
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import py_compile
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from myBlockDivider import BlockDivider
+from myCodeGenerator import CodeGenerator, IncrementalCodeGenerator
+from myLexer import Lexer, IncrementalLexer, DFA, CompiledDFA
+from myParser import Parser, PushParser, IncrementalParser, TABLE_GENERATOR_VERSION
+from mySourceGenerator import SourceGenerator, makeCorpus
+from myTableCache import ParserTableCache
+from tokenType import tokenKeywords, tokenType_to_terminal
+
+def load_sample(filename="mytest.c"):
+    with open(filename, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def bench_lexer(lines, backends=Lexer.BACKENDS, rounds=3):
+    """返回{backend: (token数, 最快一轮的秒数)}"""
+    results = {}
+    for backend in backends:
+        lexer = Lexer(backend)
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            tokens, _ = lexer.scan(lines)
+            best = min(best, time.perf_counter() - start)
+        results[backend] = (len(tokens), best)
+    return results
+
+
+def measure(func):
+    """返回(func的结果, 秒数, 结果仍被引用时占用的字节数)；计时与内存统计分开进行，避免tracemalloc影响计时"""
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, size
+
+
+def bench_tokens(count):
+    """对约count个token的输入比较紧凑的TokenStore与原先逐token的dict表示"""
+    sample = load_sample()
+    per_copy = len(Lexer().scan(sample)[0]) - 1
+    lines = sample * max(1, count // per_copy)
+    lexer = Lexer()
+    store, store_seconds, store_size = measure(lambda: lexer.scan(lines)[0])
+    dicts, dict_seconds, dict_size = measure(lambda: [token.toDict() for token in store])
+    n = len(store)
+    print(f"{n} tokens")
+    print(f"{'representation':<16}{'bytes/token':>12}{'tokens/s':>12}")
+    print(f"{'TokenStore':<16}{store_size / n:>12.1f}{n / store_seconds:>12.0f}")
+    # dict表示的时间 = 扫描 + 逐个构造dict（原实现在扫描过程中构造）
+    print(f"{'dict per token':<16}{dict_size / n:>12.1f}{n / (store_seconds + dict_seconds):>12.0f}")
+
+
+def bench_terminal(count):
+    """比较原先每个token的两次线性查找（tokenType_to_terminal + get_id_by_str）与词法分析时标注的终结符id"""
+    sample = load_sample()
+    tokens = list(Lexer().scan(sample * max(1, count // 100))[0])
+    parser = Parser()
+
+    def lookup():
+        for token in tokens:
+            parser.get_id_by_str(tokenType_to_terminal(token.prop))
+
+    def stamped():
+        for token in tokens:
+            token.terminal
+
+    print(f"{len(tokens)} tokens")
+    for name, func in (("lookup", lookup), ("stamped", stamped)):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:<10}{seconds / len(tokens) * 1e9:>10.1f} ns/token")
+
+
+def make_word_lines(count, words, seed=0):
+    """生成count行由words中的单词与少量符号组成的源代码"""
+    rng = random.Random(seed)
+    symbols = ["=", "(", ")", "{", "}", ";", ",", "+", "->"]
+    return [" ".join(rng.choice(words) if rng.random() < 0.8 else rng.choice(symbols) for _ in range(10))
+            for _ in range(count)]
+
+
+def bench_automaton(count):
+    """比较自动机中包含关键字状态（"compiled"）与只用一个标识符状态再查关键字表（"keyword"）两种方式"""
+    print(f"{'automaton':<20}{'states':>8}{'minimized':>11}")
+    for name, keywords in (("keyword states", True), ("identifier + lookup", False)):
+        dfa = DFA(keywords)
+        print(f"{name:<20}{CompiledDFA(dfa).size:>8}{CompiledDFA(dfa, minimize=True).size:>11}")
+
+    rng = random.Random(1)
+    # 与关键字共享前缀的长标识符，在关键字状态中多走几步
+    identifiers = [w + rng.choice(["", "_", "x", "1"]) + "".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 8)))
+                   for w in list(tokenKeywords) * 4]
+    inputs = {
+        "keyword-dense": make_word_lines(count, list(tokenKeywords)),
+        "identifier-dense": make_word_lines(count, identifiers),
+    }
+    print(f"{'input':<18}{'backend':<10}{'tokens':>10}{'tokens/s':>12}{'MB/s':>8}")
+    for name, lines in inputs.items():
+        size = sum(len(line) + 1 for line in lines)
+        for backend, (tokens, seconds) in bench_lexer(lines, ("compiled", "keyword", "regex")).items():
+            print(f"{name:<18}{backend:<10}{tokens:>10}{tokens / seconds:>12.0f}{size / seconds / 1e6:>8.2f}")
+
+
+def bench_corpus(scale=1, backend="compiled", rounds=3):
+    """对makeCorpus生成的每份语料测量Lexer.getLex，返回{名字: 结果dict}"""
+    lexer = Lexer(backend)
+    results = {}
+    for name, lines in makeCorpus(scale).items():
+        size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+        seconds = min(timeit.repeat(lambda: lexer.getLex(lines), number=1, repeat=rounds))
+        # 峰值内存单独测量，避免tracemalloc影响计时
+        tracemalloc.start()
+        tokens, _ = lexer.getLex(lines)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            "lines": len(lines),
+            "bytes": size,
+            "tokens": len(tokens),
+            "seconds": seconds,
+            "tokens_per_second": len(tokens) / seconds,
+            "mb_per_second": size / seconds / 1e6,
+            "peak_bytes": peak,
+        }
+    return results
+
+
+def save_corpus_results(path, run):
+    """将本次结果追加到path中的运行记录，返回之前最后一次配置（规模、backend）相同的记录"""
+    runs = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            runs = json.load(f)
+    previous = None
+    for old in runs:
+        if old["scale"] == run["scale"] and old["backend"] == run["backend"]:
+            previous = old
+    runs.append(run)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=2)
+    return previous
+
+
+# 合成文法中各优先级层使用的二元运算符，每个运算符只出现在一层，文法无冲突
+SYNTHETIC_OPERATORS = ["==", "!=", "<", "<=", ">", ">=", "<<", ">>", "+", "-", "*", "/", "%", "..", ".", ":", "->",
+                       "+=", "-=", "*=", "/=", "%=", ">>=", "<<="]
+
+
+def make_synthetic_grammar(levels, copies=1):
+    """
+    生成一个有levels层左递归表达式优先级的文法，状态数随层数增长
+    copies大于1时再加入copies - 1套互不相同的表达式层级（由"loop mut ... mut"引导的语句使用），状态数约为copies倍
+    """
+    levels = min(levels, len(SYNTHETIC_OPERATORS))
+    lines = [
+        "Program -> DeclList | None",
+        "DeclList -> Decl DeclList | Decl",
+        "Decl -> fn identifier ( ) Block",
+        "Block -> { StmtList }",
+        "StmtList -> Stmt StmtList | None",
+        "Stmt -> let identifier = E0 ; | identifier = E0 ; | if E0 Block | if E0 Block else Block"
+        " | while E0 Block | return E0 ; | Block | ;",
+    ]
+    for k in range(levels):
+        lines.append(f"E{k} -> E{k} {SYNTHETIC_OPERATORS[k]} E{k + 1} | E{k + 1}")
+    lines.append(f"E{levels} -> integer_constant | identifier | ( E0 ) | identifier ( ArgList )")
+    for c in range(1, copies):
+        lines.append("Stmt -> loop" + " mut" * c + f" C{c}E0 ;")
+        for k in range(levels):
+            lines.append(f"C{c}E{k} -> C{c}E{k} {SYNTHETIC_OPERATORS[k]} C{c}E{k + 1} | C{c}E{k + 1}")
+        lines.append(f"C{c}E{levels} -> integer_constant | identifier | ( C{c}E0 )")
+    lines += ["ArgList -> E0 ArgTail | None", "ArgTail -> , E0 ArgTail | None", "None -> epsilon"]
+    return "\n".join(lines) + "\n"
+
+
+def bench_parser_tables(grammars, rounds=3):
+    """返回{文法: (状态数, 最快一轮构造的秒数)}，构造过程中的输出被丢弃"""
+    results = {}
+    for name, filename in grammars.items():
+        best = float("inf")
+        for _ in range(rounds):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                parser = Parser(filename)
+                best = min(best, time.perf_counter() - start)
+        results[name] = (len(parser.closures), best)
+    return results
+
+
+def bench_table_modes(filename, rounds=3):
+    """返回{table_mode: (状态数, ACTION/GOTO表项数, 构造后保留的字节数, 最快一轮的秒数, 新增冲突数)}"""
+    results = {}
+    for mode in Parser.TABLE_MODES:
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser, seconds, size = measure(lambda: Parser(filename, table_mode=mode))
+            seconds = min([seconds] + timeit.repeat(lambda: Parser(filename, table_mode=mode), number=1, repeat=rounds - 1))
+        entries = sum(map(len, parser.action_table)) + sum(map(len, parser.goto_table))
+        results[mode] = (len(parser.closures), entries, size, seconds, len(parser.lalr_conflicts))
+    return results
+
+
+def deep_sizeof(obj):
+    """obj及其包含的list、tuple、dict、set中所有对象占用的字节数，共享的对象只计一次；非递归，可用于很深的语法树"""
+    seen = set()
+    size = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+    return size
+
+
+def bench_parse(functions, rounds=3, trace=False):
+    """在生成的程序上测量getParse，返回(parser, token数, 分析步数, 最快一轮的秒数)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+    lines = list(SourceGenerator(functions=functions, seed=0).iterLines())
+    tokens = Lexer().scan(lines)[0]
+    best = float("inf")
+    for _ in range(rounds):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parser.getParse(tokens, trace=trace)
+            best = min(best, time.perf_counter() - start)
+    return parser, len(tokens), parser.parse_steps, best
+
+
+def bench_trace(function_counts=(10, 20, 40, 80)):
+    """
+    不同输入规模下关闭/开启分析过程记录时getParse的耗时，以及记录的内存与按页取行的耗时
+    返回[(token数, 关闭记录的秒数, 开启记录的秒数, 记录的字节数, 取第一页的秒数, 取最后一页的秒数)]
+    """
+    results = []
+    for functions in function_counts:
+        _, tokens, _, off = bench_parse(functions)
+        parser, _, steps, on = bench_parse(functions, trace=True)
+        process = parser.parse_process_display
+        size = sum(len(a) * a.itemsize for a in (process.action, process.symbol, process.state, process.index))
+        first = min(timeit.repeat(lambda: process[1:201], number=1, repeat=3))
+        last = min(timeit.repeat(lambda: process[len(process) - 200:], number=1, repeat=3))
+        results.append((tokens, off, on, size, first, last))
+    return results
+
+
+def bench_parse_modes(scale=1, rounds=3):
+    """
+    对makeCorpus生成的每份语料测量各分析模式下的getParse，full模式另测开启规约过程记录（界面的用法）
+    返回{语料名: {模式: 结果dict}}
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+    modes = [(mode, mode, False) for mode in Parser.PARSE_MODES] + [("full+trace", "full", True)]
+    results = {}
+    for name, lines in makeCorpus(scale).items():
+        tokens = Lexer().scan(lines)[0]
+        results[name] = {}
+        for label, mode, trace in modes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds = min(timeit.repeat(lambda: parser.getParse(tokens, trace=trace, mode=mode), number=1, repeat=rounds))
+                # 峰值内存单独测量，避免tracemalloc影响计时
+                tracemalloc.start()
+                parser.getParse(tokens, trace=trace, mode=mode)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results[name][label] = {
+                "tokens": len(tokens),
+                "seconds": seconds,
+                "tokens_per_second": len(tokens) / seconds,
+                "peak_bytes": peak,
+            }
+    return results
+
+
+def bench_push(functions=400, modes=("recognize", "full")):
+    """
+    把生成的程序写入临时文件，对比两种方式：读入整个文件、扫描为TokenStore后getParse；
+    用Lexer.iterLex按块读文件，每产生一个token就PushParser.feed
+    返回{(模式, 方式): (秒数, 峰值内存)}，以及源文件的字节数
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+    fd, path = tempfile.mkstemp(suffix=".c")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(line + "\n" for line in SourceGenerator(functions=functions, seed=0).iterLines())
+
+    def whole(mode):
+        with open(path, encoding="utf-8") as f:
+            tokens = Lexer().scan(f.read().splitlines())[0]
+        return parser.getParse(tokens, mode=mode)
+
+    def stream(mode):
+        push = PushParser(parser, mode=mode)
+        with open(path, encoding="utf-8") as f:
+            for token in Lexer().iterLex(f):
+                if push.feed(token):
+                    break
+        return push.finish()
+
+    results = {}
+    try:
+        for mode in modes:
+            for name, func in (("whole", whole), ("stream", stream)):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds = min(timeit.repeat(lambda: func(mode), number=1, repeat=3))
+                    tracemalloc.start()
+                    func(mode)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                results[(mode, name)] = (seconds, peak)
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    return results, size
+
+
+def make_nested_source(depth):
+    """一个表达式嵌套depth层括号的程序，原先每层结点都复制一遍内层的content"""
+    return ["fn main() {", "    let mut a: i32 = " + "(" * depth + "1" + " + 1)" * depth + ";", "}"]
+
+
+def bench_cst(function_counts=(20, 80), depths=(25, 50, 100)):
+    """
+    在生成的程序与深层嵌套的表达式上测量getParse
+    返回[(输入, token数, 分析秒数, 分析时的峰值内存, arena字节数, dict格式的字节数, toDict秒数)]
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+    inputs = [(f"{functions} functions", list(SourceGenerator(functions=functions, seed=0).iterLines()))
+              for functions in function_counts]
+    inputs += [(f"depth {depth}", make_nested_source(depth)) for depth in depths]
+    results = []
+    for name, lines in inputs:
+        tokens = Lexer().scan(lines)[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = min(timeit.repeat(lambda: parser.getParse(tokens), number=1, repeat=3))
+            tracemalloc.start()
+            tree = parser.getParse(tokens)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        convert = min(timeit.repeat(tree.toDict, number=1, repeat=3))
+        results.append((name, len(tokens), seconds, peak, parser.cst.nbytes(), deep_sizeof(tree.toDict()), convert))
+    return results
+
+
+def bench_parallel(path, worker_counts=(1, 2, 4, 8)):
+    """
+    返回(状态数, {进程数: (构造项目集族的秒数, 完整构造的秒数)})，1个进程即串行构造
+    """
+    results = {}
+    for workers in worker_counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parser = Parser(path, workers=workers)
+            seconds = time.perf_counter() - start
+        results[workers] = (parser.phase_stats["find_gos"]["seconds"], seconds)
+    return len(parser.closures), results
+
+
+def bench_frozen(directory, rounds=5):
+    """
+    在directory中生成分析表模块，返回{启动方式: 最快一轮的毫秒数}
+    导入时间在子进程中测量（含解释器已缓存的.pyc）
+    """
+    path = os.path.join(directory, "bench_tables.py")
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+        parser.write_tables_module(path)
+    # 预先编译为.pyc，与正常环境中第二次及之后的导入相同（即使设置了PYTHONDONTWRITEBYTECODE）
+    py_compile.compile(path, doraise=True)
+    sys.path.insert(0, directory)
+    try:
+        module = importlib.import_module("bench_tables")
+    finally:
+        sys.path.remove(directory)
+    cache = ParserTableCache(directory)
+    with contextlib.redirect_stdout(io.StringIO()):
+        Parser(cache=cache)
+        results = {
+            "build": min(timeit.repeat(Parser, number=1, repeat=3)),
+            "cache": min(timeit.repeat(lambda: Parser(cache=cache), number=1, repeat=rounds)),
+            "module": min(timeit.repeat(lambda: Parser(tables_module=module), number=1, repeat=rounds)),
+        }
+    # 在新进程中导入模块，array等依赖先导入，只计模块本身
+    code = "import sys, time, array; s = time.perf_counter(); import bench_tables; print(time.perf_counter() - s)"
+    imports = []
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True, check=True)
+        imports.append(float(output.stdout))
+    results["import"] = min(imports)
+    return {name: seconds * 1e3 for name, seconds in results.items()}
+
+
+def bench_incremental(count):
+    """
+    在约count行的源代码中部做一次单字符编辑，比较增量重新扫描与完整扫描
+    增量一侧的耗时包括取得TokenStore（getTokens），以及界面传入整个源代码时update的比较
+    """
+    sample = load_sample()
+    lines = sample * max(1, count // len(sample))
+    lexer = Lexer()
+    full = min(timeit.repeat(lambda: lexer.scan(lines), number=1, repeat=3))
+
+    incremental = IncrementalLexer(lexer)
+    start = time.perf_counter()
+    incremental.reset("\n".join(lines))
+    incremental.getTokens()
+    initial = time.perf_counter() - start
+    middle = len(lines) // 2
+    edited = [lines[middle] + " ", lines[middle]]
+    start = time.perf_counter()
+    for k in range(100):
+        relexed = incremental.edit(middle, middle + 1, [edited[k % 2]])
+        incremental.getTokens()
+    edit = (time.perf_counter() - start) / 100
+
+    # 插入与删除一行，其后各行的行号都要改变
+    start = time.perf_counter()
+    for k in range(100):
+        if k % 2 == 0:
+            incremental.edit(middle, middle, ["let x: i32 = 1;"])
+        else:
+            incremental.edit(middle, middle + 1, [])
+        incremental.getTokens()
+    insert = (time.perf_counter() - start) / 100
+
+    texts = ["\n".join(lines[:middle] + [line] + lines[middle + 1:]) for line in edited]
+    incremental.update(texts[1])
+    start = time.perf_counter()
+    for k in range(100):
+        incremental.update(texts[k % 2])
+        incremental.getTokens()
+    update = (time.perf_counter() - start) / 100
+
+    # 打开一个未闭合的块注释，之后所有行的注释状态都会改变
+    comment = incremental.edit(middle, middle, ["/*"])
+    print(f"{len(lines)} lines")
+    print(f"full scan                      {full * 1e3:>10.3f} ms")
+    print(f"first reset + getTokens        {initial * 1e3:>10.3f} ms")
+    print(f"one-char edit + getTokens      {edit * 1e3:>10.3f} ms  ({relexed} line relexed)")
+    print(f"insert/delete line + getTokens {insert * 1e3:>10.3f} ms")
+    print(f"update(whole text) + getTokens {update * 1e3:>10.3f} ms")
+    print(f"unclosed '/*' edit             relexed {comment} lines")
+
+
+def bench_reparse(function_counts=(20, 80, 320), edits=20):
+    """
+    界面的用法（full模式并记录规约过程，再生成目标代码）：在生成的程序中部的一个函数里反复修改一个数字，
+    比较IncrementalParser + IncrementalCodeGenerator与getParse + BlockDivider + CodeGenerator的单次耗时
+    返回[(函数个数, token数, 被编辑函数的token数, 整个重新分析的秒数, 增量分析的秒数, 复用的函数数, 重新分析的函数数)]
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser()
+
+    def whole(tokens):
+        parser.getParse(tokens, trace=True)
+        semantic = parser.semantic
+        blockDivider = BlockDivider(semantic.quaternion_table)
+        blockDivider.computeBlocks(semantic.getFuncTable())
+        return CodeGenerator(blockDivider.func_blocks, semantic.process_table, semantic.words_table).getObjectCode()
+
+    results = []
+    for functions in function_counts:
+        lines = list(SourceGenerator(functions=functions, seed=0).iterLines())
+        starts = [index for index, line in enumerate(lines) if line.startswith("fn ")]
+        first = starts[len(starts) // 2]
+        last = starts[len(starts) // 2 + 1] if len(starts) // 2 + 1 < len(starts) else len(lines)
+        row = next(index for index in range(first + 1, last) if re.search(r"\b\d+\b", lines[index]))
+        original = lines[row]
+        changed = re.sub(r"\b\d+\b", lambda m: str(int(m.group()) + 1), original, count=1)
+        lexer = IncrementalLexer(Lexer())
+        incremental = IncrementalParser(parser)
+        generator = IncrementalCodeGenerator()
+        lexer.update("\n".join(lines))
+        with contextlib.redirect_stdout(io.StringIO()):
+            incremental.parse(lexer.getTokens(), trace=True)
+            generator.getObjectCode(parser.semantic, incremental.units)
+        inc_seconds = []
+        whole_seconds = []
+        for k in range(edits):
+            lines[row] = changed if k % 2 == 0 else original
+            lexer.update("\n".join(lines))
+            tokens = lexer.getTokens()
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                incremental.parse(tokens, trace=True)
+                generator.getObjectCode(parser.semantic, incremental.units)
+                inc_seconds.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                whole(tokens)
+                whole_seconds.append(time.perf_counter() - start)
+        edited = incremental.units[len(starts) // 2].token_count
+        results.append((functions, len(tokens), edited, min(whole_seconds), min(inc_seconds),
+                        incremental.reused, incremental.reparsed))
+    return results
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "lexer"
+    if command == "lexer":
+        repeat = int(argv[2]) if len(argv) > 2 else 500
+        lines = load_sample() * repeat
+        size = sum(len(line) + 1 for line in lines)
+        results = bench_lexer(lines)
+        baseline = results["dfa"][1]
+        print(f"{'backend':<10}{'tokens':>10}{'seconds':>10}{'tokens/s':>12}{'MB/s':>8}{'speedup':>9}")
+        for backend, (count, seconds) in results.items():
+            print(
+                f"{backend:<10}{count:>10}{seconds:>10.3f}{count / seconds:>12.0f}"
+                f"{size / seconds / 1e6:>8.2f}{baseline / seconds:>8.1f}x"
+            )
+    elif command == "construct":
+        # 首次构造包含共享自动机的构建，之后的构造只引用它
+        start = time.perf_counter()
+        Lexer()
+        first = time.perf_counter() - start
+        repeat = int(argv[2]) if len(argv) > 2 else 1000
+        seconds = timeit.timeit(Lexer, number=repeat) / repeat
+        print(f"first Lexer()  {first * 1e3:>10.3f} ms")
+        print(f"later Lexer()  {seconds * 1e6:>10.3f} us")
+    elif command == "automaton":
+        bench_automaton(int(argv[2]) if len(argv) > 2 else 20000)
+    elif command == "parser":
+        levels = int(argv[2]) if len(argv) > 2 else 16
+        fd, path = tempfile.mkstemp(suffix=".cfg")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(make_synthetic_grammar(levels))
+            grammars = {"mytest.cfg": "mytest.cfg", "mytest_scan_once.cfg": "mytest_scan_once.cfg",
+                        f"synthetic({levels})": path}
+            results = bench_parser_tables(grammars)
+        finally:
+            os.remove(path)
+        print(f"{'grammar':<22}{'states':>8}{'seconds':>10}")
+        for name, (states, seconds) in results.items():
+            print(f"{name:<22}{states:>8}{seconds:>10.3f}")
+    elif command == "cache":
+        directory = tempfile.mkdtemp()
+        try:
+            cache = ParserTableCache(directory)
+            print(f"{'grammar':<22}{'mode':<7}{'build ms':>10}{'load ms':>10}{'file KB':>9}")
+            for filename in ("mytest.cfg", "mytest_scan_once.cfg"):
+                for mode in Parser.TABLE_MODES:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        build = min(timeit.repeat(lambda: Parser(filename, table_mode=mode), number=1, repeat=3))
+                        Parser(filename, table_mode=mode, cache=cache)
+                        load = min(timeit.repeat(lambda: Parser(filename, table_mode=mode, cache=cache), number=1, repeat=5))
+                    key = cache.key(filename, Parser.terminal_symbols, mode, TABLE_GENERATOR_VERSION)
+                    size = os.path.getsize(cache.path(filename, mode, key))
+                    print(f"{filename:<22}{mode:<7}{build * 1e3:>10.1f}{load * 1e3:>10.2f}{size / 1024:>9.1f}")
+        finally:
+            shutil.rmtree(directory)
+    elif command == "lalr":
+        print(f"{'grammar':<22}{'mode':<7}{'states':>8}{'entries':>9}{'KB':>9}{'seconds':>9}{'new r/r':>9}")
+        for filename in ("mytest.cfg", "mytest_scan_once.cfg"):
+            for mode, (states, entries, size, seconds, conflicts) in bench_table_modes(filename).items():
+                print(f"{filename:<22}{mode:<7}{states:>8}{entries:>9}{size / 1024:>9.0f}{seconds:>9.3f}{conflicts:>9}")
+    elif command == "parse":
+        parser, tokens, steps, seconds = bench_parse(int(argv[2]) if len(argv) > 2 else 20)
+        dict_size = deep_sizeof(parser.action_table) + deep_sizeof(parser.goto_table)
+        print(f"action_table + goto_table (dicts)   {dict_size / 1024:>8.1f} KB")
+        print(f"PackedTables (arrays)               {parser.packed.nbytes() / 1024:>8.1f} KB")
+        # 单次ACTION查表：原先的dict + 动作列表，与压缩表
+        pairs = [(state, t) for state, actions in enumerate(parser.action_table) for t in actions] * 20
+        action_table, packed = parser.action_table, parser.packed
+
+        def lookup_dicts():
+            for state, t in pairs:
+                action_table[state][t][0]
+
+        def lookup_packed():
+            base, check, value, default = packed.action_base, packed.action_check, packed.action_value, packed.action_default
+            for state, t in pairs:
+                i = base[state] + t
+                value[i] if check[i] == state else default[state]
+
+        for name, func in (("dict lookup", lookup_dicts), ("packed lookup", lookup_packed)):
+            ns = min(timeit.repeat(func, number=1, repeat=5)) / len(pairs) * 1e9
+            print(f"{name:<36}{ns:>8.1f} ns")
+        print(f"{tokens} tokens, {steps} steps, {seconds:.3f} s, {steps / seconds:.0f} steps/s")
+    elif command == "trace":
+        print(f"{'tokens':>8}{'off s':>9}{'us/token':>10}{'on s':>9}{'trace KB':>10}{'page 1 ms':>11}{'last page ms':>14}")
+        for tokens, off, on, size, first, last in bench_trace():
+            print(
+                f"{tokens:>8}{off:>9.3f}{off / tokens * 1e6:>10.1f}{on:>9.3f}{size / 1024:>10.0f}"
+                f"{first * 1e3:>11.1f}{last * 1e3:>14.1f}"
+            )
+    elif command == "cst":
+        print(f"{'input':<14}{'tokens':>8}{'parse s':>9}{'peak KB':>9}{'arena KB':>10}{'dict KB':>9}{'toDict ms':>11}")
+        for name, tokens, seconds, peak, arena, size, convert in bench_cst():
+            print(
+                f"{name:<14}{tokens:>8}{seconds:>9.3f}{peak / 1024:>9.0f}{arena / 1024:>10.1f}{size / 1024:>9.0f}"
+                f"{convert * 1e3:>11.1f}"
+            )
+    elif command == "modes":
+        results = bench_parse_modes(int(argv[2]) if len(argv) > 2 else 1)
+        print(f"{'corpus':<18}{'mode':<12}{'tokens':>8}{'seconds':>9}{'tokens/s':>10}{'peak MB':>9}{'vs full':>9}")
+        for name, modes in results.items():
+            for label, r in modes.items():
+                print(
+                    f"{name:<18}{label:<12}{r['tokens']:>8}{r['seconds']:>9.3f}{r['tokens_per_second']:>10.0f}"
+                    f"{r['peak_bytes'] / 1e6:>9.2f}{modes['full']['seconds'] / r['seconds']:>8.2f}x"
+                )
+    elif command == "push":
+        results, size = bench_push(int(argv[2]) if len(argv) > 2 else 400)
+        print(f"source {size / 1e6:.2f} MB")
+        print(f"{'mode':<12}{'input':<8}{'seconds':>9}{'peak MB':>9}")
+        for (mode, name), (seconds, peak) in results.items():
+            print(f"{mode:<12}{name:<8}{seconds:>9.3f}{peak / 1e6:>9.2f}")
+    elif command == "parallel":
+        copies = int(argv[2]) if len(argv) > 2 else 20
+        fd, path = tempfile.mkstemp(suffix=".cfg")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(make_synthetic_grammar(len(SYNTHETIC_OPERATORS), copies))
+            states, results = bench_parallel(path)
+        finally:
+            os.remove(path)
+        print(f"synthetic grammar, {copies} copies: {states} states, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8}{'find_gos s':>12}{'total s':>10}{'speedup':>9}")
+        for workers, (gos, total) in results.items():
+            print(f"{workers:>8}{gos:>12.2f}{total:>10.2f}{results[1][0] / gos:>8.2f}x")
+    elif command == "frozen":
+        directory = tempfile.mkdtemp()
+        try:
+            results = bench_frozen(directory)
+        finally:
+            shutil.rmtree(directory)
+        labels = {
+            "build": "Parser() from mytest.cfg",
+            "cache": "Parser(cache=...) from disk cache",
+            "module": "Parser(tables_module=...)",
+            "import": "import tables module (fresh process)",
+        }
+        for name, ms in results.items():
+            print(f"{labels[name]:<40}{ms:>10.2f} ms")
+    elif command == "reparse":
+        largest = int(argv[2]) if len(argv) > 2 else 320
+        counts = sorted({max(1, largest // 16), max(1, largest // 4), largest})
+        print(f"{'functions':>10}{'tokens':>8}{'edited':>8}{'whole ms':>10}{'incr ms':>9}{'speedup':>9}{'reused':>8}{'reparsed':>9}")
+        for functions, tokens, edited, whole, incremental, reused, reparsed in bench_reparse(counts):
+            print(
+                f"{functions:>10}{tokens:>8}{edited:>8}{whole * 1e3:>10.1f}{incremental * 1e3:>9.2f}"
+                f"{whole / incremental:>8.1f}x{reused:>8}{reparsed:>9}"
+            )
+    elif command == "corpus":
+        scale = int(argv[2]) if len(argv) > 2 else 1
+        backend = argv[3] if len(argv) > 3 else "compiled"
+        path = argv[4] if len(argv) > 4 else "benchmark_results.json"
+        run = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "scale": scale,
+            "backend": backend,
+            "results": bench_corpus(scale, backend),
+        }
+        previous = save_corpus_results(path, run)
+        print(f"{'corpus':<18}{'tokens':>10}{'MB':>8}{'tokens/s':>12}{'MB/s':>8}{'peak MB':>9}{'vs last':>9}")
+        for name, r in run["results"].items():
+            change = ""
+            if previous is not None and name in previous["results"]:
+                change = f"{r['tokens_per_second'] / previous['results'][name]['tokens_per_second'] - 1:+.1%}"
+            print(
+                f"{name:<18}{r['tokens']:>10}{r['bytes'] / 1e6:>8.2f}{r['tokens_per_second']:>12.0f}"
+                f"{r['mb_per_second']:>8.2f}{r['peak_bytes'] / 1e6:>9.2f}{change:>9}"
+            )
+        print(f"saved to {path}" + (f", compared with run at {previous['time']}" if previous else ""))
+    elif command == "incremental":
+        bench_incremental(int(argv[2]) if len(argv) > 2 else 100000)
+    elif command == "terminal":
+        bench_terminal(int(argv[2]) if len(argv) > 2 else 100000)
+    elif command == "tokens":
+        bench_tokens(int(argv[2]) if len(argv) > 2 else 100000)
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,259 @@
+"""
+语法分析树（具体语法树）的紧凑存储
+所有结点存于一个arena中，每个结点只占几个array("i")中的整数，节点的文本不随规约逐层拼接，按需由token得到
+结点之间的链接保存为编号差，一棵子树可以整段复制到另一个arena中（增量分析复用未改变的函数，见extract/graft）
+getParse返回根结点的CSTNode视图，可以像原先的dict一样读取；toDict转为原先的dict格式（界面显示与parser_out.json）
+不建树的semantic模式下，值栈中的符号只用TokenSpan记录其token范围
+"""
+
+from array import array
+
+from myToken import TokenStore
+
+NO_NODE = -1
+
+
+class TokenText(object):
+    '''
+    移进的各token的content，下标为token的移进顺序（即在输入中的下标）：
+    TokenStore输入时从其源代码缓冲区中按需切片（其后增量编辑改变了TokenStore时抛出RuntimeError，见TokenStore.checkVersion），
+    其他输入（列表、迭代器）时由add记录每个移进token的content
+    '''
+
+    def __init__(self, tokens=None):
+        self.tokens = tokens if isinstance(tokens, TokenStore) else None
+        self.version = None if self.tokens is None else self.tokens.version
+        self.contents = [] if self.tokens is None else None
+
+    def add(self, content):
+        if self.contents is not None:
+            self.contents.append(content)
+
+    def extend(self, tokens, start, end):
+        '''不经过移进，直接记录tokens中第start到end - 1个token的content（拼接已分析过的一段输入时）'''
+        if self.contents is not None:
+            self.contents.extend(tokens[index].content for index in range(start, end))
+
+    def __getitem__(self, index):
+        if self.tokens is not None:
+            self.tokens.checkVersion(self.version)
+            return self.tokens.getContent(index)
+        return self.contents[index]
+
+    def join(self, start, end):
+        '''第start到end - 1个token的content拼接'''
+        if end - start == 1:
+            return self[start]
+        return "".join(self[index] for index in range(start, end))
+
+
+class TokenSpan(object):
+    '''semantic模式下值栈中的文法符号，只有token范围[start, end)，支持node["content"]'''
+    __slots__ = ("text", "start", "end")
+
+    def __init__(self, text, start, end):
+        self.text = text
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, key):
+        if key == "content":
+            return self.text.join(self.start, self.end)
+        raise KeyError(key)
+
+
+class CST(object):
+    '''
+    结点编号即其在各数组中的下标，按创建顺序递增（子结点总是先于父结点创建）：
+    - kind: 符号id（终结符、epsilon或非终结符，与Parser.get_str_by_id一致）
+    - first_child: 本结点与第一个子结点的编号差（子结点先创建，总是正数），叶结点为0
+    - next_sibling: 下一个兄弟结点与本结点的编号差（总是正数），没有时为0
+    - token_start/token_end: 结点覆盖的token下标范围[start, end)，epsilon结点为空范围
+    结点的content为范围内各token的content依次拼接，与原先逐层拼接的结果相同
+    一棵子树的结点是连续的一段（从最左的叶结点到根），链接又只是编号差，复制子树时链接数组可以整段拷贝
+    '''
+
+    def __init__(self, names, epsilon_id, tokens=None):
+        '''
+        参数：
+        - names: 符号id到符号名的列表（终结符表 + 非终结符表）
+        - epsilon_id: epsilon的符号id，小于它的为终结符
+        - tokens: 分析的输入；为TokenStore时token的content从其源代码缓冲区中切片得到，
+          否则（列表或迭代器输入）由leaf记录移进的token的content，见TokenText
+        '''
+        self.names = names
+        self.epsilon_id = epsilon_id
+        self.token_text = TokenText(tokens)
+        self.kind = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.token_start = array("i")
+        self.token_end = array("i")
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, first_child, start, end):
+        node = len(self.kind)
+        self.kind.append(kind)
+        self.first_child.append(node - first_child if first_child != NO_NODE else 0)
+        self.next_sibling.append(0)
+        self.token_start.append(start)
+        self.token_end.append(end)
+        return node
+
+    def leaf(self, kind, index, content=None):
+        '''移进第index个token，content只在没有TokenStore时使用'''
+        self.token_text.add(content)
+        return self.add(kind, NO_NODE, index, index + 1)
+
+    def epsilon(self, index):
+        '''空产生式的epsilon子结点，位于第index个token之前'''
+        return self.add(self.epsilon_id, NO_NODE, index, index)
+
+    def inner(self, kind, children):
+        '''由子结点列表（按从左到右的顺序）创建非终结符结点'''
+        next_sibling = self.next_sibling
+        for left, right in zip(children, children[1:]):
+            next_sibling[left] = right - left
+        return self.add(kind, children[0], self.token_start[children[0]], self.token_end[children[-1]])
+
+    def children(self, node):
+        delta = self.first_child[node]
+        if not delta:
+            return
+        child = node - delta
+        next_sibling = self.next_sibling
+        while True:
+            yield child
+            delta = next_sibling[child]
+            if not delta:
+                return
+            child += delta
+
+    def extract(self, first, last):
+        '''
+        第first到last个结点的一份与位置无关的拷贝：last为一棵子树的根，first为要复制的该子树中最早创建的结点；
+        返回(kind, first_child, next_sibling, token_start, token_end)五个数组，token下标相对根结点的第一个token，根结点不带兄弟链接
+        指向first之前的结点的链接（编号差）原样保留，graft之前须在arena末尾重新生成这些结点
+        '''
+        offset = self.token_start[last]
+        next_sibling = self.next_sibling[first:last + 1]
+        next_sibling[-1] = 0
+        return (
+            self.kind[first:last + 1],
+            self.first_child[first:last + 1],
+            next_sibling,
+            array("i", map((-offset).__add__, self.token_start[first:last + 1])),
+            array("i", map((-offset).__add__, self.token_end[first:last + 1])),
+        )
+
+    @staticmethod
+    def moved(nodes, index):
+        '''extract得到的子树放在第index个token处时的各数组（token下标加上index）'''
+        kind, first_child, next_sibling, token_start, token_end = nodes
+        return (
+            kind,
+            first_child,
+            next_sibling,
+            array("i", map(index.__add__, token_start)),
+            array("i", map(index.__add__, token_end)),
+        )
+
+    def graft(self, nodes):
+        '''把moved得到的子树整段追加到arena中，返回根结点'''
+        kind, first_child, next_sibling, token_start, token_end = nodes
+        self.kind.extend(kind)
+        self.first_child.extend(first_child)
+        self.next_sibling.extend(next_sibling)
+        self.token_start.extend(token_start)
+        self.token_end.extend(token_end)
+        return len(self.kind) - 1
+
+    def name(self, node):
+        return self.names[self.kind[node]]
+
+    def text(self, node):
+        '''结点覆盖的各token的content拼接'''
+        return self.token_text.join(self.token_start[node], self.token_end[node])
+
+    def view(self, node):
+        return CSTNode(self, node)
+
+    def toDict(self, node):
+        '''
+        转为原先的dict格式：{"root": 符号名, "content": 文本, "children": [...]}，epsilon结点没有content
+        非递归实现，很深的树也不会超出递归深度
+        '''
+        order = []
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            order.append(current)
+            pending.extend(self.children(current))
+        epsilon_id = self.epsilon_id
+        names = self.names
+        dicts = {}
+        for current in reversed(order):
+            kind = self.kind[current]
+            if kind == epsilon_id:
+                dicts[current] = {"root": names[kind], "children": []}
+            elif kind < epsilon_id:
+                dicts[current] = {"root": names[kind], "content": self.text(current), "children": []}
+            else:
+                # 子结点的content已经生成，直接拼接
+                children = [dicts.pop(child) for child in self.children(current)]
+                dicts[current] = {
+                    "root": names[kind],
+                    "content": "".join(child.get("content", "") for child in children),
+                    "children": children,
+                }
+        return dicts[node]
+
+    def nbytes(self):
+        '''各数组占用的字节数之和（不含token文本）'''
+        return sum(len(a) * a.itemsize for a in
+                   (self.kind, self.first_child, self.next_sibling, self.token_start, self.token_end))
+
+
+class CSTNode(object):
+    '''
+    CST中一个结点的视图，兼容原先的dict写法：node["root"]、node["content"]、node["children"]
+    content与children在访问时才生成；epsilon结点没有content
+    '''
+    __slots__ = ("cst", "node")
+
+    def __init__(self, cst, node):
+        self.cst = cst
+        self.node = node
+
+    def keys(self):
+        if self.cst.kind[self.node] == self.cst.epsilon_id:
+            return ["root", "children"]
+        return ["root", "content", "children"]
+
+    def __getitem__(self, key):
+        if key == "root":
+            return self.cst.name(self.node)
+        if key == "children":
+            return [CSTNode(self.cst, child) for child in self.cst.children(self.node)]
+        if key == "content" and self.cst.kind[self.node] != self.cst.epsilon_id:
+            return self.cst.text(self.node)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def toDict(self):
+        return self.cst.toDict(self.node)
+
+    def __eq__(self, other):
+        if isinstance(other, (CSTNode, dict)):
+            return self.toDict() == (other.toDict() if isinstance(other, CSTNode) else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CSTNode({self.cst.name(self.node)!r}, {self.node})"
@@ -1,5 +1,9 @@
+import copy
+import re
 from collections import defaultdict
 
+from myBlockDivider import BlockDivider
+
 """
 寄存器分配与内存管理
 """
@@ -171,6 +175,15 @@ class RegManager:
         return reg
 
 
+def indentCodes(codes):
+    # 为可读性加一下缩进
+    for cindex in range(len(codes)):
+        code = codes[cindex]
+        if len(code) and code[0] != "." and code[-1] != ":":
+            codes[cindex] = "\t" + code
+    return codes
+
+
 class CodeGenerator:
     """
     目标代码生成器
@@ -187,6 +200,16 @@ class CodeGenerator:
         self.error_msg = []
 
     def getObjectCode(self):
+        self.getHeaderCode()
+
+        for func, blocks in self.func_blocks.items():
+            self.getFuncObjectCode(func, blocks)
+        self.codes.append("end:")
+
+        indentCodes(self.codes)
+        return self.codes
+
+    def getHeaderCode(self):
         self.codes.append(".data")
         for var in sorted(list(self.data_words)):
             self.codes.append(f"{var}: .word 0")
@@ -196,18 +219,6 @@ class CodeGenerator:
         self.codes.append("lui $sp, 0x1004")
         self.codes.append("j main")  # 跳转到main函数
 
-        for func, blocks in self.func_blocks.items():
-            self.getFuncObjectCode(func, blocks)
-        self.codes.append("end:")
-
-        # 为可读性加一下缩进
-        for cindex in range(len(self.codes)):
-            code = self.codes[cindex]
-            if len(code) and code[0] != "." and code[-1] != ":":
-                self.codes[cindex] = "\t" + code
-
-        return self.codes
-
     def getFuncObjectCode(self, func_name, blocks):
         self.regManager.memory.clear()
         self.regManager.func_vars = {var.name for var in self.func_words[func_name]}
@@ -362,3 +373,100 @@ class CodeGenerator:
                 self.regManager.free_registers.append(rt)
             elif not quad.info_src2.active and quad.src2 != quad.tar:
                 self.regManager.freeVarRegisters(quad.src2)
+
+
+class FunctionCode:
+    """
+    一个函数的目标代码（已缩进），其中非入口基本块的名称为占位符block{k}，k为该函数中的编号（从1开始）
+    拼接时加上之前各函数的基本块数得到全局的名称，与对整个程序划分基本块时的编号相同
+    """
+    PLACEHOLDER = re.compile(r"block\{(\d+)\}")
+
+    def __init__(self, codes, block_count, error_msg):
+        self.codes = codes
+        self.block_count = block_count
+        self.error_msg = error_msg
+        self.labels = [cindex for cindex, code in enumerate(codes) if "block{" in code]  # 含占位符的行
+        self.base = None
+        self.rendered = None
+
+    def render(self, base):
+        # 编号的起点与上次相同时直接复用上次的结果
+        if base != self.base:
+            rendered = list(self.codes)
+            for cindex in self.labels:
+                rendered[cindex] = self.PLACEHOLDER.sub(lambda m: f"block{base + int(m.group(1))}", rendered[cindex])
+            self.base = base
+            self.rendered = rendered
+        return self.rendered
+
+
+class IncrementalCodeGenerator:
+    """
+    按函数缓存的目标代码生成，配合myParser.IncrementalParser使用：
+    各函数的基本块划分、活跃信息与寄存器分配互不相关，只有基本块的编号是全局的。
+    语义分析结果由缓存拼接而来的函数（四元式与上次相同）直接复用上次的代码，只对重新分析的函数划分基本块并生成代码，
+    结果与BlockDivider + CodeGenerator对整个程序生成的相同；缓存存于各函数的FunctionUnit.code
+    """
+    def __init__(self, start_address=100, sink=None):
+        self.start_address = start_address
+        self.sink = sink  # 对整个程序生成时blockinfo.txt的写出层，见BlockDivider
+        self.generated = 0  # 上次生成时重新生成代码的函数数
+        self.reused = 0
+        self.error_occur = False
+        self.error_msg = []
+
+    def getObjectCode(self, semantic, units):
+        """
+        参数：
+        - semantic: 没有错误的语义分析结果（Parser.semantic）
+        - units: IncrementalParser.units，与semantic.process_table中的函数一一对应
+        返回目标代码行的列表；units与函数表不对应时对整个程序生成（blockinfo.txt经由sink写出）
+        """
+        process_table = semantic.process_table
+        quads = semantic.quaternion_table
+        if len(units) != len(process_table):
+            # 四元式可能与缓存共用，同样在副本上划分基本块
+            blockDivider = BlockDivider([copy.copy(quad) for quad in quads], self.start_address, sink=self.sink)
+            blockDivider.computeBlocks(semantic.getFuncTable())
+            codeGenerator = CodeGenerator(blockDivider.func_blocks, process_table, semantic.words_table)
+            codes = codeGenerator.getObjectCode()
+            self.generated, self.reused = len(process_table), 0
+            self.error_occur, self.error_msg = codeGenerator.error_occur, codeGenerator.error_msg
+            return codes
+
+        header = CodeGenerator({}, [], semantic.words_table)
+        header.getHeaderCode()
+        codes = indentCodes(header.codes)
+        self.generated = 0
+        self.reused = 0
+        self.error_msg = []
+        base = 0
+        for findex, (unit, func) in enumerate(zip(units, process_table)):
+            code = unit.code
+            if code is None:
+                start = func.start_address - self.start_address
+                end = process_table[findex + 1].start_address - self.start_address \
+                    if findex + 1 < len(process_table) else len(quads)
+                code = self.getFuncObjectCode(quads[start:end], func, semantic.words_table)
+                unit.code = code
+                self.generated += 1
+            else:
+                self.reused += 1
+            codes.extend(code.render(base))
+            base += code.block_count
+            self.error_msg.extend(code.error_msg)
+        codes.append("end:")
+        self.error_occur = bool(self.error_msg)
+        return codes
+
+    def getFuncObjectCode(self, quads, func, data_words):
+        # 单独对一个函数划分基本块（基本块编号为占位符，不写出blockinfo.txt）并生成代码
+        # BlockDivider会把跳转目标改写为基本块名，在副本上进行，语义分析结果（及FunctionUnit缓存）中的四元式保持不变
+        quads = [copy.copy(quad) for quad in quads]
+        blockDivider = BlockDivider(quads, func.start_address, block_name="block{{{}}}")
+        blockDivider.computeBlocks([{"name": func.name, "enter": func.start_address}])
+        codeGenerator = CodeGenerator(blockDivider.func_blocks, [func], data_words)
+        for name, blocks in blockDivider.func_blocks.items():
+            codeGenerator.getFuncObjectCode(name, blocks)
+        return FunctionCode(indentCodes(codeGenerator.codes), blockDivider.block_cnt, codeGenerator.error_msg)
@@ -1,5 +1,11 @@
-import json
+import mmap
+import re
+import threading
+from types import MappingProxyType
+from array import array
 from string import digits, ascii_letters
+from myArtifact import ArtifactSink
+from myToken import moveGap, Token, TokenStore, TOKEN_TYPES, TOKEN_KINDS, KIND_TERMINALS, UNKNOWN_KIND, EOF_KIND
 from tokenType import tokenType, tokenSymbols, tokenKeywords
 
 def enum_to_str(obj):
@@ -14,20 +20,37 @@ class DFA_state(object):
 
 
 class DFA(object):
-    def __init__(self) -> None:
+    '''
+    词法分析的状态转移图，构建完成后调用freeze变为只读，可在多个Lexer与线程间共享；
+    行走时的游标保存在各次扫描自己的DFACursor中
+    '''
+    def __init__(self, keywords=True) -> None:
+        '''keywords为False时不为关键字建立状态，所有标识符由同一个状态识别，关键字需在扫描后查表区分'''
         self.root = DFA_state()
-        self.cur = self.root
-        self.len = 0
+        self.keywords = keywords
 
         self.initAlpha()
         self.initSymbol()
         self.initDigit()
 
+    def freeze(self):
+        # 将所有状态的转移表替换为只读视图
+        stack = [self.root]
+        seen = {self.root}
+        while stack:
+            state = stack.pop()
+            for nxt in state.transfer.values():
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+            state.transfer = MappingProxyType(state.transfer)
+
     def initAlpha(self):
         # 初始化所有的keyword对应的状态，并记录状态集合
         stateSet = set()
-        for keyword in tokenKeywords:
-            stateSet |= self.initToken(keyword, tokenKeywords[keyword])
+        if self.keywords:
+            for keyword in tokenKeywords:
+                stateSet |= self.initToken(keyword, tokenKeywords[keyword])
 
         # 处理剩余的字母、数字转移，应该识别为identifier
         identifierState = DFA_state()
@@ -105,6 +128,15 @@ class DFA(object):
         cur.tokenType = type
         return stateSet
 
+
+
+class DFACursor(object):
+    '''在共享的DFA上行走的游标，由每次扫描单独持有'''
+    def __init__(self, dfa: DFA) -> None:
+        self.root = dfa.root
+        self.cur = self.root
+        self.len = 0
+
     def forward(self, ch: str):
         '''返回当前状态的tokenType和当前状态的长度'''
         assert len(ch) == 1, "Expect a char, got a string"
@@ -121,25 +153,444 @@ class DFA(object):
         self.len = 0
 
 
-class Lexer(object):
+class CompiledDFA(object):
+    '''
+    将DFA编译为整数状态编号的扁平转移表：
+    - trans[state * ALPHABET + ord(ch)] 为后继状态编号，-1表示无转移
+    - accept[state] 为该状态对应的tokenType，kinds[state] 为其在TOKEN_TYPES中的下标
+    根状态编号固定为0；minimize为True时用Hopcroft算法合并等价状态
+    '''
+    ALPHABET = 128
+
+    def __init__(self, dfa: DFA, minimize=False) -> None:
+        # 按广度优先顺序为状态编号
+        ids = {dfa.root: 0}
+        states = [dfa.root]
+        i = 0
+        while i < len(states):
+            for nxt in states[i].transfer.values():
+                if nxt not in ids:
+                    ids[nxt] = len(states)
+                    states.append(nxt)
+            i += 1
+
+        self.size = len(states)
+        self.accept = [state.tokenType for state in states]
+        self.kinds = array("i", [TOKEN_KINDS[t] for t in self.accept])
+        self.trans = array("i", [-1]) * (self.size * self.ALPHABET)
+        for sid, state in enumerate(states):
+            for ch, nxt in state.transfer.items():
+                if ord(ch) < self.ALPHABET:
+                    self.trans[sid * self.ALPHABET + ord(ch)] = ids[nxt]
+        if minimize:
+            self.minimize()
+        # 构建完成后只读，可被多个线程同时查表
+        self.kinds = memoryview(self.kinds).toreadonly()
+        self.trans = memoryview(self.trans).toreadonly()
+
+    def minimize(self):
+        '''
+        Hopcroft最小化：初始划分按kind区分，无转移（-1）视为转到一个单独的死状态；
+        等价类按从根出发的广度优先顺序重新编号，死状态不保留，因此扫描行为不变
+        '''
+        n, width = self.size, self.ALPHABET
+        dead = n
+        # 只有出现过转移的字符需要参与划分，其余字符对所有状态都转到死状态
+        codes = sorted({k % width for k, nxt in enumerate(self.trans) if nxt >= 0})
+        # 在所有状态上转移都相同的字符只需取一个代表参与划分
+        columns = {}
+        for c in codes:
+            columns.setdefault(tuple(self.trans[c::width]), c)
+        classes = list(columns.values())
+        inverse = {c: [[] for _ in range(n + 1)] for c in classes}
+        for state in range(n):
+            for c in classes:
+                nxt = self.trans[state * width + c]
+                inverse[c][dead if nxt < 0 else nxt].append(state)
+        for c in classes:
+            inverse[c][dead].append(dead)
+
+        groups = {}
+        for state in range(n):
+            groups.setdefault(self.kinds[state], set()).add(state)
+        blocks = list(groups.values()) + [{dead}]
+        block_of = [0] * (n + 1)
+        for b, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = b
+
+        # 转移是完全的（含死状态），初始时最大的块不必作为划分者
+        pending = set(range(len(blocks)))
+        pending.discard(max(pending, key=lambda b: len(blocks[b])))
+        while pending:
+            splitter = blocks[pending.pop()]
+            for c in classes:
+                preds = {p for q in splitter for p in inverse[c][q]}
+                touched = {}
+                for p in preds:
+                    touched.setdefault(block_of[p], set()).add(p)
+                for b, inside in touched.items():
+                    block = blocks[b]
+                    if len(inside) == len(block):
+                        continue
+                    blocks[b] = inside
+                    rest = block - inside
+                    blocks.append(rest)
+                    nb = len(blocks) - 1
+                    for state in rest:
+                        block_of[state] = nb
+                    if b in pending or len(rest) <= len(inside):
+                        pending.add(nb)
+                    else:
+                        pending.add(b)
+
+        # 按广度优先顺序为等价类重新编号，根所在的类为0
+        ids = {block_of[0]: 0}
+        order = [block_of[0]]
+        i = 0
+        while i < len(order):
+            state = next(iter(blocks[order[i]]))
+            for c in codes:
+                nxt = self.trans[state * width + c]
+                if nxt >= 0 and block_of[nxt] not in ids:
+                    ids[block_of[nxt]] = len(order)
+                    order.append(block_of[nxt])
+            i += 1
+
+        trans = array("i", [-1]) * (len(order) * width)
+        for new, b in enumerate(order):
+            state = next(iter(blocks[b]))
+            for c in codes:
+                nxt = self.trans[state * width + c]
+                if nxt >= 0:
+                    trans[new * width + c] = ids[block_of[nxt]]
+        self.accept = [self.accept[next(iter(blocks[b]))] for b in order]
+        self.kinds = array("i", [TOKEN_KINDS[t] for t in self.accept])
+        self.trans = trans
+        self.size = len(order)
+
+
+class MasterPattern(object):
+    '''
+    由tokenKeywords、tokenSymbols与标识符、整数、浮点数规则生成的单个正则表达式，
+    匹配循环在re模块的C代码中完成。各分支与DFA的最长匹配（不回退）行为一致：
+    - 标识符整体匹配后再查关键字表
+    - 数字的指数部分不完整（如1e、1e+）时与DFA一样得到UNKNOWN
+    - 符号按长度从长到短排列，并包含所有符号前缀（如"!"，其类型为UNKNOWN）
+    每个匹配前的空白符（空格、制表符、换行）被一并跳过
+    '''
+    GROUPS = ("identifier", "integer", "floating", "bad_number", "symbol", "error")
+
+    def __init__(self) -> None:
+        prefixes = {symbol[:k] for symbol in tokenSymbols for k in range(1, len(symbol) + 1)}
+        symbols = "|".join(re.escape(p) for p in sorted(prefixes, key=len, reverse=True))
+        self.pattern = re.compile(
+            r"[ \t\n]*(?:"
+            r"(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)"
+            r"|(?P<integer>[0-9]+(?![0-9eE]))"
+            r"|(?P<floating>[0-9]+[eE][+-]?[0-9]+)"
+            r"|(?P<bad_number>[0-9]+[eE][+-]?)"
+            rf"|(?P<symbol>{symbols})"
+            r"|(?P<error>.))",
+            re.DOTALL,
+        )
+        # 分组编号（m.lastindex）
+        self.IDENTIFIER, self.INTEGER, self.FLOATING, self.BAD_NUMBER, self.SYMBOL, self.ERROR = (
+            self.pattern.groupindex[name] for name in self.GROUPS
+        )
+        # 固定类型的分组对应的kind，下标为分组编号
+        self.group_kinds = [UNKNOWN_KIND] * (len(self.GROUPS) + 1)
+        self.group_kinds[self.INTEGER] = TOKEN_KINDS[tokenType.INTEGER_CONSTANT]
+        self.group_kinds[self.FLOATING] = TOKEN_KINDS[tokenType.FLOATING_POINT_CONSTANT]
+        self.identifier_kind = TOKEN_KINDS[tokenType.IDENTIFIER]
+        self.keyword_kinds = {word: TOKEN_KINDS[t] for word, t in tokenKeywords.items()}
+        self.symbol_kinds = {p: TOKEN_KINDS[tokenSymbols.get(p, tokenType.UNKNOWN)] for p in prefixes}
+
+
+class Automata(object):
+    '''
+    进程内共享的只读自动机：
+    - dfa: 原始的状态转移图，供"dfa"backend逐字符行走
+    - compiled: 包含关键字状态、经过最小化的整数转移表
+    - identifier: 不含关键字状态、经过最小化的整数转移表，关键字由keyword_kinds查表得到
+    - master: 正则表达式backend使用的MasterPattern
+    '''
+
     def __init__(self) -> None:
         self.dfa = DFA()
+        self.compiled = CompiledDFA(self.dfa, minimize=True)
+        self.dfa.freeze()
+        self.identifier = CompiledDFA(DFA(keywords=False), minimize=True)
+        self.keyword_kinds = {word: TOKEN_KINDS[t] for word, t in tokenKeywords.items()}
+        self.master = MasterPattern()
+
+
+_automata = None
+_automata_lock = threading.Lock()
+
+
+def getAutomata():
+    '''
+    返回进程内共享的Automata，首次调用时构建，之后只读
+    所有Lexer实例与线程共用同一份自动机，扫描过程中的可变状态只保存在各次调用自己的局部变量中
+    '''
+    global _automata
+    if _automata is None:
+        with _automata_lock:
+            if _automata is None:
+                _automata = Automata()
+    return _automata
+
+
+# 不报告为未知字符的空白符
+WHITESPACE_CODES = (ord(" "), ord("\t"), ord("\n"))
+# 流式读取文件时每次读入的大小
+CHUNK_SIZE = 1 << 16
+
+
+def iterLines(source, chunk_size=CHUNK_SIZE):
+    '''
+    将源代码按行逐个产生，分行结果与str.splitlines一致（仅可能多出不影响词法分析的空行）
+    参数：
+    - source: 字符串、bytes、mmap，或支持read(size)的文本/二进制文件对象
+    - chunk_size: 读取文件对象时每块的大小，跨块的行会被拼接完整
+    '''
+    if isinstance(source, str):
+        yield from source.splitlines()
+    elif isinstance(source, (bytes, bytearray, mmap.mmap)):
+        # 逐行切片解码，不复制整个缓冲区；UTF-8多字节字符中不会出现换行字节
+        pos = 0
+        end = len(source)
+        while pos < end:
+            nxt = source.find(b"\n", pos)
+            if nxt < 0:
+                nxt = end
+            yield from bytes(source[pos:nxt]).decode("utf-8").splitlines()
+            pos = nxt + 1
+    else:
+        tail = None
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            if tail:
+                chunk = tail + chunk
+            cut = chunk.rfind(b"\n" if isinstance(chunk, bytes) else "\n") + 1
+            # 最后一个换行之后是不完整的行，留到下一块
+            tail = chunk[cut:]
+            if cut:
+                text = chunk[:cut]
+                if isinstance(text, bytes):
+                    text = text.decode("utf-8")
+                yield from text.splitlines()
+        if tail:
+            yield from (tail.decode("utf-8") if isinstance(tail, bytes) else tail).splitlines()
+
+
+class Lexer(object):
+    '''
+    词法分析器，backend可选：
+    - "compiled": 使用最小化后的CompiledDFA整数转移表，整行一次扫描（默认）
+    - "keyword": 与"compiled"相同，但自动机中没有关键字状态，标识符扫描完成后再查表区分关键字
+    - "dfa": 逐字符调用DFACursor.forward的原始实现
+    - "regex": 使用MasterPattern，由re.finditer在C代码中完成匹配
+    各backend逐行产生扁平的[kind, start, end, ...]扫描结果，
+    再由scan汇总为紧凑的TokenStore，或由iterTokens逐个转换为Token
+    '''
+    BACKENDS = ("compiled", "keyword", "dfa", "regex")
+
+    def __init__(self, backend="compiled", sink=None) -> None:
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown lexer backend: {backend}")
+        self.backend = backend
+        # 中间产物写出层，默认不写出lexer_out.json
+        self.sink = sink if sink is not None else ArtifactSink()
+        # 共享的只读自动机，不在每个实例中重复构建
+        self.automata = getAutomata()
+        self.dfa = self.automata.dfa
+        self.compiled = self.automata.compiled
+        self.master = self.automata.master
 
     def getLex(self, lines):
-        ret = []
-        row = 1
+        ret, success = self.scan(lines)
+        self.sink.dumpRecords("lexer_out.json", ret)
+        return ret, success
+
+    def scan(self, lines):
+        '''对源代码的各行做词法分析，返回(TokenStore, 是否成功)，不写出文件'''
+        status = {}
+        ret = TokenStore()
+        for line, spans in self.iterSpans(lines, status):
+            ret.addLine(line, spans)
+        ret.finish()
+        return ret, status["success"]
+
+    def iterLex(self, source, status=None, chunk_size=CHUNK_SIZE):
+        '''
+        按需逐个产生token，不需要事先读入整个源代码
+        参数：
+        - source: 源代码字符串、文本/二进制文件对象或mmap
+        - status: 可选的dict，扫描过程中status["success"]记录是否出现无法解析的字符
+        '''
+        return self.iterTokens(iterLines(source, chunk_size), status)
+
+    def iterTokens(self, lines, status=None):
+        '''对逐行给出的源代码按需产生Token，最后一个为EOF；块注释状态跨行保持'''
+        row = 0
         id = 1
-        annotation = False
-        success = True
+        for line, spans in self.iterSpans(lines, {} if status is None else status):
+            row += 1
+            for k in range(0, len(spans), 3):
+                kind, start, end = spans[k], spans[k + 1], spans[k + 2]
+                if end < 0:
+                    yield Token(None, None, TOKEN_TYPES[kind], row, start + 1, KIND_TERMINALS[kind])
+                else:
+                    yield Token(id, line[start:end], TOKEN_TYPES[kind], row, start + 1, KIND_TERMINALS[kind])
+                    id += 1
+        yield Token(id, "#", tokenType.EOF, row + 1, 1, KIND_TERMINALS[EOF_KIND])
+
+    def iterSpans(self, lines, status, annotation=False):
+        '''
+        逐个非空行产生(line, spans)，spans为扁平的[kind, start, end, ...]列表：
+        kind为TOKEN_TYPES中的下标，[start, end)为token在行内的范围，end为-1表示无法解析的单个字符
+        annotation为开始时是否处于块注释中，扫描结束后status["annotation"]记录结束时的状态
+        '''
+        status["success"] = True
+        if self.backend == "dfa":
+            return self.iterDFA(lines, status, annotation)
+        if self.backend == "regex":
+            return self.iterRegex(lines, status, annotation)
+        if self.backend == "keyword":
+            return self.iterCompiled(lines, status, annotation, self.automata.identifier, self.automata.keyword_kinds)
+        return self.iterCompiled(lines, status, annotation)
+
+    def iterCompiled(self, lines, status, annotation=False, compiled=None, keywords=None):
+        '''
+        基于CompiledDFA的扫描：每个token从根状态出发沿转移表走到无法转移为止（最长匹配），
+        输出与iterDFA完全一致，包括注释与未知字符的处理方式
+        compiled不含关键字状态时，由keywords（关键字到kind的映射）区分标识符与关键字
+        '''
+        compiled = compiled if compiled is not None else self.compiled
+        trans = compiled.trans
+        kinds = compiled.kinds
+        shift = compiled.ALPHABET.bit_length() - 1
+        # 不查关键字表时取一个不会出现的kind
+        identifier_kind = TOKEN_KINDS[tokenType.IDENTIFIER] if keywords is not None else -1
+        S_COMMENT, LM_COMMENT, RM_COMMENT = (
+            TOKEN_KINDS[tokenType.S_COMMENT], TOKEN_KINDS[tokenType.LM_COMMENT], TOKEN_KINDS[tokenType.RM_COMMENT]
+        )
+        for line in lines:
+            if not line.strip():
+                continue
+            # 非ASCII字符替换为无转移的'?'，长度与下标保持不变
+            codes = line.encode("ascii", "replace")
+            n = len(codes)
+            spans = []
+            emit = spans.extend
+            i = 0
+            # 上一个token恰好在此处结束，对应原实现中的“重读”
+            reread = False
+            while i < n:
+                state = trans[codes[i]]
+                if state < 0:
+                    if not annotation and codes[i] not in WHITESPACE_CODES:
+                        if not reread:
+                            # 无法解析的字符
+                            status["success"] = False
+                        emit((UNKNOWN_KIND, i, -1))
+                    reread = False
+                    i += 1
+                    continue
+
+                j = i + 1
+                while j < n:
+                    nxt = trans[(state << shift) | codes[j]]
+                    if nxt < 0:
+                        break
+                    state = nxt
+                    j += 1
+
+                kind = kinds[state]
+                if kind == identifier_kind:
+                    kind = keywords.get(line[i:j], kind)
+                if kind == S_COMMENT:
+                    break
+                elif kind == LM_COMMENT:
+                    annotation = True
+
+                if not annotation:
+                    emit((kind, i, j))
+
+                if kind == RM_COMMENT:
+                    annotation = False
+                reread = True
+                i = j
+            yield line, spans
+        status["annotation"] = annotation
+
+    def iterRegex(self, lines, status, annotation=False):
+        '''基于MasterPattern的扫描，注释与未知字符的处理与iterCompiled相同'''
+        master = self.master
+        finditer = master.pattern.finditer
+        IDENTIFIER, SYMBOL, ERROR = master.IDENTIFIER, master.SYMBOL, master.ERROR
+        group_kinds, keyword_kinds, symbol_kinds = master.group_kinds, master.keyword_kinds, master.symbol_kinds
+        identifier_kind = master.identifier_kind
+        S_COMMENT, LM_COMMENT, RM_COMMENT = (
+            TOKEN_KINDS[tokenType.S_COMMENT], TOKEN_KINDS[tokenType.LM_COMMENT], TOKEN_KINDS[tokenType.RM_COMMENT]
+        )
+        for line in lines:
+            if not line.strip():
+                continue
+            spans = []
+            emit = spans.extend
+            # 上一个token的结束位置，紧跟其后的未知字符对应原实现中的“重读”
+            last_end = -1
+            # 行末空白不产生任何输出，去掉以免finditer在其中反复尝试
+            for m in finditer(line.rstrip(" \t\n")):
+                group = m.lastindex
+                i, j = m.span(group)
+                if group == ERROR:
+                    if not annotation:
+                        if i != last_end:
+                            # 无法解析的字符
+                            status["success"] = False
+                        emit((UNKNOWN_KIND, i, -1))
+                    continue
+
+                if group == IDENTIFIER:
+                    kind = keyword_kinds.get(line[i:j], identifier_kind)
+                elif group == SYMBOL:
+                    kind = symbol_kinds[line[i:j]]
+                else:
+                    kind = group_kinds[group]
+
+                if kind == S_COMMENT:
+                    break
+                elif kind == LM_COMMENT:
+                    annotation = True
+
+                if not annotation:
+                    emit((kind, i, j))
+
+                if kind == RM_COMMENT:
+                    annotation = False
+                last_end = j
+            yield line, spans
+        status["annotation"] = annotation
+
+    def iterDFA(self, lines, status, annotation=False):
+        '''逐字符调用DFACursor.forward的原始实现，游标属于本次调用'''
+        cursor = DFACursor(self.dfa)
         for line in lines:
             if not line.strip():
                 continue
-            self.dfa.reset()
+            spans = []
+            cursor.reset()
             token_type = None
             length = 0
             col = 0
             for ch in line + "#":  # 行末加一个字符以确认每一行最后一个输入DFA的串
-                newtoken_type, newlength = self.dfa.forward(ch)
+                newtoken_type, newlength = cursor.forward(ch)
 
                 if token_type and not newtoken_type:
                     if token_type == tokenType.S_COMMENT:
@@ -148,48 +599,251 @@ class Lexer(object):
                         annotation = True
 
                     if not annotation:
-                        item = {}
-                        item["id"] = id
-                        id += 1
-                        item["content"] = line[col - length : col]
-                        item["prop"] = token_type
-                        item["loc"] = {"row": row, "col": col - length + 1}
-                        ret.append(item)
+                        spans.extend((TOKEN_KINDS[token_type], col - length, col))
 
                     if token_type == tokenType.RM_COMMENT:
                         annotation = False
 
-                    self.dfa.reset()
-                    token_type, length = self.dfa.forward(ch)
+                    cursor.reset()
+                    token_type, length = cursor.forward(ch)
                     # 重读依然失败
                     if not token_type and not annotation and ch not in [" ", "\t", "\n"]:
-                        item = {}
-                        item["prop"] = tokenType.UNKNOWN
-                        item["loc"] = {"row": row, "col": col + 1}
-                        ret.append(item)
+                        spans.extend((UNKNOWN_KIND, col, -1))
                 elif not token_type and not newtoken_type:
                     if not annotation and ch not in [" ", "\t", "\n"]:
                         # 无法解析的字符
-                        success = False
-                        item = {}
-                        item["prop"] = tokenType.UNKNOWN
-                        item["loc"] = {"row": row, "col": col + 1}
-                        ret.append(item)
+                        status["success"] = False
+                        spans.extend((UNKNOWN_KIND, col, -1))
                 else:
                     token_type, length = newtoken_type, newlength
                 col += 1
-            row += 1
+            yield line, spans
+        status["annotation"] = annotation
 
-        ret.append(
-            {
-                "id": id,
-                "content": "#",
-                "prop": tokenType.EOF,
-                "loc": {"row": row, "col": 1},
-            }
-        )
-        # ret = json.dumps(ret)
-        # 写入 JSON 文件
-        with open("lexer_out.json", "w", encoding="utf-8") as f:
-            json.dump(ret, f, indent=4, ensure_ascii=False, default=enum_to_str)
-        return ret, success
+
+# str.splitlines认作换行的字符；"\r\n"整体为一个换行
+LINE_BREAK = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def commonPrefixLength(a, b):
+    '''a与b的公共前缀长度：按加倍/减半的段长比较切片，只需O(log n)次比较，比较本身在C中进行'''
+    limit = min(len(a), len(b))
+    length = 0
+    step = 64
+    while length < limit:
+        end = min(length + step, limit)
+        if a[length:end] == b[length:end]:
+            length = end
+            step *= 2
+        elif step > 1:
+            step //= 2
+        else:
+            break
+    return length
+
+
+def commonSuffixLength(a, b, limit):
+    '''a与b的公共后缀长度，不超过limit'''
+    la, lb = len(a), len(b)
+    length = 0
+    step = 64
+    while length < limit:
+        end = min(length + step, limit)
+        if a[la - end:la - length] == b[lb - end:lb - length]:
+            length = end
+            step *= 2
+        elif step > 1:
+            step //= 2
+        else:
+            break
+    return length
+
+
+def lineEnd(text, pos):
+    '''text中pos所在行（含换行符）之后的位置'''
+    match = LINE_BREAK.search(text, pos)
+    return match.end() if match else len(text)
+
+
+class IncrementalLexer(object):
+    '''
+    编辑器使用的增量词法分析：按行保存扫描结果与每行开始时的块注释状态，
+    编辑后只重新扫描被修改的行，以及其后块注释状态发生变化、尚未与原结果收敛的行。
+    各行的扫描结果不含行号与id；getTokens生成过TokenStore之后，每次编辑只把重新扫描的行替换进这个TokenStore
+    （TokenStore.replaceLines），行号与id随之改变，getTokens返回的是同一个对象
+    '''
+
+    def __init__(self, lexer=None) -> None:
+        self.lexer = lexer if lexer is not None else Lexer()
+        self.lines = []
+        # 每行的spans，空行为None
+        self.spans = []
+        # 每行是否为空行（1为空行），TokenStore的行号不计空行
+        self.blank = bytearray()
+        # 每行是否没有出现无法解析的字符，以及其中为False的行数（success不必遍历所有行）
+        self.ok = []
+        self.failed = 0
+        # states[i]为第i行开始时是否处于块注释中，states[len(lines)]为结束时的状态
+        self.states = [False]
+        # update上次传入的源代码，以及各行在其中的起始偏移（与TokenStore.line_offset相同，
+        # 下标不小于start_gap的行保存为减去源代码长度的值）；直接调用edit之后为None，下次update时重新计算
+        self.text = None
+        self.line_start = None
+        self.start_gap = 0
+        self._store = None
+
+    def scanLine(self, line, annotation):
+        '''扫描单独一行，返回(spans, 行末块注释状态, 是否成功)'''
+        if not line.strip():
+            return None, annotation, True
+        status = {}
+        (_, spans), = self.lexer.iterSpans([line], status, annotation)
+        return spans, status["annotation"], status["success"]
+
+    def reset(self, code_str):
+        '''丢弃之前的结果，完整扫描code_str'''
+        self.lines = []
+        self.spans = []
+        self.blank = bytearray()
+        self.ok = []
+        self.failed = 0
+        self.states = [False]
+        self._store = None
+        relexed = self.edit(0, 0, code_str)
+        if isinstance(code_str, str):
+            self.text = code_str
+            self.line_start = self.lineStarts(code_str, 0, len(self.lines))
+            self.start_gap = len(self.lines)
+        return relexed
+
+    def update(self, code_str):
+        '''
+        与上次的源代码比较，把首尾相同的部分之间的行作为一次编辑，返回重新扫描的行数
+        按字符比较公共前缀与后缀（切片比较在C中进行），扩展到整行后由各行的起始偏移二分查找行号，
+        不必把整个源代码拆成行逐行比较
+        '''
+        if self.text is None:
+            self.text = "".join(line + "\n" for line in self.lines)
+            self.line_start = self.lineStarts(self.text, 0, len(self.lines))
+            self.start_gap = len(self.lines)
+        old, line_start = self.text, self.line_start
+        prefix = commonPrefixLength(old, code_str)
+        if prefix == len(old) == len(code_str):
+            self.text = code_str
+            return 0
+        suffix = commonSuffixLength(old, code_str, min(len(old), len(code_str)) - prefix)
+        # prefix所在的行；前一个换行是\r时再退一行，避免与之后的\n（在另一份文本中）组成\r\n
+        first = max(self.lineIndex(prefix + 1) - 1, 0)
+        if first and old[self.lineStartAt(first) - 1] == "\r":
+            first -= 1
+        start = self.lineStartAt(first) if first < len(line_start) else len(old)
+        old_end = lineEnd(old, len(old) - suffix)
+        new_end = old_end + len(code_str) - len(old)
+        count = self.lineIndex(old_end) - first
+        window = code_str[start:new_end]
+        new_lines = window.splitlines()
+        moveGap(line_start, self.start_gap, first + count, len(old))
+        line_start[first:first + count] = self.lineStarts(window, start, len(new_lines))
+        relexed = self.edit(first, first + count, new_lines)
+        self.text = code_str
+        self.line_start = line_start
+        self.start_gap = first + len(new_lines)
+        return relexed
+
+    @staticmethod
+    def lineStarts(text, offset, count):
+        '''text中前count行的起始偏移（加上offset）'''
+        starts = array("i", [offset]) if count else array("i")
+        for match in LINE_BREAK.finditer(text):
+            if len(starts) == count:
+                break
+            starts.append(offset + match.end())
+        return starts
+
+    def lineStartAt(self, index):
+        '''第index行在self.text中的起始偏移'''
+        start = self.line_start[index]
+        return start + len(self.text) if index >= self.start_gap else start
+
+    def lineIndex(self, pos):
+        '''起始偏移不小于pos的第一行的下标（二分查找），pos为行首时即该行'''
+        lo, hi = 0, len(self.line_start)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.lineStartAt(mid) < pos:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def edit(self, start, end, text):
+        '''
+        将第start行（含）到第end行（不含）替换为text（字符串或行列表），返回重新扫描的行数
+        代价只与被修改的行数以及块注释状态需要重新传播的行数有关
+        '''
+        new_lines = text.splitlines() if isinstance(text, str) else list(text)
+        count = len(new_lines)
+        self.text = None
+        self.line_start = None
+        # 被替换的原有非空行数（TokenStore中的行数），重新扫描到其后的原有行时继续累加
+        first_row = start - self.blank.count(1, 0, start)
+        old_rows = (end - start) - self.blank.count(1, start, end)
+        # 原第end行开始时的状态，用于判断是否收敛
+        saved = self.states[end]
+        self.lines[start:end] = new_lines
+        self.spans[start:end] = [None] * count
+        self.blank[start:end] = b"\1" * count
+        self.failed -= self.ok[start:end].count(False)
+        self.ok[start:end] = [True] * count
+        if count:
+            # 新行（除第一行外）开始时的状态待计算，其后紧接原第end行的状态
+            self.states[start + 1:end + 1] = [None] * (count - 1) + [saved]
+        else:
+            del self.states[start + 1:end + 1]
+
+        state = self.states[start]
+        i = start
+        while i < len(self.lines):
+            if i >= start + count:
+                if state == saved:
+                    # 之后的行内容与开始状态都与原来相同，结果可以直接复用
+                    break
+                old_rows += not self.blank[i]
+            self.spans[i], state, ok = self.scanLine(self.lines[i], state)
+            # 原为True、现为False时加1，反之减1
+            self.failed += self.ok[i] - ok
+            self.ok[i] = ok
+            self.blank[i] = self.spans[i] is None
+            saved = self.states[i + 1]
+            self.states[i + 1] = state
+            i += 1
+
+        if self._store is not None:
+            changed = [k for k in range(start, i) if self.spans[k] is not None]
+            self._store.replaceLines(first_row, first_row + old_rows,
+                                     [self.lines[k] for k in changed], [self.spans[k] for k in changed])
+        return i - start
+
+    @property
+    def success(self):
+        return self.failed == 0
+
+    def getTokens(self):
+        '''
+        第一次调用时由各行的扫描结果组装TokenStore，之后的编辑直接替换其中的行（每次都返回同一个TokenStore）
+        编辑前由它得到的语法树、规约过程记录在编辑后读取文本时抛出RuntimeError，见TokenStore.checkVersion
+        '''
+        if self._store is None:
+            store = TokenStore()
+            for line, spans in zip(self.lines, self.spans):
+                if spans is not None:
+                    store.addLine(line, spans)
+            store.finish()
+            self._store = store
+        return self._store
+
+    def getLex(self):
+        '''与Lexer.getLex相同的返回值与中间产物'''
+        ret = self.getTokens()
+        self.lexer.sink.dumpRecords("lexer_out.json", ret)
+        return ret, self.success
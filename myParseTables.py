@@ -0,0 +1,377 @@
+"""
+语法分析表的紧凑表示：ACTION与GOTO都用行位移（comb vector）压缩到几个扁平的array("i")中
+ACTION的每个动作编码为一个有符号整数：
+- 0: 出错
+- k > 0: 移进，转到状态 k - 1
+- k < 0: 用产生式 -k - 1 规约；用增广产生式S'->Program规约即为接受
+"""
+
+import pprint
+import sys
+from array import array
+from collections import Counter
+
+# Parser.action_table中动作的类型
+ACTION_ACC = 0
+ACTION_S = 1
+ACTION_R = 2
+ActionType = ["acc", "s", "r"]
+
+ACTION_ERROR = 0
+
+
+def encodeAction(action, accept_production):
+    '''将(ACTION_ACC/ACTION_S/ACTION_R, 目标)编码为整数'''
+    kind, target = action
+    if kind == ACTION_ACC:
+        return -(accept_production + 1)
+    if kind == ACTION_S:
+        return target + 1
+    return -(target + 1)
+
+
+def packRows(rows, width):
+    '''
+    行位移压缩：为每行选一个位移base，使各行的非空项互不重叠地放进同一个扁平数组
+    参数：
+    - rows: 每行是{列号: 值}（值非0）
+    - width: 列数
+    返回：
+    - (base, check, value)：第row行第col列的项存在当且仅当 check[base[row] + col] == row
+    数组末尾留出width个空位，查表时不必检查下标越界
+    '''
+    base = array("i", [0]) * len(rows)
+    check = array("i")
+    value = array("i")
+    used_bases = set()
+    # 已占用的位置为1，按行的第一列查找空位，跳过不可能的位移
+    occupied = bytearray()
+    # 先放非空项多的行，更容易填满空隙
+    order = sorted(range(len(rows)), key=lambda r: -len(rows[r]))
+    for r in order:
+        columns = sorted(rows[r])
+        if not columns:
+            continue
+        first = columns[0]
+        b = 0
+        while True:
+            free = occupied.find(0, b + first)
+            if free >= 0:
+                b = free - first
+            else:
+                b = max(b, len(occupied) - first)
+            if b not in used_bases and all(b + c >= len(occupied) or not occupied[b + c] for c in columns):
+                break
+            b += 1
+        need = b + columns[-1] + 1 - len(check)
+        if need > 0:
+            check.extend(array("i", [-1]) * need)
+            value.extend(array("i", [0]) * need)
+            occupied.extend(bytes(need))
+        for c in columns:
+            check[b + c] = r
+            value[b + c] = rows[r][c]
+            occupied[b + c] = 1
+        base[r] = b
+        used_bases.add(b)
+    tail = max(base, default=0) + width + 1 - len(check)
+    if tail > 0:
+        check.extend(array("i", [-1]) * tail)
+        value.extend(array("i", [0]) * tail)
+    return base, check, value
+
+
+class PackedTables(object):
+    '''
+    由Parser的action_table/goto_table构造的紧凑分析表：
+    - ACTION按状态分行压缩；只有一致状态（所有动作都是同一个规约，没有移进与接受）以该规约作为默认动作，不再逐列保存。
+      其他状态的规约仍逐列保存。一致状态中出错的向前看符号会先做这个规约再在之后的状态报错，
+      分析器第一次对某个向前看符号使用默认动作时先用validLookahead检查，出错时直接报错，不做多余的规约
+    - GOTO按状态分行压缩，每个非终结符最常见的目标状态作为该列的默认值
+    有冲突的表项只保留第一个动作，与原先分析时取current_action_list[0]一致
+    '''
+
+    def __init__(self, action_table, goto_table, epsilon_id, accept_production):
+        self.terminal_count = epsilon_id
+        self.epsilon_id = epsilon_id
+        self.accept_production = accept_production
+        self.state_count = len(action_table)
+
+        rows = []
+        self.action_default = array("i", [ACTION_ERROR]) * self.state_count
+        for state, actions in enumerate(action_table):
+            row = {t: encodeAction(actions_list[0], accept_production) for t, actions_list in actions.items()}
+            codes = set(row.values())
+            if len(codes) == 1 and min(codes) < 0 and min(codes) != -(accept_production + 1):
+                self.action_default[state] = codes.pop()
+                row = {}
+            rows.append(row)
+        self.action_base, self.action_check, self.action_value = packRows(rows, self.terminal_count)
+
+        # GOTO的列号为非终结符编号减去epsilon_id
+        columns = {}
+        for gotos in goto_table:
+            for symbol, target in gotos.items():
+                columns.setdefault(symbol - epsilon_id, Counter())[target] += 1
+        width = max(columns, default=0) + 1
+        self.goto_default = array("i", [-1]) * width
+        for column, counter in columns.items():
+            self.goto_default[column] = counter.most_common(1)[0][0]
+        rows = []
+        for gotos in goto_table:
+            rows.append({symbol - epsilon_id: target + 1 for symbol, target in gotos.items()
+                         if self.goto_default[symbol - epsilon_id] != target})
+        self.goto_base, self.goto_check, self.goto_value = packRows(rows, width)
+
+    ARRAYS = ("action_base", "action_check", "action_value", "action_default",
+              "goto_base", "goto_check", "goto_value", "goto_default")
+
+    def dump(self):
+        '''返回可用marshal序列化的数据，各数组保存为bytes'''
+        data = {name: getattr(self, name).tobytes() for name in self.ARRAYS}
+        data["meta"] = (self.epsilon_id, self.accept_production, self.state_count)
+        data["byteorder"] = sys.byteorder
+        return data
+
+    @classmethod
+    def load(cls, data):
+        '''由dump的结果还原，跳过行位移压缩；各数组的长度与查表时的下标范围不符时抛出ValueError'''
+        packed = cls.__new__(cls)
+        packed.epsilon_id, packed.accept_production, packed.state_count = data["meta"]
+        packed.terminal_count = packed.epsilon_id
+        for name in cls.ARRAYS:
+            a = array("i")
+            a.frombytes(data[name])
+            if data.get("byteorder", sys.byteorder) != sys.byteorder:
+                a.byteswap()
+            setattr(packed, name, a)
+        packed.checkShape()
+        return packed
+
+    def checkShape(self):
+        '''检查各数组的长度：每个状态一个位移与默认动作，查表的下标base + 列号不越界'''
+        width = len(self.goto_default)
+        if (
+            len(self.action_base) != self.state_count or len(self.action_default) != self.state_count
+            or len(self.goto_base) != self.state_count
+            or len(self.action_check) != len(self.action_value) or len(self.goto_check) != len(self.goto_value)
+            or max(self.action_base, default=0) + self.terminal_count > len(self.action_check)
+            or max(self.goto_base, default=0) + width > len(self.goto_check)
+            or min(self.action_base, default=0) < 0 or min(self.goto_base, default=0) < 0
+        ):
+            raise ValueError("packed tables have inconsistent array lengths")
+
+    def action(self, state, terminal_id):
+        '''返回编码后的动作，0表示出错'''
+        i = self.action_base[state] + terminal_id
+        if self.action_check[i] == state:
+            return self.action_value[i]
+        return self.action_default[state]
+
+    def validLookahead(self, states, terminal_id, production_lhs, production_length):
+        '''
+        不修改状态栈states，模拟在向前看符号terminal_id上的规约，返回最终能否移进或接受
+        只记录弹出到的深度与新压入的状态，不复制整个栈
+        '''
+        accept = -(self.accept_production + 1)
+        depth = len(states)
+        pushed = []
+        while True:
+            code = self.action(pushed[-1] if pushed else states[depth - 1], terminal_id)
+            if code == ACTION_ERROR:
+                return False
+            if code > 0 or code == accept:
+                return True
+            production_id = -code - 1
+            length = production_length[production_id]
+            if length > len(pushed):
+                depth -= length - len(pushed)
+                pushed.clear()
+            elif length:
+                del pushed[-length:]
+            pushed.append(self.goto(pushed[-1] if pushed else states[depth - 1], production_lhs[production_id]))
+
+    def goto(self, state, symbol_id):
+        '''返回GOTO(state, 非终结符symbol_id)的目标状态'''
+        column = symbol_id - self.epsilon_id
+        i = self.goto_base[state] + column
+        if self.goto_check[i] == state:
+            return self.goto_value[i] - 1
+        return self.goto_default[column]
+
+    def nbytes(self):
+        '''各数组占用的字节数之和'''
+        return sum(len(a) * a.itemsize for a in (getattr(self, name) for name in self.ARRAYS))
+
+    def actionTable(self):
+        '''
+        还原为Parser.action_table的格式（[{终结符id: [(动作类型, 目标)]}]），用于显示
+        默认规约会填入该状态所有没有显式动作的列，与压缩表分析时的行为一致
+        '''
+        table = []
+        for state in range(self.state_count):
+            actions = {}
+            for terminal_id in range(self.terminal_count):
+                code = self.action(state, terminal_id)
+                if code == -(self.accept_production + 1):
+                    actions[terminal_id] = [(ACTION_ACC, 0)]
+                elif code > 0:
+                    actions[terminal_id] = [(ACTION_S, code - 1)]
+                elif code < 0:
+                    actions[terminal_id] = [(ACTION_R, -code - 1)]
+            table.append(actions)
+        return table
+
+    def gotoTable(self):
+        '''还原为Parser.goto_table的格式（[{非终结符id: 目标状态}]），各列的默认值同样填入每个状态'''
+        width = len(self.goto_default)
+        return [
+            {self.epsilon_id + column: self.goto(state, self.epsilon_id + column)
+             for column in range(width) if self.goto(state, self.epsilon_id + column) >= 0}
+            for state in range(self.state_count)
+        ]
+
+
+# renderTablesModule生成的模块中，查表与分析的代码；只依赖标准库
+TABLES_MODULE_DRIVER = '''
+
+def _array(name):
+    a = array("i")
+    a.frombytes(PACKED[name])
+    if PACKED["byteorder"] != sys.byteorder:
+        a.byteswap()
+    return a
+
+
+ACTION_BASE = _array("action_base")
+ACTION_CHECK = _array("action_check")
+ACTION_VALUE = _array("action_value")
+ACTION_DEFAULT = _array("action_default")
+GOTO_BASE = _array("goto_base")
+GOTO_CHECK = _array("goto_check")
+GOTO_VALUE = _array("goto_value")
+GOTO_DEFAULT = _array("goto_default")
+
+
+def action(state, terminal_id):
+    \'\'\'编码后的动作：0出错，k > 0移进到状态k - 1，k < 0用产生式-k - 1规约\'\'\'
+    i = ACTION_BASE[state] + terminal_id
+    if ACTION_CHECK[i] == state:
+        return ACTION_VALUE[i]
+    return ACTION_DEFAULT[state]
+
+
+def goto(state, symbol_id):
+    column = symbol_id - EPSILON_ID
+    i = GOTO_BASE[state] + column
+    if GOTO_CHECK[i] == state:
+        return GOTO_VALUE[i] - 1
+    return GOTO_DEFAULT[column]
+
+
+def valid_lookahead(stack, terminal_id):
+    \'\'\'不修改stack，模拟在向前看符号上的规约，返回最终能否移进或接受\'\'\'
+    accept = -(ACCEPT_PRODUCTION + 1)
+    depth = len(stack)
+    pushed = []
+    while True:
+        code = action(pushed[-1] if pushed else stack[depth - 1], terminal_id)
+        if code == 0:
+            return False
+        if code > 0 or code == accept:
+            return True
+        production_id = -code - 1
+        length = PRODUCTION_LENGTH[production_id]
+        if length > len(pushed):
+            depth -= length - len(pushed)
+            pushed.clear()
+        elif length:
+            del pushed[-length:]
+        pushed.append(goto(pushed[-1] if pushed else stack[depth - 1], PRODUCTION_LHS[production_id]))
+
+
+def parse(terminal_ids, on_reduce=None):
+    \'\'\'
+    分析终结符编号序列（TERMINALS中的下标，以"#"结尾），每次规约调用on_reduce(产生式编号)
+    返回：接受时为-1，否则为出错的终结符在序列中的下标；出错的终结符不会先触发规约
+    \'\'\'
+    accept = -(ACCEPT_PRODUCTION + 1)
+    stack = [0]
+    index = -1
+    for index, terminal_id in enumerate(terminal_ids):
+        if terminal_id < 0:
+            return index
+        checked = False
+        while True:
+            state = stack[-1]
+            i = ACTION_BASE[state] + terminal_id
+            if ACTION_CHECK[i] == state:
+                code = ACTION_VALUE[i]
+            else:
+                code = ACTION_DEFAULT[state]
+                # 第一次使用默认规约前确认该向前看符号最终能被移进
+                if code and not checked:
+                    if not valid_lookahead(stack, terminal_id):
+                        code = 0
+                    checked = True
+            if code == 0:
+                return index
+            if code == accept:
+                return -1
+            if code > 0:
+                stack.append(code - 1)
+                break
+            production_id = -code - 1
+            if PRODUCTION_LENGTH[production_id]:
+                del stack[-PRODUCTION_LENGTH[production_id]:]
+            stack.append(goto(stack[-1], PRODUCTION_LHS[production_id]))
+            if on_reduce is not None:
+                on_reduce(production_id)
+    return index + 1
+'''
+
+
+def renderTablesModule(terminals, non_terminals, productions, packed, header):
+    '''
+    生成独立的Python模块源码，包含符号表、产生式信息与压缩的ACTION/GOTO数组，以及一个分析驱动
+    参数：
+    - productions: [(左部符号id, 右部符号id元组)]，空产生式的右部为(epsilon_id,)
+    - packed: PackedTables
+    - header: {名字: 值}，写在模块开头的常量（如文法文件名、生成器版本）
+    '''
+    def literal(value):
+        return pprint.pformat(value, width=110, compact=True)
+
+    epsilon_id = packed.epsilon_id
+    lines = [
+        '"""',
+        "语法分析表，由myParser生成，请勿手动修改",
+        "用法：",
+        "    import 本模块; 本模块.parse(终结符编号序列)",
+        "    或 Parser(tables_module=本模块) 得到完整的语法/语义分析器",
+        '"""',
+        "import sys",
+        "from array import array",
+        "",
+    ]
+    for name, value in header.items():
+        lines.append(f"{name} = {literal(value)}")
+    lines += [
+        "",
+        f"TERMINALS = {literal(tuple(terminals))}",
+        f"NON_TERMINALS = {literal(tuple(non_terminals))}",
+        f"EPSILON_ID = {epsilon_id}",
+        f"ACCEPT_PRODUCTION = {packed.accept_production}",
+        f"STATE_COUNT = {packed.state_count}",
+        "",
+        "# 产生式：(左部符号id, 右部符号id)，空产生式的右部为(EPSILON_ID,)",
+        f"PRODUCTIONS = {literal(tuple((lhs, tuple(rhs)) for lhs, rhs in productions))}",
+        f"PRODUCTION_LHS = {literal(tuple(lhs for lhs, _ in productions))}",
+        "# 右部长度，空产生式为0",
+        f"PRODUCTION_LENGTH = {literal(tuple(0 if tuple(rhs) == (epsilon_id,) else len(rhs) for _, rhs in productions))}",
+        f"PRODUCTION_EPSILON = {literal(tuple(tuple(rhs) == (epsilon_id,) for _, rhs in productions))}",
+        "",
+        "# PackedTables.dump()的结果，数组按byteorder保存为bytes",
+        f"PACKED = {literal(packed.dump())}",
+    ]
+    return "\n".join(lines) + "\n" + TABLES_MODULE_DRIVER
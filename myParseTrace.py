@@ -0,0 +1,181 @@
+"""
+语法分析过程（界面“规约过程”页）的紧凑记录
+分析时每一步只追加几个整数，显示时才按需把若干行还原为文字
+"""
+
+from array import array
+
+from myToken import TokenStore
+
+HEADER = ['步骤', '状态栈', '符号栈', '待规约串', '动作说明']
+
+
+class ParseTrace(object):
+    '''
+    每一步只保存增量，存于几个array("i")中：
+    - action: 与myParseTables相同的编码，k > 0为移进到状态k - 1，k < 0为用产生式-k - 1规约
+    - symbol: 压栈的符号id（移进的终结符或规约得到的非终结符）
+    - state: 压栈的状态
+    - index: 这一步之后向前看token的下标
+    弹出的项数由产生式右部的长度得到
+    按原先parse_process_display的格式提供序列接口：trace[0]为表头，trace[1]为初始状态，trace[k + 1]为第k步；
+    取某一行时从最近的检查点开始重放状态栈与符号栈，重放中每CHECKPOINT步保存一个检查点
+    '''
+    CHECKPOINT = 256
+
+    def __init__(self, parser, lex=None):
+        '''
+        参数：
+        - parser: 产生该记录的Parser，用于取符号名与产生式
+        - lex: 输入的Token序列；为None时（迭代器输入）待规约串只显示当前的向前看符号，由add_lookahead记录
+        '''
+        self.parser = parser
+        self.lex = lex
+        # TokenStore输入时生成lookahead_values前检查其后没有增量编辑，见TokenStore.checkVersion
+        self.version = lex.version if isinstance(lex, TokenStore) else None
+        # 各token的prop.value，序列输入时在第一次取行时生成
+        self.lookahead_values = None if lex is not None else []
+        self.action = array("i")
+        self.symbol = array("i")
+        self.state = array("i")
+        self.index = array("i")
+        # 检查点：第k步之后的(状态栈, 符号栈)，k为CHECKPOINT的倍数；第0步即初始状态
+        self.checkpoints = {0: ((0,), ('#',))}
+        self.literals = {}
+
+    def add_lookahead(self, token):
+        '''迭代器输入时，记录读入的向前看token（None表示输入结束）'''
+        if self.lex is None and token is not None:
+            self.lookahead_values.append(token.prop.value)
+
+    def shift(self, terminal_id, state, index):
+        self.action.append(state + 1)
+        self.symbol.append(terminal_id)
+        self.state.append(state)
+        self.index.append(index)
+
+    def reduce(self, production_id, state, index):
+        self.action.append(-(production_id + 1))
+        self.symbol.append(self.parser.productions[production_id].non_terminal_symbol_id)
+        self.state.append(state)
+        self.index.append(index)
+
+    @staticmethod
+    def moved(steps, index):
+        '''steps中的各步放在第index个token处时的记录（index数组加上index）'''
+        action, symbol, state, relative = steps
+        return action, symbol, state, array("i", map(index.__add__, relative))
+
+    def extend(self, steps):
+        '''整段追加一段已分析过的输入的各步（增量分析拼接未改变的函数时），steps由moved得到'''
+        action, symbol, state, index = steps
+        self.action.extend(action)
+        self.symbol.extend(symbol)
+        self.state.extend(state)
+        self.index.extend(index)
+
+    def steps(self, first, last, index):
+        '''第first到last步（下标从0开始，含last）的(action, symbol, state, index)，index改为相对第index个token，见moved'''
+        return (
+            self.action[first:last + 1],
+            self.symbol[first:last + 1],
+            self.state[first:last + 1],
+            array("i", map((-index).__add__, self.index[first:last + 1])),
+        )
+
+    def __len__(self):
+        return len(self.action) + 2
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, stride = key.indices(len(self))
+            rows = self.rows(start, stop)
+            return rows[::stride] if stride != 1 else rows
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("parse trace row out of range")
+        return self.rows(key, key + 1)[0]
+
+    def pending_string(self, index):
+        if self.lex is not None:
+            if self.lookahead_values is None:
+                if self.version is not None:
+                    self.lex.checkVersion(self.version)
+                self.lookahead_values = [cur.prop.value for cur in self.lex]
+            return ', '.join(self.lookahead_values[index:])
+        if index < len(self.lookahead_values):
+            return self.lookahead_values[index] + ', ...'
+        return ''
+
+    def production_literal(self, production_id):
+        literal = self.literals.get(production_id)
+        if literal is None:
+            parser = self.parser
+            production = parser.productions[production_id]
+            literal = parser.get_str_by_id(production.non_terminal_symbol_id) + '->'
+            if production.to_ids == [parser.epsilon_id]:
+                literal += parser.get_str_by_id(parser.epsilon_id) + ' '
+            else:
+                for id in production.to_ids:
+                    literal += parser.get_str_by_id(id) + ' '
+            literal = literal.strip()
+            self.literals[production_id] = literal
+        return literal
+
+    def rows(self, start, stop):
+        '''返回第start到stop - 1行（含表头与初始状态两行）'''
+        rows = []
+        if start == 0 and stop > 0:
+            rows.append(list(HEADER))
+        if start <= 1 < stop:
+            rows.append(['0', '0', '#', self.pending_string(0), '初始状态'])
+        # 第k步对应第k + 1行
+        first, last = max(start - 1, 1), stop - 2
+        if first > last:
+            return rows
+        states, symbols = self.stacks_before(first)
+        for step in range(first, last + 1):
+            symbol = self.apply(step, states, symbols)
+            action = self.action[step - 1]
+            if action > 0:
+                description = f'移进“{symbol}”, 状态{self.state[step - 1]}压栈'
+            else:
+                description = f'使用产生式({self.production_literal(-action - 1)})进行规约'
+            rows.append([
+                str(step),
+                ' '.join(map(str, states)),
+                ' '.join(symbols),
+                self.pending_string(self.index[step - 1]),
+                description,
+            ])
+        return rows
+
+    def stacks_before(self, step):
+        '''第step步之前的(状态栈, 符号栈)，从不晚于它的最近检查点重放得到'''
+        base = min((step - 1) // self.CHECKPOINT * self.CHECKPOINT, max(self.checkpoints))
+        states, symbols = (list(stack) for stack in self.checkpoints[base])
+        for k in range(base + 1, step):
+            self.apply(k, states, symbols)
+        return states, symbols
+
+    def apply(self, step, states, symbols):
+        '''在状态栈与符号栈上重放第step步，返回压栈的符号名；经过CHECKPOINT的倍数时保存检查点'''
+        parser = self.parser
+        action = self.action[step - 1]
+        if action > 0:
+            symbol = parser.terminal_symbols[self.symbol[step - 1]]
+        else:
+            production = parser.productions[-action - 1]
+            if production.to_ids != [parser.epsilon_id]:
+                del states[-len(production.to_ids):]
+                del symbols[-len(production.to_ids):]
+            symbol = parser.get_str_by_id(self.symbol[step - 1])
+        states.append(self.state[step - 1])
+        symbols.append(symbol)
+        if step % self.CHECKPOINT == 0 and step not in self.checkpoints:
+            self.checkpoints[step] = (tuple(states), tuple(symbols))
+        return symbol
@@ -1,13 +1,25 @@
+import argparse
+import contextlib
+import copy
+import hashlib
 import json
+import os
 import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 
-from mySemantic import Semantic
-from tokenType import tokenType_to_terminal, tokenType
+from myArtifact import ArtifactSink
+from myCST import CST, CSTNode, TokenSpan, TokenText
+from myParseTables import ACTION_ACC, ACTION_S, ACTION_R, ACTION_ERROR, ActionType, PackedTables, renderTablesModule
+from myParseTrace import ParseTrace
+from mySemantic import Quaternion, Semantic
+from myToken import KIND_TERMINALS, Token, TokenStore
+from tokenType import tokenType, terminalSymbols
 
-ACTION_ACC = 0
-ACTION_S = 1
-ACTION_R = 2
-ActionType = ["acc", "s", "r"]
+# 分析表生成器的版本，构造算法或缓存的数据格式改变时递增，使磁盘上的旧缓存失效
+TABLE_GENERATOR_VERSION = 3
 
 
 class Production:
@@ -47,6 +59,15 @@ class LR1Item:
             other.terminal_id,
         )
 
+    def __hash__(self):
+        # 与__eq__一致，使项目可以放入集合、作为字典的键
+        return hash((self.production_id, self.dot_pos, self.terminal_id))
+
+    @property
+    def key(self):
+        # 项目对应的元组(产生式编号, 点位置, 展望符)
+        return (self.production_id, self.dot_pos, self.terminal_id)
+
 
 class Closure:
     def __init__(self):
@@ -54,6 +75,20 @@ class Closure:
         self.id = 0
         # 项目集，包含若干 LR(1) 项（LR1Item 实例）
         self.items = []
+        # 与items相同的项目，用于O(1)判断项目是否已在项目集中
+        self.item_set = set()
+
+    def add(self, item):
+        # 加入一个项目，已存在时返回False
+        if item in self.item_set:
+            return False
+        self.item_set.add(item)
+        self.items.append(item)
+        return True
+
+    def kernel_key(self):
+        # 以当前项目（求闭包之前即为核心项目）构成的不可变集合，作为状态索引的键
+        return frozenset(item.key for item in self.items)
 
     def __lt__(self, other):
         # 定义“小于”操作符，根据 id 比较
@@ -79,86 +114,249 @@ class Closure:
 
 
 class Parser:
-    terminal_symbols = [
-        "i32",
-        "let",
-        "if",
-        "else",
-        "while",
-        "return",
-        "mut",
-        "fn",
-        "for",
-        "in",
-        "loop",
-        "break",
-        "continue",
-
-        "identifier",
-        "integer_constant",
-        "floating_point_constant",
-
-        "=",
-        "+",
-        "-",
-        "*",
-        "/",
-        "%",
-        "+=",
-        "-=",
-        "*=",
-        "/=",
-        "%=",
-
-        ">>",
-        ">>=",
-        "<<",
-        "<<=",
-
-        "==",
-        ">",
-        ">=",
-        "<",
-        "<=",
-        "!=",
-
-        "(",
-        ")",
-        "[",
-        "]",
-        "{",
-        "}",
-
-        ",",
-        ":",
-        ";",
-
-        "->",
-        ".",
-        "..",
-        "#",
-    ]
-
-    def __init__(self, filename="mytest.cfg"):
+    terminal_symbols = terminalSymbols
+    # 分析表的构造方式：规范LR(1)，或合并同心状态的LALR(1)
+    TABLE_MODES = ("lr1", "lalr1")
+    # 语法分析的模式：只做语法检查、语法检查加语义分析、另外建立语法树，见getParse
+    PARSE_MODES = ("recognize", "semantic", "full")
+
+    def __init__(
+        self, filename="mytest.cfg", sink=None, table_mode="lr1", cache=None, tables_module=None, profile=False, workers=1,
+        parse_mode="full"
+    ):
+        """
+        参数：
+        - filename: 文法配置文件
+        - sink: 中间产物写出层
+        - table_mode: 分析表构造方式，"lr1"或"lalr1"
+        - cache: 分析表的磁盘缓存（myTableCache.ParserTableCache），为None时每次都重新构造
+        - tables_module: write_tables_module生成的模块，给出时直接使用其中的分析表，
+          不读取文法文件，忽略filename、table_mode与cache
+        - profile: 为True时用tracemalloc记录构造各阶段的峰值内存（会使构造变慢）；各阶段的耗时总会记录，
+          见get_build_statistics
+        - workers: 构造项目集族时使用的进程数，大于1时并行求闭包（见find_gos_parallel），结果与串行构造相同
+        - parse_mode: getParse的默认分析模式，"recognize"、"semantic"或"full"
+        """
+        if table_mode not in self.TABLE_MODES:
+            raise ValueError(f"Unknown table mode: {table_mode}")
+        if parse_mode not in self.PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {parse_mode}")
+        self.parse_mode = parse_mode
+        self.filename = filename
+        self.table_mode = table_mode
+        # 中间产物写出层，默认不写出parser_out.json与quaternation_out.json
+        self.sink = sink if sink is not None else ArtifactSink()
         self.epsilon_id = len(self.terminal_symbols)
+        self.clear_tables()
+
+        # 构造过程的统计：阶段名 -> {"seconds": 耗时, "peak_bytes": 峰值内存}，以及求闭包的次数
+        self.profile = profile
+        self.phase_stats = {}
+        self.closure_calls = 0
+
+        if tables_module is not None:
+            cache = None
+        key = cache.key(filename, self.terminal_symbols, table_mode, TABLE_GENERATOR_VERSION) if cache else None
+        tables = self.run_phase("load_cache", cache.load, filename, table_mode, key) if cache else None
+        if tables_module is not None:
+            self.table_source = "module"
+            self.run_phase("load_tables_module", self.load_tables_module, tables_module)
+        elif tables is not None:
+            try:
+                self.run_phase("load_tables", self.load_tables, tables)
+                self.table_source = "cache"
+            except (KeyError, IndexError, TypeError, ValueError):
+                # 格式正确的marshal数据也可能缺少键或数组形状不对：当作未命中，重新构造并覆盖缓存
+                self.clear_tables()
+                tables = None
+        if tables_module is None and tables is None:
+            self.table_source = "grammar"
+            self.run_phase("read_productions", self.read_productions, filename=filename)
+            self.run_phase("find_firsts", self.find_firsts)
+            self.run_phase("find_gos", self.find_gos, workers)
+            if table_mode == "lalr1":
+                self.run_phase("merge_lalr_states", self.merge_lalr_states)
+            self.run_phase("find_gotos_and_actions", self.find_gotos_and_actions)
+            # 分析时使用的压缩表，增广产生式S'->Program是最后一个产生式
+            self.packed = self.run_phase(
+                "pack_tables", PackedTables, self.action_table, self.goto_table, self.epsilon_id, len(self.productions) - 1
+            )
+            if cache:
+                self.run_phase("store_cache", cache.store, filename, table_mode, key, self.dump_tables())
+
+        self.semantic = None
+        self.semantic_quaternation = []
+        self.semantic_error_occur = False
+        self.semantic_error_message = []
+
+    def clear_tables(self):
+        """清空产生式、项目集族与分析表，回到读取文法之前的状态"""
         self.non_terminal_symbols = ["epsilon"]
         self.firsts = []
         self.productions = []
         self.closures = []
+        # 核心项目集 -> 状态编号，用于判断GO得到的项目集是否已经存在
+        self.closure_ids = {}
         self.gos = []
         self.goto_table = []
         self.action_table = []
         self.lr1_analysis_table = []
+        # LALR(1)合并同心状态时新产生的规约-规约冲突
+        self.lalr_conflicts = []
+        # ACTION表中有多个动作的表项，格式见find_conflicts
+        self.conflicts = []
 
-        self.read_productions(filename=filename)
-        self.find_firsts()
-        self.find_gos()
-        self.find_gotos_and_actions()
+    def run_phase(self, name, func, *args, **kwargs):
+        """
+        执行构造过程的一个阶段并返回其结果，耗时记入self.phase_stats[name]；
+        profile时同时记录该阶段内新分配内存的峰值（tracemalloc，未开启时临时开启）
+        """
+        if self.profile:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats = {"seconds": time.perf_counter() - start, "peak_bytes": None}
+            if self.profile:
+                stats["peak_bytes"] = tracemalloc.get_traced_memory()[1] - before
+                if started:
+                    tracemalloc.stop()
+            self.phase_stats[name] = stats
+
+    def get_build_statistics(self):
+        """
+        返回分析表构造的统计信息（可直接序列化为JSON）：
+        - source: 分析表来源，"grammar"（由文法构造）、"cache"或"module"
+        - phases: 各阶段的耗时与峰值内存（未开启profile时为None），按执行顺序；
+          get_action_table/get_goto_table被调用后也会出现在这里
+        - states、items_per_state（最大与平均项目数）、closure_calls（求闭包次数）、go_edges（GO表的边数）：
+          从缓存或模块载入时没有项目集与GO表，对应的值为None
+        - conflicts: ACTION表中的冲突，见find_conflicts；lalr_conflicts: LALR(1)合并新产生的冲突
+        """
+        has_items = self.table_source == "grammar"
+        items = [len(closure.items) for closure in self.closures]
+        return {
+            "grammar": self.filename,
+            "table_mode": self.table_mode,
+            "source": self.table_source,
+            "generator_version": TABLE_GENERATOR_VERSION,
+            "phases": {name: dict(stats) for name, stats in self.phase_stats.items()},
+            "total_seconds": sum(stats["seconds"] for stats in self.phase_stats.values()),
+            "terminals": self.epsilon_id,
+            "non_terminals": len(self.non_terminal_symbols) - 1,
+            "productions": len(self.productions),
+            "states": len(self.closures),
+            "items_per_state": {"max": max(items), "mean": sum(items) / len(items)} if has_items and items else None,
+            "closure_calls": self.closure_calls if has_items else None,
+            "go_edges": sum(len(go) for go in self.gos) if self.table_source != "module" else None,
+            "packed_bytes": self.packed.nbytes(),
+            "conflicts": self.conflicts,
+            "lalr_conflicts": self.lalr_conflicts,
+        }
+
+    def dump_tables(self):
+        """
+        返回分析所需的全部数据（只含int、str、list、tuple、dict，可用marshal序列化）：
+        非终结符表、产生式、FIRST集、GO表、GOTO表、ACTION表、LALR(1)合并产生的冲突与压缩表；
+        项目集族本身不保存，只保存状态数
+        """
+        return {
+            "non_terminal_symbols": self.non_terminal_symbols,
+            "productions": [(p.non_terminal_symbol_id, tuple(p.to_ids)) for p in self.productions],
+            "firsts": [tuple(first) for first in self.firsts],
+            "state_count": len(self.closures),
+            "gos": self.gos,
+            "goto_table": self.goto_table,
+            "action_table": self.action_table,
+            "lalr_conflicts": self.lalr_conflicts,
+            "packed": self.packed.dump(),
+        }
+
+    def load_tables(self, tables):
+        """
+        载入dump_tables的结果，代替read_productions到find_gotos_and_actions的整个构造过程
+        缺少键时抛出KeyError，各表的状态数与压缩表不一致时抛出ValueError
+        """
+        state_count = tables["state_count"]
+        if not len(tables["goto_table"]) == len(tables["action_table"]) == state_count:
+            raise ValueError("cached ACTION/GOTO tables do not match the state count")
+        self.non_terminal_symbols = tables["non_terminal_symbols"]
+        self.firsts = [set(first) for first in tables["firsts"]]
+        self.first_masks = [sum(1 << symbol for symbol in first) for first in self.firsts]
+        self.mask_bits_cache = {}
+        self.gos = tables["gos"]
+        self.goto_table = tables["goto_table"]
+        self.action_table = tables["action_table"]
+        self.lalr_conflicts = tables["lalr_conflicts"]
+        self.packed = PackedTables.load(tables["packed"])
+        if self.packed.state_count != state_count or self.packed.epsilon_id != self.epsilon_id:
+            raise ValueError("cached packed tables do not match the state count or terminal symbols")
+        self.set_productions(tables["productions"])
+        self.set_state_count(state_count)
+        self.conflicts = self.find_conflicts()
+
+    def set_productions(self, productions):
+        """由[(左部符号id, 右部符号id)]设置self.productions"""
+        self.productions = []
+        for i, (lhs, to_ids) in enumerate(productions):
+            production = Production()
+            production.id = i
+            production.non_terminal_symbol_id = lhs
+            production.to_ids = list(to_ids)
+            self.productions.append(production)
+
+    def set_state_count(self, count):
+        """只保留状态编号，缓存与生成的模块中没有项目"""
+        self.closures = []
+        for i in range(count):
+            closure = Closure()
+            closure.id = i
+            self.closures.append(closure)
 
-        self.semantic = None
-        self.semantic_quaternation = []
-        self.semantic_error_occur = False
-        self.semantic_error_message = []
+    def load_tables_module(self, module):
+        """
+        载入write_tables_module生成的模块；模块中只有分析所需的压缩表，FIRST集与GO表为空，
+        action_table/goto_table在需要显示时才由压缩表还原（默认规约与GOTO默认值会填满对应的行/列）
+        """
+        if tuple(module.TERMINALS) != tuple(self.terminal_symbols):
+            raise ValueError(f"{module.__name__} was generated for different terminal symbols, regenerate it")
+        if module.TABLE_GENERATOR_VERSION != TABLE_GENERATOR_VERSION:
+            raise ValueError(
+                f"{module.__name__} was generated by table generator version {module.TABLE_GENERATOR_VERSION}, "
+                f"expected {TABLE_GENERATOR_VERSION}, regenerate it"
+            )
+        self.table_mode = module.TABLE_MODE
+        self.non_terminal_symbols = list(module.NON_TERMINALS)
+        self.set_productions(module.PRODUCTIONS)
+        self.firsts = []
+        self.first_masks = []
+        self.mask_bits_cache = {}
+        self.gos = []
+        self.lalr_conflicts = []
+        self.packed = PackedTables.load(module.PACKED)
+        self.action_table = None
+        self.goto_table = None
+        self.set_state_count(module.STATE_COUNT)
+
+    def write_tables_module(self, path):
+        """将分析表写为独立的Python模块（见myParseTables.renderTablesModule），之后可以不带文法文件使用"""
+        with open(self.filename, "rb") as f:
+            grammar_digest = hashlib.sha256(f.read()).hexdigest()
+        header = {
+            "GRAMMAR": os.path.basename(self.filename),
+            "GRAMMAR_SHA256": grammar_digest,
+            "TABLE_MODE": self.table_mode,
+            "TABLE_GENERATOR_VERSION": TABLE_GENERATOR_VERSION,
+        }
+        productions = [(p.non_terminal_symbol_id, p.to_ids) for p in self.productions]
+        source = renderTablesModule(self.terminal_symbols, self.non_terminal_symbols, productions, self.packed, header)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
 
     def get_id_by_str(self, symbol: str) -> int:
         # 根据symbol获取对应的id，先是终结符，再是非终结符
@@ -240,57 +438,151 @@ class Parser:
         """
         计算文法的First集合。
         First集合是文法中每个非终结符的一个集合，包含其能推导出的所有可能的首终结符（终结符或epsilon）。
-        返回：无，直接更新self.firsts列表。
-        注意：
-        - self.terminal_symbols: 终结符列表
-        - self.non_terminal_symbols: 非终结符列表
-        - self.productions: 产生式规则列表
-        - self.firsts: 存储First集合的列表，每个元素是一个集合，对应一个非终结符的First集合。
-        """
-        # 初始化终结符：FIRST(x) = {x} 和 FIRST(epsilon) = {epsilon}
-        for i in range(self.epsilon_id + 1):
-            self.firsts.append({i})
-        # 初始化非终结符：FIRST(X) = ∅
-        for i in range(len(self.non_terminal_symbols) - 1):
-            self.firsts.append(set())
-
-        # 反复迭代直到收敛
-        while self._update_first_sets():
-            continue
-        return
-
-    def _update_first_sets(self):
-        """
-        尝试更新所有非终结符的 FIRST 集合。
-        如果本轮有任何一个 FIRST 集合发生变化，则返回 True。
-        否则返回 False，说明已收敛。
-        """
-        updated = False
+        每个符号的FIRST集用整数位集表示（第k位为1表示终结符k属于该集合，第epsilon_id位表示可空），存于self.first_masks：
+        1. 先求出可空的非终结符（_find_nullable）
+        2. 若A的某个产生式右部中，B之前的符号都可空，则FIRST(A)依赖FIRST(B)；
+           按这一依赖关系求强连通分量，同一分量中的非终结符互相依赖，FIRST集（除epsilon外）相同
+        3. 按逆拓扑序处理各分量，分量依赖的其他分量都已算完，每个分量只需一遍即可得到结果
+        返回：无，更新self.first_masks，并同步为集合形式的self.firsts。
+        """
+        epsilon_bit = 1 << self.epsilon_id
+        symbol_count = self.epsilon_id + len(self.non_terminal_symbols)
+        # 终结符：FIRST(x) = {x}，FIRST(epsilon) = {epsilon}
+        masks = [1 << i for i in range(self.epsilon_id + 1)] + [0] * (symbol_count - self.epsilon_id - 1)
+        nullable = self._find_nullable(symbol_count)
+
+        # 每个非终结符直接得到的终结符，以及依赖的非终结符
+        direct = [0] * symbol_count
+        depends = [[] for _ in range(symbol_count)]
         for production in self.productions:
-            A = production.non_terminal_symbol_id  # 左部编号
-            rhs = production.to_ids  # 右部符号列表
-
-            for i, symbol in enumerate(rhs):
-                if symbol <= self.epsilon_id:
-                    # 是终结符或者epsilon：FIRST(A) += symbol
-                    if symbol not in self.firsts[A]:
-                        self.firsts[A].add(symbol)
-                        updated = True
+            A = production.non_terminal_symbol_id
+            for symbol in production.to_ids:
+                if symbol < self.epsilon_id:
+                    direct[A] |= 1 << symbol
                     break
-                else:
-                    # 是非终结符：FIRST(A) += FIRST(symbol) - {ε}
-                    for sym in self.firsts[symbol]:
-                        if sym != self.epsilon_id and sym not in self.firsts[A]:
-                            self.firsts[A].add(sym)
-                            updated = True
-                    # 如果该非终结符不能推出 ε，停止处理当前产生式
-                    if self.epsilon_id not in self.firsts[symbol]:
+                if symbol > self.epsilon_id:
+                    depends[A].append(symbol)
+                    if not nullable[symbol]:
                         break
-                    # 如果所有符号都能推出 ε，最后也要加入 ε
-                    if i == len(rhs) - 1 and self.epsilon_id not in self.firsts[A]:
-                        self.firsts[A].add(self.epsilon_id)
-                        updated = True
-        return updated
+
+        for component in self._strongly_connected_components(depends, range(self.epsilon_id + 1, symbol_count)):
+            mask = 0
+            for A in component:
+                mask |= direct[A]
+                for B in depends[A]:
+                    mask |= masks[B]
+            mask &= ~epsilon_bit
+            for A in component:
+                masks[A] = mask | (epsilon_bit if nullable[A] else 0)
+
+        self.first_masks = masks
+        self.mask_bits_cache = {}
+        self.firsts = [set(self.mask_bits(mask)) for mask in masks]
+
+    def _find_nullable(self, symbol_count):
+        """
+        求各符号能否推导出epsilon：记录每个产生式右部中尚未确定可空的符号个数，
+        某个非终结符确定可空时只更新用到它的产生式，每个产生式的每个符号只处理一次
+        """
+        nullable = [False] * symbol_count
+        remaining = []
+        users = [[] for _ in range(symbol_count)]
+        queue = []
+        for production in self.productions:
+            count = 0
+            for symbol in production.to_ids:
+                if symbol < self.epsilon_id:
+                    # 含终结符的产生式不可能推导出epsilon
+                    count = -1
+                    break
+                if symbol > self.epsilon_id:
+                    count += 1
+                    users[symbol].append(production.id)
+            remaining.append(count)
+            if count == 0 and not nullable[production.non_terminal_symbol_id]:
+                nullable[production.non_terminal_symbol_id] = True
+                queue.append(production.non_terminal_symbol_id)
+        while queue:
+            symbol = queue.pop()
+            for production_id in users[symbol]:
+                remaining[production_id] -= 1
+                A = self.productions[production_id].non_terminal_symbol_id
+                if remaining[production_id] == 0 and not nullable[A]:
+                    nullable[A] = True
+                    queue.append(A)
+        return nullable
+
+    @staticmethod
+    def _strongly_connected_components(edges, nodes):
+        """
+        Tarjan算法（非递归），按逆拓扑序返回强连通分量：每个分量都排在它所依赖的分量之后
+        参数：
+        - edges: edges[v]为v指向的结点列表
+        - nodes: 起始结点
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(edges[root]))]
+            while work:
+                v, successors = work[-1]
+                for w in successors:
+                    if w not in index:
+                        index[w] = low[w] = len(index)
+                        stack.append(w)
+                        on_stack.add(w)
+                        work.append((w, iter(edges[w])))
+                        break
+                    if w in on_stack:
+                        low[v] = min(low[v], index[w])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[v])
+                    if low[v] == index[v]:
+                        component = []
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            component.append(w)
+                            if w == v:
+                                break
+                        components.append(component)
+        return components
+
+    def mask_bits(self, mask):
+        """位集中为1的位，从低到高；相同的位集只拆分一次"""
+        bits = self.mask_bits_cache.get(mask)
+        if bits is None:
+            bits = []
+            rest = mask
+            while rest:
+                low = rest & -rest
+                bits.append(low.bit_length() - 1)
+                rest ^= low
+            bits = tuple(bits)
+            self.mask_bits_cache[mask] = bits
+        return bits
+
+    def find_first_mask(self, alpha):
+        """句子alpha的FIRST集（位集），alpha的所有符号都可空（包括alpha为空）时包含epsilon位"""
+        epsilon_bit = 1 << self.epsilon_id
+        mask = 0
+        for symbol in alpha:
+            first = self.first_masks[symbol]
+            mask |= first & ~epsilon_bit
+            if not first & epsilon_bit:
+                return mask
+        return mask | epsilon_bit
 
     def find_firsts_alpha(self, alpha, firsts):
         """
@@ -299,32 +591,46 @@ class Parser:
         - alpha: 包含整数的列表，表示句子中的符号序列。
         - firsts: 用于存储句子First集合的集合，该集合将被清空并更新。
         注意：
-        - self.firsts: 存储文法非终结符First集合的列表。
-        - self.terminal_symbols: 终结符列表。
+        - 由find_first_mask按位集计算，再转为集合
         """
         firsts.clear()  # 清空传入的firsts集合
-        for i in range(len(alpha)):
-            for cnt in self.firsts[alpha[i]]:
-                if cnt != self.epsilon_id:
-                    firsts.add(cnt)  # 将文法非终结符的First集合添加到句子First集合中
-            if self.epsilon_id not in self.firsts[alpha[i]]:
-                break  # 如果epsilon不在当前符号的First集合中，终止循环
-            if (
-                    i == len(alpha) - 1
-                    and self.epsilon_id in self.firsts[alpha[i]]
-            ):
-                # 如果是句子的最后一个符号，并且epsilon在其First集合中，添加epsilon到句子First集合中
-                firsts.add(self.epsilon_id)
+        firsts.update(self.mask_bits(self.find_first_mask(alpha)))
+
+    def index_productions(self):
+        """
+        建立非终结符到其产生式编号列表的索引self.productions_by_lhs，
+        并清空产生式后缀FIRST集的缓存self.suffix_firsts
+        """
+        self.productions_by_lhs = {}
+        for production in self.productions:
+            self.productions_by_lhs.setdefault(production.non_terminal_symbol_id, []).append(production.id)
+        self.suffix_firsts = {}
+
+    def find_firsts_suffix(self, production_id, pos):
+        """
+        求产生式右部从pos开始的后缀β的FIRST集，结果只与(产生式, 位置)有关，因此缓存起来。
+        返回：
+        - (FIRST(β) - {epsilon}的位集, β能否推导出epsilon)
+        """
+        key = (production_id, pos)
+        if key not in self.suffix_firsts:
+            mask = self.find_first_mask(self.productions[production_id].to_ids[pos:])
+            epsilon_bit = 1 << self.epsilon_id
+            self.suffix_firsts[key] = (mask & ~epsilon_bit, bool(mask & epsilon_bit))
+        return self.suffix_firsts[key]
 
     def find_closures(self, closure):
         """
         找闭包的实现，若有项目[A→α·Bβ,b]属于CLOSURE(I)，B→γ是文法中的产生式，β∈V*，c∈FIRST(βb)，则[B→·γ,c]也属于CLOSURE(I)中。
+        核心（产生式, 点位置）相同的项目合并处理：FIRST(β)部分只在核心第一次出现时传播一次，
+        之后同核心的项目只需在β可空时传播自己的展望符b；FIRST(β)以位集形式按(产生式, 位置)缓存，
+        FIRST(βb)即位或运算，B的产生式由self.productions_by_lhs直接得到。
         参数：
         - closure: 闭包对象，其中包含项目的集合。
-        注意：
-        - self.productions: 存储文法产生式的列表。
-        - self.terminal_symbols: 存储终结符的列表。
         """
+        self.closure_calls += 1
+        # 已经传播过FIRST(β)的核心
+        expanded = set()
         # 对于给定闭包中的每个项目
         i = 0
         while i < len(closure.items):
@@ -340,29 +646,30 @@ class Parser:
             # 如果该符号是终结符或epsilon，跳过
             if symbol_id <= self.epsilon_id:
                 continue
-            # 对于每个产生式
-            for j in range(len(self.productions)):
-                # 如果产生式的左侧是当前符号 ID
-                if self.productions[j].non_terminal_symbol_id == symbol_id:
-                    # 创建新的项目
-                    alpha = []
-                    # 从当前产生式符号的下一个开始遍历，如果不是epsilon
-                    for k in range(lr1_item.dot_pos + 1, len(production.to_ids), ):
-                        if production.to_ids[k] != self.epsilon_id:
-                            alpha.append(production.to_ids[k])
-                    alpha.append(lr1_item.terminal_id)
-                    # 计算后继符号的first集
-                    firsts = set()
-                    self.find_firsts_alpha(alpha, firsts)
-                    # 对于每个first集合中的符号，创建新的项目并加入闭包
-                    for first in firsts:
-                        item = LR1Item(j, 0, first)
-                        if item not in closure.items:
-                            closure.items.append(item)
-
-    def find_gos(self):
+            targets = self.productions_by_lhs.get(symbol_id, ())
+            firsts, nullable = self.find_firsts_suffix(lr1_item.production_id, lr1_item.dot_pos + 1)
+            core = (lr1_item.production_id, lr1_item.dot_pos)
+            if core in expanded:
+                # FIRST(β)对应的项目都已在闭包中，只可能新增展望符b
+                if nullable:
+                    for j in targets:
+                        closure.add(LR1Item(j, 0, lr1_item.terminal_id))
+                continue
+            expanded.add(core)
+            # 计算后继符号的first集：FIRST(βb)的位集
+            if nullable:
+                firsts |= 1 << lr1_item.terminal_id
+            # 对于每个first集合中的符号（按终结符编号从小到大），创建新的项目并加入闭包
+            firsts = self.mask_bits(firsts)
+            for j in targets:
+                for first in firsts:
+                    closure.add(LR1Item(j, 0, first))
+
+    def find_gos(self, workers=1):
         """
         找Go表的实现。
+        参数：
+        - workers: 大于1时用find_gos_parallel在多个进程中求闭包，得到的项目集族与编号与串行构造完全相同
         注意：
         - self.productions: 存储文法产生式的列表。
         - self.terminal_symbols: 存储终结符的列表。
@@ -376,19 +683,26 @@ class Parser:
         new_production.non_terminal_symbol_id = self.epsilon_id + len(self.non_terminal_symbols)  # S
         new_production.to_ids.append(self.get_id_by_str("Program"))  # Program
         self.productions.append(new_production)  # S -> Program作为最后一个产生式
+        self.index_productions()
         # 创建初始项，表示S->.Program,#
         new_item = LR1Item(len(self.productions) - 1, 0, self.get_id_by_str("#"))
 
         # 创建初始闭包，包含初始项
         start_closure = Closure()
         start_closure.id = 0
-        start_closure.items.append(new_item)
+        start_closure.add(new_item)
+        start_key = start_closure.kernel_key()
+
+        if workers > 1:
+            self.find_gos_parallel(start_closure, workers)
+            return
 
         # 找初始闭包的闭包
         self.find_closures(start_closure)
 
         # 将初始闭包及其映射加入闭包列表和映射列表
         self.closures.append(start_closure)
+        self.closure_ids[start_key] = 0
         self.gos.append({})
 
         # 初始化当前闭包标识
@@ -396,44 +710,148 @@ class Parser:
 
         # 遍历闭包列表，构建闭包的后继闭包及其映射
         while now_closure_id < len(self.closures):
-            # 遍历所有终结符和非终结符的编号
-            for i in range(self.epsilon_id + len(self.non_terminal_symbols) + 1):
-                if i == self.epsilon_id:  # epsilon
-                    continue
-                # 创建新的闭包
-                tmp = Closure()
-                # 遍历当前闭包中的每个项
-                for item in self.closures[now_closure_id].items:
-                    production = self.productions[item.production_id]
-                    # 如果项的点位置已经到达产生式右侧的末尾，跳过
-                    if len(production.to_ids) == item.dot_pos:
-                        continue
-                    # 如果产生式右侧的下一位符号的编号是当前遍历的编号
-                    if production.to_ids[item.dot_pos] == i:
-                        # 创建新的项，表示将点向后移动一位
-                        new_item = LR1Item(
-                            item.production_id, item.dot_pos + 1, item.terminal_id
-                        )
-                        tmp.items.append(new_item)
-                # 如果新的闭包中有项
-                if tmp.items:
-                    # 找新闭包的闭包
+            kernels = self.find_successor_kernels(self.closures[now_closure_id])
+
+            # 只处理出现在点后的符号，按符号编号从小到大，与状态编号的顺序保持一致
+            for i in sorted(kernels):
+                tmp = kernels[i]
+                # GO得到的核心项目点都不在最左端，闭包只会加入点在最左端的项目，
+                # 因此核心项目集相同与闭包相同等价，按核心项目集查找已有状态，不必先求闭包
+                key = tmp.kernel_key()
+                # 如果找到相同的闭包，更新映射
+                if key in self.closure_ids:
+                    self.gos[now_closure_id][i] = self.closure_ids[key]
+                # 如果未找到相同的闭包，求闭包后添加新的闭包及其映射
+                else:
                     self.find_closures(tmp)
-                    # 如果找到相同的闭包，更新映射
-                    if tmp in self.closures:
-                        if i in self.gos[now_closure_id].keys():
-                            print("Error: Go table error")
-                        self.gos[now_closure_id][i] = self.closures.index(tmp)
-                    # 如果未找到相同的闭包，添加新的闭包及其映射
-                    else:
+                    tmp.id = len(self.closures)
+                    self.closures.append(tmp)
+                    self.closure_ids[key] = tmp.id
+                    self.gos.append({})
+                    self.gos[now_closure_id][i] = tmp.id
+
+            now_closure_id += 1
+
+    def find_successor_kernels(self, closure):
+        """
+        一次遍历闭包中的每个项，按点后的符号分组，返回{符号: 后继闭包的核心项目（Closure，尚未求闭包）}
+        核心项目的顺序即它们在closure中的顺序
+        """
+        kernels = {}
+        for item in closure.items:
+            production = self.productions[item.production_id]
+            # 如果项的点位置已经到达产生式右侧的末尾，跳过
+            if len(production.to_ids) == item.dot_pos:
+                continue
+            i = production.to_ids[item.dot_pos]
+            if i == self.epsilon_id:  # epsilon
+                continue
+            if i not in kernels:
+                kernels[i] = Closure()
+            # 创建新的项，表示将点向后移动一位
+            kernels[i].add(LR1Item(item.production_id, item.dot_pos + 1, item.terminal_id))
+        return kernels
+
+    def find_gos_parallel(self, start_closure, workers):
+        """
+        按层构造项目集族：每一层是上一层新发现、尚未求闭包的状态，分片交给进程池，
+        各进程对每个核心项目集求闭包及各后继的核心项目集（_expand_kernels）；
+        主进程按状态编号、再按符号编号的顺序对后继去重并分配编号。
+        串行构造按编号依次处理状态、新状态追加到末尾，与逐层处理的顺序相同，
+        每个新状态的核心项目也来自同一个最先发现它的状态，因此项目集族、项目顺序与编号都与串行构造一致
+        """
+        start_kernel = tuple(item.key for item in start_closure.items)
+        self.closures.append(start_closure)
+        self.closure_ids[start_closure.kernel_key()] = 0
+        self.gos.append({})
+        kernels = [start_kernel]
+        frontier = [0]
+        initargs = (self.productions, self.epsilon_id, self.first_masks)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_closure_worker, initargs=initargs) as pool:
+            while frontier:
+                # 每个进程分到约4片，减少各片耗时不均造成的等待
+                size = max(1, -(-len(kernels) // (workers * 4)))
+                chunks = [kernels[k:k + size] for k in range(0, len(kernels), size)]
+                # 按顺序逐片取回结果，主进程处理已完成的分片时其他进程继续计算后面的分片
+                results = (result for chunk in pool.map(_expand_kernels, chunks) for result in chunk)
+                self.closure_calls += len(frontier)
+
+                next_frontier = []
+                next_kernels = []
+                for state, (items, successors) in zip(frontier, results):
+                    closure = self.closures[state]
+                    closure.items = [LR1Item(*key) for key in items]
+                    closure.item_set = set(closure.items)
+                    for symbol in sorted(successors):
+                        kernel = successors[symbol]
+                        key = frozenset(kernel)
+                        if key in self.closure_ids:
+                            self.gos[state][symbol] = self.closure_ids[key]
+                            continue
+                        tmp = Closure()
                         tmp.id = len(self.closures)
                         self.closures.append(tmp)
+                        self.closure_ids[key] = tmp.id
                         self.gos.append({})
-                        if i in self.gos[now_closure_id].keys():
-                            print("Error: Go table error")
-                        self.gos[now_closure_id][i] = tmp.id
+                        self.gos[state][symbol] = tmp.id
+                        next_frontier.append(tmp.id)
+                        next_kernels.append(kernel)
+                frontier = next_frontier
+                kernels = next_kernels
 
-            now_closure_id += 1
+    def merge_lalr_states(self):
+        """
+        将规范LR(1)项目集族中核心（去掉展望符后的项目集）相同的状态合并，得到LALR(1)项目集族。
+        合并后的状态按各组中最先出现的状态排序编号，项目为各状态项目的并集，GO表随之重新映射。
+        合并可能产生原来没有的规约-规约冲突（不会产生新的移进-规约冲突）：某个展望符上合并后有多个规约产生式，
+        且在其上规约的某个原状态原先没有其中的一些产生式（原状态已有冲突时也照此比较），记录在self.lalr_conflicts中，
+        每条为{"closure": 合并后的状态, "terminal": 终结符, "productions": 冲突的产生式编号, "merged": 被合并的原状态}
+        """
+        groups = {}
+        for closure in self.closures:
+            core = frozenset((item.production_id, item.dot_pos) for item in closure.items)
+            groups.setdefault(core, []).append(closure.id)
+        mapping = {}
+        for new_id, members in enumerate(groups.values()):
+            for old_id in members:
+                mapping[old_id] = new_id
+
+        closures = []
+        gos = []
+        self.lalr_conflicts = []
+        for new_id, members in enumerate(groups.values()):
+            merged = Closure()
+            merged.id = new_id
+            for old_id in members:
+                for item in self.closures[old_id].items:
+                    merged.add(item)
+            closures.append(merged)
+            # 同心状态在同一符号上的后继也同心，映射后相同
+            gos.append({symbol: mapping[target] for symbol, target in self.gos[members[0]].items()})
+
+            if len(members) > 1:
+                # 展望符 -> 各原状态中在其上规约的产生式
+                reduces = {}
+                for old_id in members:
+                    for item in self.closures[old_id].items:
+                        production = self.productions[item.production_id]
+                        if len(production.to_ids) == item.dot_pos or production.to_ids == [self.epsilon_id]:
+                            reduces.setdefault(item.terminal_id, {}).setdefault(old_id, set()).add(item.production_id)
+                for terminal_id, by_state in reduces.items():
+                    productions = set().union(*by_state.values())
+                    if len(productions) > 1 and any(p != productions for p in by_state.values()):
+                        self.lalr_conflicts.append({
+                            "closure": new_id,
+                            "terminal": self.get_str_by_id(terminal_id),
+                            "productions": sorted(productions),
+                            "merged": list(members),
+                        })
+                        print(f"Error: LALR(1) merge of closures {members} introduces reduce/reduce conflict "
+                              f"on {self.get_str_by_id(terminal_id)} in closure {new_id}")
+
+        self.closures = closures
+        self.gos = gos
+        self.closure_ids = {key: mapping[old_id] for key, old_id in self.closure_ids.items()}
 
     def find_gotos_and_actions(self):
         """
@@ -505,178 +923,90 @@ class Parser:
                                 self.action_table[i][symbol_id] = []
                             self.action_table[i][symbol_id].append(action)
 
-        for i in range(len(self.closures)):
-            flag = False
-            for key, value in self.action_table[i].items():
-                if len(value) > 1:
-                    flag = True
-                    terminal_symbol = self.get_str_by_id(key)
-                    print(f"Error: {terminal_symbol} has multiple actions in closure {i}")
-                    for action in value:
-                        action_type = action[0]
-                        if action_type == ACTION_ACC:
-                            action_type = "acc"
-                            print(f"acc")
-                        elif action_type == ACTION_R:
-                            action_type = "r"
-                            production = self.productions[action[1]]
-                            production_literal = self.get_str_by_id(production.non_terminal_symbol_id) + '->'
-                            for id in production.to_ids:
-                                production_literal += self.get_str_by_id(id) + ' '
-                            production_literal = production_literal[:-1]  # 去除末尾多的空格
-                            print(f"r {production_literal}")
-                        elif action_type == ACTION_S:
-                            action_type = "s"
-                            next_state_id = action[1]
-                            print(f"s {next_state_id}")
-                        else:
-                            action_type = "error"
-                            print(f"error")
-            if flag:
-                print(f"Error: closure {i} has multiple actions" + "*" * 20)
+        self.conflicts = self.find_conflicts()
+        reported = None
+        for conflict in self.conflicts:
+            i = conflict["closure"]
+            if reported is not None and reported != i:
+                print(f"Error: closure {reported} has multiple actions" + "*" * 20)
+            reported = i
+            print(f"Error: {conflict['terminal']} has multiple actions in closure {i}")
+            for action in conflict["actions"]:
+                if action["type"] == "acc":
+                    print("acc")
+                elif action["type"] == "r":
+                    print(f"r {action['production']}")
+                else:
+                    print(f"s {action['target']}")
+        if reported is not None:
+            print(f"Error: closure {reported} has multiple actions" + "*" * 20)
 
-    def getParse(self, lex):
+    def find_conflicts(self):
+        """
+        找出ACTION表中有多个动作的表项，按状态、表项的顺序返回列表，每条为
+        {"closure": 状态, "terminal": 终结符, "kind": "shift/reduce"等, "actions": [动作]}，
+        动作为{"type": "s"/"r"/"acc", "target": 目标状态或产生式编号, "production": 规约所用产生式的文本}
+        分析时取每个表项的第一个动作
+        """
+        conflicts = []
+        for i, actions in enumerate(self.action_table):
+            for key, value in actions.items():
+                if len(value) <= 1:
+                    continue
+                records = []
+                for action_type, target in value:
+                    record = {"type": ActionType[action_type], "target": target}
+                    if action_type == ACTION_R:
+                        production = self.productions[target]
+                        production_literal = self.get_str_by_id(production.non_terminal_symbol_id) + '->'
+                        for id in production.to_ids:
+                            production_literal += self.get_str_by_id(id) + ' '
+                        record["production"] = production_literal[:-1]  # 去除末尾多的空格
+                    records.append(record)
+                kinds = {"s": "shift", "r": "reduce", "acc": "accept"}
+                names = sorted({kinds[record["type"]] for record in records}, key=["shift", "accept", "reduce"].index)
+                conflicts.append({
+                    "closure": i,
+                    "terminal": self.get_str_by_id(key),
+                    "kind": "/".join(names) if len(names) > 1 else f"{names[0]}/{names[0]}",
+                    "actions": records,
+                })
+        return conflicts
+
+    def getParse(self, lex, trace=False, mode=None):
         """
         执行语法分析
         参数：
-        - lex: 词法分析的输出结果，包含词法单元的信息
+        - lex: 词法分析的输出结果（Token序列，如TokenStore）；
+          也可以是按需产生Token的迭代器（如Lexer.iterLex），此时不会预先读取全部token
+        - trace: 是否记录分析过程；记录时self.parse_process_display为ParseTrace（每步只保存几个整数，
+          按行取用时才生成文字），否则为None。self.parse_steps总是记录分析的步数
+        - mode: 分析模式（PARSE_MODES之一），为None时使用构造时的parse_mode：
+          - "recognize": 只判断能否通过语法分析，只有状态栈，不建树、不做语义分析，不写出中间产物
+          - "semantic": 执行语义动作，值栈中每项只有属性与所覆盖的token范围，不建树；只写出quaternation_out.json
+          - "full": 建立语法树并执行语义动作，写出parser_out.json与quaternation_out.json
         返回：
-        - 树形结构，表示语法分析的结果
+        - full模式分析成功时为语法树根结点的CSTNode视图（可以像dict一样读取，toDict()得到原先的dict格式），
+          整棵树存于self.cst；recognize与semantic模式分析成功时为{"root": 开始符号}
+        - 出错时为{"root": 错误说明, "err": 位置}
+        分析过程见PushParser，这里把lex中的token依次送入；lex在EOF之前结束时视为在末尾补上EOF
         """
-
-        # 初始化语义动作执行器
-        mySemantic = Semantic(
-            self.productions, self.non_terminal_symbols, self.terminal_symbols
-        )
-        self.semantic = mySemantic
-
-        stack = []
-        item = {"state": 0, "tree": {"root": '#'}}
-        stack.append(item)
-        self.parse_process_display = []
-        self.parse_process_display.append(['步骤', '状态栈', '符号栈', '待规约串', '动作说明'])
-
-        pending_string = [cur['prop'].value for cur in lex]
-        pending_string = ', '.join(pending_string)
-        self.parse_process_display.append(['0', '0', '#', pending_string, '初始状态'])
-
-        index = 0
-        cnt = 0
-        last_loc = {"row": 0, "col": 0}  # 记录最后一个token位置，用于错误提示
-
-        while index < len(lex):
-            cnt += 1
-            cur = lex[index]
-            if cur["prop"] == tokenType.UNKNOWN:
-                print(f"Error: {token} at {cur['loc']}")
-                return {"root": "词法解析失败", "err": cur["loc"]}
-
-            token = tokenType_to_terminal(cur["prop"])
-            token_id = self.get_id_by_str(token)
-
-            if token_id >= self.epsilon_id:
-                print(f"Error: {token} at {cur['loc']}")
-                return {"root": "语法错误/代码不完整，无法解析1", "err": cur["loc"]}
-
-            new_display_item = [None] * 5
-            new_display_item[0] = str(cnt)
-
-            current_state = self.action_table[stack[-1]["state"]]
-
-            if token_id not in current_state:
-                print(f"Error: {token} at {cur['loc']}")
-                self.semantic_quaternation = '代码中包含 Error ，中间代码暂不可用'
-                self.semantic_error_occur = True
-                self.semantic_error_message = [f"Error at ({last_loc['row']},{last_loc['col']}): 代码不符合语法规则"]
-                return {"root": "语法错误/代码不完整，无法解析2", "err": cur["loc"]}
-
-            current_action_list = current_state[token_id]
-            first_action = current_action_list[0]
-
-            if first_action[0] == ACTION_S:
-                next_state_id = first_action[1]
-                item = {"state": next_state_id, "tree": {"root": token, "content": cur["content"], "children": []}}
-                stack.append(item)
-                index += 1
-                new_display_item[4] = f'移进“{token}”, 状态{next_state_id}压栈'
-
-            elif first_action[0] == ACTION_R:
-
-                production = self.productions[first_action[1]]
-                production_literal = self.get_str_by_id(production.non_terminal_symbol_id) + '->'
-                children = []
-                cur_content = ""
-                tmp_symbol_stack = []
-
-                from_pos = len(stack) - (0 if production.to_ids == [self.epsilon_id] else len(production.to_ids))
-                for i in range(from_pos, len(stack)):
-                    tmp_symbol_stack.append(stack[i])
-
-                if production.to_ids == [self.epsilon_id]:
-                    production_literal += self.get_str_by_id(self.epsilon_id) + ' '
-                    children.append({"root": self.get_str_by_id(self.epsilon_id), "children": []})
-                else:
-                    for id in production.to_ids:
-                        child = stack.pop()["tree"]
-                        cur_content = child.get("content", "") + cur_content
-                        children.insert(0, child)
-                        production_literal += self.get_str_by_id(id) + ' '
-
-                current_state = self.goto_table[stack[-1]["state"]]
-                next_state_id = current_state[production.non_terminal_symbol_id]
-                item = {
-                    "state": next_state_id,
-                    "tree": {
-                        "root": self.get_str_by_id(production.non_terminal_symbol_id),
-                        "content": cur_content,
-                        "children": children,
-                    },
-                }
-
-                # 加入语义分析处理
-                if not mySemantic.error_occur:
-                    mySemantic.analyse(first_action[1], last_loc, item, tmp_symbol_stack)
-
-                stack.append(item)
-                new_display_item[4] = f'使用产生式({production_literal.strip()})进行规约'
-
-            elif first_action[0] == ACTION_ACC:
-                print("语法分析结果: Accept")
-                self.semantic_quaternation = mySemantic.getQuaternationTable()
-                self.semantic_error_occur = mySemantic.error_occur
-                self.semantic_error_message = mySemantic.error_msg
-
-                print(f"语义分析结果: {not self.semantic_error_occur}")
-                if self.semantic_error_occur:
-                    print(f"语义分析错误信息: {self.semantic_error_message}")
-
-                ret = stack[-1]["tree"]
-                with open("parser_out.json", "w", encoding="utf-8") as f:
-                    json.dump(ret, f, indent=4, ensure_ascii=False)
-                with open("quaternation_out.json", "w", encoding="utf-8") as f:
-                    json.dump(self.semantic_quaternation, f, indent=4, ensure_ascii=False)
-                return ret
-
-            else:
-                print(f"Error: {token} at {cur['loc']}")
-                self.semantic_quaternation = '代码中包含 Error ，中间代码暂不可用'
-                self.semantic_error_occur = True
-                self.semantic_error_message = [f"Error at ({last_loc['row']},{last_loc['col']}): 代码不符合语法规则"]
-                return {"root": "语法错误/代码不完整，无法解析3", "err": "parser_error"}
-
-            last_loc = cur["loc"]  # 更新最新位置
-
-            state_stack = ' '.join(str(item['state']) for item in stack)
-            symbol_stack = ' '.join(str(item['tree']['root']) for item in stack)
-            pending_string = ', '.join(cur['prop'].value for cur in lex[index:])
-
-            new_display_item[1] = state_stack
-            new_display_item[2] = symbol_stack
-            new_display_item[3] = pending_string
-            self.parse_process_display.append(new_display_item)
+        # 迭代器输入时无法预知剩余token，待规约串只显示当前的向前看符号
+        is_sequence = isinstance(lex, (list, tuple, TokenStore))
+        push = PushParser(self, trace, mode, lex if is_sequence else None)
+        for token in lex:
+            if push.feed(token):
+                break
+        return push.finish()
 
     def get_goto_table(self):
+        """GOTO表的显示形式（二维字符串列表），耗时记入构造统计"""
+        return self.run_phase("get_goto_table", self._get_goto_table)
+
+    def _get_goto_table(self):
         print("Get goto table")
+        if self.goto_table is None:
+            self.goto_table = self.packed.gotoTable()
         goto_table = []
         # 去除epsilon
         goto_table.append(["Status"] + self.non_terminal_symbols[1:])
@@ -692,7 +1022,13 @@ class Parser:
         return goto_table
 
     def get_action_table(self):
+        """ACTION表的显示形式（二维字符串列表），耗时记入构造统计"""
+        return self.run_phase("get_action_table", self._get_action_table)
+
+    def _get_action_table(self):
         print("Get action table")
+        if self.action_table is None:
+            self.action_table = self.packed.actionTable()
         action_table = []
         action_table.append(["Status"] + self.terminal_symbols)
         for i in range(len(self.closures)):
@@ -705,3 +1041,697 @@ class Parser:
                     )
         print("End get action table")
         return action_table
+
+
+# find_gos_parallel的工作进程中用于求闭包的Parser，只含产生式与FIRST集
+_closure_worker = None
+
+
+class PushParser(object):
+    '''
+    可恢复的推式语法分析器：逐个feed(token)送入输入，最后finish()得到结果，两次调用之间保留状态栈与值栈
+    可以边词法分析边语法分析，或在数据陆续到达时分析管道、套接字中的输入；recognize模式下占用的内存只与栈深有关
+    Parser.getParse即把全部token依次送入PushParser；分析结果与semantic、cst、parse_process_display、
+    parse_steps、semantic_*等属性同样记录在parser上
+    '''
+
+    def __init__(self, parser, trace=False, mode=None, tokens=None, marks=()):
+        '''
+        参数：
+        - parser: 提供分析表、产生式与语义分析的Parser
+        - trace、mode: 同Parser.getParse
+        - tokens: 已有完整的Token序列时传入，用于规约过程中的待规约串，以及从TokenStore中切片token的content
+        - marks: 需要记录规约发生在第几步的产生式，按发生的顺序记录于self.marks，每项为(产生式编号, 步数)
+        '''
+        self.parser = parser
+        self.done = False
+        self.result = None
+        self.last_token = None
+        self.marks = []
+        self.steps = self.run(trace, mode, tokens, frozenset(marks))
+        # 执行到等待第一个token，模式错误等在这里抛出
+        next(self.steps)
+
+    def feed(self, token):
+        '''送入下一个token；返回分析是否已经结束（接受或出错），结束后再送入的token被忽略'''
+        if not self.done:
+            self.last_token = token
+            try:
+                self.steps.send(token)
+            except StopIteration as stop:
+                self.done = True
+                self.result = stop.value
+        return self.done
+
+    def splice(self, unit, first, last):
+        '''
+        送入一段已经分析过、结果可以直接复用的输入（如增量分析中没有改变的函数，见IncrementalParser），
+        其中的token不再逐个分析；构造时需要给出tokens。返回分析是否已经结束
+        unit提供该段的分析结果，见FunctionUnit：
+        - start_production: 该段的第一次规约；之前以其第一个token为向前看符号的规约照常进行，
+          包括推出其右部的规约（如P -> None之前的None -> epsilon），拼接时弹出右部再把整段压栈
+        - symbol_id、token_count、steps: 整段规约得到的非终结符，以及该段的token数与分析步数
+        - nodes: 以symbol_id为根的子树（full模式），trace: 该段的各步（记录分析过程时）
+        - apply(semantic): 把该段的语义分析结果追加到semantic中（执行语义动作且尚未出错时）
+        first、last为该段的第一个与最后一个Token
+        '''
+        self.feed(Splice(unit, first, last))
+        self.last_token = last
+        return self.done
+
+    def finish(self):
+        '''输入结束：还没有送入EOF（"#"）时补上一个；返回与Parser.getParse相同的结果'''
+        if not self.done:
+            row = self.last_token.row + 1 if self.last_token is not None else 1
+            self.feed(Token(None, "#", tokenType.EOF, row, 1))
+        return self.result
+
+    def run(self, trace, mode, tokens, marks):
+        '''分析过程：每次yield之后由feed送入下一个token，接受或出错时返回结果'''
+        parser = self.parser
+        mode = parser.parse_mode if mode is None else mode
+        if mode not in parser.PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {mode}")
+
+        # 初始化语义动作执行器，recognize模式不执行语义动作
+        mySemantic = None
+        if mode != "recognize":
+            mySemantic = Semantic(
+                parser.productions, parser.non_terminal_symbols, parser.terminal_symbols
+            )
+        parser.semantic = mySemantic
+
+        # 状态栈与值栈分开保存，值栈的每项为{"tree": 语法树结点或TokenSpan, "attribute": 语义属性}；
+        # recognize模式没有值栈
+        states = [0]
+        values = [] if mySemantic is not None else None
+
+        # 没有完整的Token序列时无法预知剩余token，待规约串只显示当前的向前看符号
+        process = ParseTrace(parser, tokens) if trace else None
+        parser.parse_process_display = process
+        parser.parse_steps = 0
+
+        # 语法树存于arena中，结点的content在读取时才由token得到；semantic模式只记录各符号的token范围
+        cst = None
+        text = None
+        if mode == "full":
+            cst = CST(parser.terminal_symbols + parser.non_terminal_symbols, parser.epsilon_id, tokens)
+        elif mode == "semantic":
+            text = TokenText(tokens)
+        parser.cst = cst
+
+        index = 0
+        cnt = 0
+        last_loc = {"row": 0, "col": 0}  # 记录最后一个token位置，用于错误提示
+
+        packed = parser.packed
+        action_base, action_check, action_value = packed.action_base, packed.action_check, packed.action_value
+        action_default = packed.action_default
+        accept_action = -(packed.accept_production + 1)
+        # 各产生式的左部与右部长度（空产生式为0）
+        production_lhs = [production.non_terminal_symbol_id for production in parser.productions]
+        production_length = [
+            0 if production.to_ids == [parser.epsilon_id] else len(production.to_ids) for production in parser.productions
+        ]
+
+        cur = yield
+        while True:
+            if process is not None:
+                process.add_lookahead(cur)
+            cnt += 1
+            parser.parse_steps = cnt
+            if cur.prop == tokenType.UNKNOWN:
+                print(f"Error: {token} at {cur.loc}")
+                return {"root": "词法解析失败", "err": cur.loc}
+
+            # 词法分析时已标注终结符id，不对应终结符的token（如多余的*/）为-1
+            token_id = cur.terminal
+            splice = None
+            if token_id == SPLICED:
+                # 拼接已分析过的一段输入：以其第一个token为向前看符号完成之前的规约，到该段的第一次规约时整段压栈
+                splice = cur
+                cur = splice.first
+                token_id = cur.terminal
+            if token_id < 0:
+                print(f"Error: {cur.content} at {cur.loc}")
+                return {"root": "语法错误/代码不完整，无法解析1", "err": cur.loc}
+            token = parser.terminal_symbols[token_id]
+
+            cur_loc = cur.loc
+
+            # 对同一个向前看token先做若干次规约，直到移进它；第一次使用默认规约前先确认它最终能被移进，
+            # 与规范LR(1)一样在错误的向前看符号上直接报错，不做多余的规约、语义动作与分析过程记录
+            checked = False
+            while True:
+                # 在压缩表中查ACTION，编码见myParseTables
+                state = states[-1]
+                i = action_base[state] + token_id
+                if action_check[i] == state:
+                    action = action_value[i]
+                else:
+                    action = action_default[state]
+                    if action != ACTION_ERROR and not checked:
+                        if not packed.validLookahead(states, token_id, production_lhs, production_length):
+                            action = ACTION_ERROR
+                        checked = True
+
+                if action == ACTION_ERROR:
+                    print(f"Error: {token} at {cur.loc}")
+                    parser.semantic_quaternation = '代码中包含 Error ，中间代码暂不可用'
+                    parser.semantic_error_occur = True
+                    parser.semantic_error_message = [f"Error at ({last_loc['row']},{last_loc['col']}): 代码不符合语法规则"]
+                    return {"root": "语法错误/代码不完整，无法解析2", "err": cur.loc}
+
+                if action > 0:
+                    next_state_id = action - 1
+                    states.append(next_state_id)
+                    if cst is not None:
+                        values.append({"tree": CSTNode(cst, cst.leaf(token_id, index, cur.content))})
+                    elif values is not None:
+                        text.add(cur.content)
+                        values.append({"tree": TokenSpan(text, index, index + 1)})
+                    index += 1
+                    if process is not None:
+                        process.shift(token_id, next_state_id, index)
+                    break
+
+                elif action != accept_action:
+                    production_id = -action - 1
+                    if splice is not None and production_id == splice.unit.start_production:
+                        break
+                    length = production_length[production_id]
+                    if length:
+                        del states[-length:]
+                    next_state_id = packed.goto(states[-1], production_lhs[production_id])
+                    states.append(next_state_id)
+
+                    if values is not None:
+                        if length:
+                            tmp_symbol_stack = values[-length:]
+                            del values[-length:]
+                        else:
+                            tmp_symbol_stack = []
+                        if cst is not None:
+                            if length:
+                                children = [child["tree"].node for child in tmp_symbol_stack]
+                            else:
+                                children = [cst.epsilon(index)]
+                            item = {"tree": CSTNode(cst, cst.inner(production_lhs[production_id], children))}
+                        elif length:
+                            start, end = tmp_symbol_stack[0]["tree"].start, tmp_symbol_stack[-1]["tree"].end
+                            item = {"tree": TokenSpan(text, start, end)}
+                        else:
+                            item = {"tree": TokenSpan(text, index, index)}
+
+                        # 加入语义分析处理
+                        if not mySemantic.error_occur:
+                            mySemantic.analyse(production_id, last_loc, item, tmp_symbol_stack)
+
+                        values.append(item)
+                    if process is not None:
+                        process.reduce(production_id, next_state_id, index)
+
+                    last_loc = cur_loc  # 更新最新位置
+                    cnt += 1
+                    parser.parse_steps = cnt
+                    if production_id in marks:
+                        self.marks.append((production_id, cnt))
+
+                else:
+                    print("语法分析结果: Accept")
+                    if mySemantic is not None:
+                        parser.semantic_quaternation = mySemantic.getQuaternationTable()
+                        parser.semantic_error_occur = mySemantic.error_occur
+                        parser.semantic_error_message = mySemantic.error_msg
+
+                        print(f"语义分析结果: {not parser.semantic_error_occur}")
+                        if parser.semantic_error_occur:
+                            print(f"语义分析错误信息: {parser.semantic_error_message}")
+                    else:
+                        parser.semantic_quaternation = []
+                        parser.semantic_error_occur = False
+                        parser.semantic_error_message = []
+
+                    if cst is not None:
+                        ret = values[-1]["tree"]
+                        parser.sink.dump("parser_out.json", ret)
+                    else:
+                        ret = {"root": parser.get_str_by_id(parser.productions[packed.accept_production].to_ids[0])}
+                    if mySemantic is not None:
+                        parser.sink.dumpRecords("quaternation_out.json", parser.semantic_quaternation)
+                    return ret
+
+            if splice is not None:
+                unit = splice.unit
+                length = production_length[unit.start_production]
+                if length:
+                    del states[-length:]
+                    if values is not None:
+                        del values[-length:]
+                states.append(packed.goto(states[-1], unit.symbol_id))
+                end = index + unit.token_count
+                if cst is not None:
+                    cst.token_text.extend(tokens, index, end)
+                    values.append({"tree": CSTNode(cst, cst.graft(unit.placed("nodes", index, lambda index: CST.moved(unit.nodes, index))))})
+                elif values is not None:
+                    text.extend(tokens, index, end)
+                    values.append({"tree": TokenSpan(text, index, end)})
+                if mySemantic is not None and not mySemantic.error_occur:
+                    unit.apply(mySemantic)
+                if process is not None:
+                    process.extend(unit.placed("trace", index, lambda index: ParseTrace.moved(unit.trace, index)))
+                index = end
+                # 这一步已在读入时计数
+                cnt += unit.steps - 1
+                parser.parse_steps = cnt
+                cur_loc = splice.last.loc
+
+            last_loc = cur_loc  # 更新最新位置
+            cur = yield
+
+
+# PushParser.splice送入的Splice的终结符id，与不对应终结符的token（-1）区分
+SPLICED = -2
+
+
+class Splice(object):
+    '''PushParser.splice送入分析过程的一段已分析的输入，在读入token的位置上处理'''
+    __slots__ = ("unit", "first", "last")
+    terminal = SPLICED
+    prop = None
+
+    def __init__(self, unit, first, last):
+        self.unit = unit
+        self.first = first
+        self.last = last
+
+
+class FunctionUnit(object):
+    '''
+    增量分析中一个顶层函数的分析结果，与其在输入中的位置无关，可以通过PushParser.splice拼接到任意位置：
+    - key: 函数的源代码（TokenStore输入时为从第一个到最后一个token的源代码文本，否则为各token的(终结符id, content)），
+      与上次相同即认为函数没有改变
+    - token_count、steps: token数，以及从P -> None的规约到Decl -> FunctionDecl的规约的分析步数
+    - start_production、symbol_id: 该段的第一次规约（P -> None）与整段规约得到的非终结符（Decl）；
+      P的右部（None -> epsilon）在拼接时照常规约，不属于该段
+    - nodes: 以Decl为根的子树中从P开始的各结点（CST.extract），不是full模式分析得到时为None
+    - trace: 分析过程中这些步的记录（ParseTrace.steps），没有记录时为None
+    - process、quads: 语义分析得到的函数表项与该函数的四元式(op, src1, src2, tar)，跳转目标为相对函数入口的偏移；
+      只在整个程序没有语义错误时记录，否则为None
+    - calls: 调用的其他函数及分析时它们的签名((函数名, (参数个数, 返回类型)), ...)
+    - code: 目标代码生成的缓存，见myCodeGenerator.IncrementalCodeGenerator
+    - placements: 上次拼接时按位置换算后的nodes、trace、四元式与四元式表的行，见placed
+    '''
+    __slots__ = ("key", "token_count", "steps", "start_production", "symbol_id", "nodes", "trace",
+                 "process", "quads", "calls", "code", "placements")
+
+    def __init__(self, key, token_count, steps, start_production, symbol_id):
+        self.key = key
+        self.token_count = token_count
+        self.steps = steps
+        self.start_production = start_production
+        self.symbol_id = symbol_id
+        self.nodes = None
+        self.trace = None
+        self.process = None
+        self.quads = None
+        self.calls = ()
+        self.code = None
+        self.placements = {}
+
+    def placed(self, name, offset, place):
+        '''
+        缓存的结果name放在偏移offset处（token下标或四元式地址）时的版本，由place(offset)换算得到；
+        与上次拼接的位置相同时直接复用上次换算的结果，编辑之后没有移动的函数只需整段复制
+        '''
+        placement = self.placements.get(name)
+        if placement is None or placement[0] != offset:
+            placement = (offset, place(offset))
+            self.placements[name] = placement
+        return placement[1]
+
+    def relocate(self, address):
+        return [Quaternion(op, src1, src2, tar + address if type(tar) is int else tar)
+                for op, src1, src2, tar in self.quads]
+
+    def rows(self, address):
+        return [[str(address + k), str(quad)] for k, quad in enumerate(self.placed("quads", address, self.relocate))]
+
+    def apply(self, semantic):
+        '''
+        把该函数的语义分析结果追加到semantic中，入口地址与跳转目标按当前四元式表的长度重新计算
+        位置不变时四元式对象与四元式表的行与上次分析的结果共用，四元式表之后不应再被修改
+        '''
+        address = semantic.start_address + len(semantic.quaternion_table)
+        process = copy.copy(self.process)
+        process.start_address = address
+        semantic.process_table.append(process)
+        semantic.quaternation_rows[len(semantic.quaternion_table)] = self.placed("rows", address, self.rows)
+        semantic.quaternion_table.extend(self.placed("quads", address, self.relocate))
+        if process.name == "main":
+            # 与分析main函数时相同，保证四元式表第一个为 j main
+            semantic.quaternion_table[0].tar = str(address)
+
+
+class IncrementalParser(object):
+    '''
+    编辑器使用的增量语法分析：按顶层函数缓存上次分析的结果（子树、分析过程、语义分析结果），
+    再次分析时先从首尾与上次的各函数逐个比较源代码，只有中间改变了的部分需要逐个token划分为函数并按源代码查找缓存；
+    没有改变的函数通过PushParser.splice直接拼接缓存的结果，只把改变了的函数的token送入分析器，
+    其前后的规约与语义动作照常执行。结果与Parser.getParse对整个输入分析的完全相同，耗时主要取决于改变的函数的大小
+    函数的语义分析只依赖于之前是否有同名函数，以及它调用的函数的签名（参数个数、返回类型），这些都不变时才复用其语义分析结果
+    '''
+
+    def __init__(self, parser):
+        self.parser = parser
+        # 上次分析成功时的各函数（FunctionUnit），按在程序中的顺序；cache按key查找
+        self.units = []
+        self.cache = {}
+        # 上次分析中拼接与重新分析的函数数
+        self.reused = 0
+        self.reparsed = 0
+
+        # 文法中顶层函数的结构：Decl -> FunctionDecl，FunctionDecl -> P FunctionHeader Block，P -> None
+        ids = {symbol: parser.get_id_by_str(symbol) for symbol in ("fn", "{", "}", "#", "Decl", "FunctionDecl", "P")}
+        self.fn_id, self.left_id, self.right_id, self.eof_id = ids["fn"], ids["{"], ids["}"], ids["#"]
+        self.decl_id = ids["Decl"]
+        self.p_id = ids["P"]
+        self.start_production = None
+        self.end_production = None
+        starts_with_p = True
+        for production in parser.productions:
+            lhs, to_ids = production.non_terminal_symbol_id, production.to_ids
+            if lhs == ids["P"]:
+                self.start_production = production.id
+            elif lhs == ids["Decl"] and to_ids == [ids["FunctionDecl"]]:
+                self.end_production = production.id
+            elif lhs == ids["FunctionDecl"] and to_ids[0] != ids["P"]:
+                starts_with_p = False
+        # 文法中没有这样的结构时不做增量分析，直接交给getParse
+        self.enabled = (None not in ids.values() and starts_with_p
+                        and self.start_production is not None and self.end_production is not None)
+
+    def parse(self, tokens, trace=False, mode=None):
+        '''
+        与Parser.getParse相同的参数与返回值，分析结果同样记录在parser上；tokens须为完整的Token序列（TokenStore或Token列表），
+        否则（或者文法中没有上述函数结构）直接交给getParse
+        '''
+        parser = self.parser
+        plan = self.plan(tokens) if self.enabled else None
+        self.reused = 0
+        self.reparsed = 0
+        if plan is None:
+            # 无法按函数划分（多半是编辑到一半，括号还不配对）时整个重新分析，保留缓存供之后查找
+            self.units = []
+            return parser.getParse(tokens, trace, mode)
+
+        push = PushParser(parser, trace, mode, tokens, marks=(self.start_production, self.end_production))
+        semantic = parser.semantic
+        process = parser.parse_process_display
+        full = parser.cst is not None
+        # 之前各函数的签名：函数名 -> (参数个数, 返回类型)
+        signatures = {}
+        spliced = []
+        # 送入每个函数（及最后的EOF）之前分析过程的步数
+        positions = []
+        for start, count, key, unit in plan:
+            positions.append(len(process.action) if process is not None else 0)
+            if unit is not None and self.reusable(unit, full, process is not None, semantic, signatures):
+                push.splice(unit, tokens[start], tokens[start + count - 1])
+                spliced.append(unit)
+                self.reused += 1
+            else:
+                for index in range(start, start + count):
+                    if push.feed(tokens[index]):
+                        break
+                spliced.append(None)
+                self.reparsed += 1
+            if push.done:
+                break
+            if semantic is not None and not semantic.error_occur:
+                function = semantic.process_table[-1]
+                signatures.setdefault(function.name, (len(function.param), function.return_type))
+        positions.append(len(process.action) if process is not None else 0)
+        push.feed(tokens[len(tokens) - 1])
+        result = push.finish()
+        if "err" not in result:
+            self.units = self.record(plan, spliced, positions, push.marks, result)
+            self.cache = {unit.key: unit for unit in self.units}
+        return result
+
+    def reusable(self, unit, full, trace, semantic, signatures):
+        '''unit缓存的结果是否足以在当前的位置上拼接'''
+        if full and unit.nodes is None or trace and unit.trace is None:
+            return False
+        if semantic is None or semantic.error_occur:
+            # 不执行语义动作，或之前已经出错、之后不再执行语义动作
+            return True
+        if unit.quads is None or unit.process.name in signatures:
+            return False
+        return all(signatures.get(name) == signature for name, signature in unit.calls)
+
+    def record(self, plan, spliced, positions, marks, result):
+        '''分析成功后为重新分析的函数生成FunctionUnit，返回各函数的FunctionUnit'''
+        parser = self.parser
+        semantic = parser.semantic
+        process = parser.parse_process_display
+        cst = parser.cst
+        decls = self.decl_nodes(cst, result.node) if cst is not None else None
+        starts = [steps for production_id, steps in marks if production_id == self.start_production]
+        ends = [steps for production_id, steps in marks if production_id == self.end_production]
+        start_code = -(self.start_production + 1)
+        end_code = -(self.end_production + 1)
+        # 整个程序没有语义错误时，第k个函数即函数表中的第k项
+        analysed = semantic is not None and not semantic.error_occur and len(semantic.process_table) == len(plan)
+        quads = semantic.quaternion_table if analysed else None
+        signatures = {}
+        units = []
+        fed = 0
+        for k, ((start, count, key, _), unit) in enumerate(zip(plan, spliced)):
+            if unit is None:
+                unit = FunctionUnit(key, count, ends[fed] - starts[fed] + 1, self.start_production, self.decl_id)
+                fed += 1
+                if decls is not None:
+                    first = decls[k]
+                    while cst.kind[first] != self.p_id:
+                        first -= cst.first_child[first]
+                    unit.nodes = cst.extract(first, decls[k])
+                if process is not None:
+                    first = process.action.index(start_code, positions[k])
+                    last = process.action.index(end_code, positions[k + 1])
+                    unit.trace = process.steps(first, last, start)
+                if analysed:
+                    function = semantic.process_table[k]
+                    address = function.start_address
+                    first = address - semantic.start_address
+                    last = semantic.process_table[k + 1].start_address - semantic.start_address \
+                        if k + 1 < len(plan) else len(quads)
+                    unit.process = function
+                    unit.quads = tuple(
+                        (quad.op, quad.src1, quad.src2, quad.tar - address if type(quad.tar) is int else quad.tar)
+                        for quad in quads[first:last]
+                    )
+                    called = {quad.src1 for quad in quads[first:last] if quad.op == "call"}
+                    unit.calls = tuple((name, signatures[name]) for name in sorted(called) if name != function.name)
+            if analysed:
+                function = semantic.process_table[k]
+                signatures.setdefault(function.name, (len(function.param), function.return_type))
+            units.append(unit)
+        return units
+
+    def decl_nodes(self, cst, root):
+        '''语法树中各顶层函数的Decl结点，按在程序中的顺序'''
+        nodes = []
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if cst.kind[node] == self.decl_id:
+                nodes.append(node)
+            else:
+                pending.extend(reversed(list(cst.children(node))))
+        return nodes
+
+    def plan(self, tokens):
+        '''
+        把tokens（不含末尾的EOF）划分为各顶层函数，返回[(第一个token的下标, token数, key, 可以复用的FunctionUnit或None)]；
+        不能划分（不以EOF结尾、顶层出现函数以外的token、括号不配对等）时返回None
+        先从首尾与上次的各函数逐个比较源代码，再逐个token划分中间的部分
+        '''
+        if not isinstance(tokens, TokenStore) and not (
+                isinstance(tokens, (list, tuple)) and all(isinstance(token, Token) for token in tokens)):
+            return None
+        eof = len(tokens) - 1
+        if eof < 0 or self.terminal(tokens, eof) != self.eof_id:
+            return None
+        units = self.units
+        plan = []
+        position = 0
+        for unit in units:
+            if not self.matches(tokens, position, eof, unit):
+                break
+            plan.append((position, unit.token_count, unit.key, unit))
+            position += unit.token_count
+        suffix = []
+        end = eof
+        for unit in reversed(units[len(plan):]):
+            start = end - unit.token_count
+            if start < position or not self.matches(tokens, start, end, unit):
+                break
+            suffix.append((start, unit.token_count, unit.key, unit))
+            end = start
+        middle = self.split(tokens, position, end)
+        if middle is None and suffix:
+            # 中间部分与之后的函数连在一起（如删去了一个}），从中间开始一直划分到末尾
+            suffix = []
+            middle = self.split(tokens, position, eof)
+        if middle is None:
+            return None
+        return plan + middle + suffix[::-1]
+
+    def split(self, tokens, start, end):
+        '''把第start到end - 1个token划分为顶层函数：以fn开始，到与第一个{配对的}结束；不能划分时返回None'''
+        if isinstance(tokens, TokenStore):
+            terminals = [KIND_TERMINALS[kind] for kind in tokens.kind[start:end]]
+        else:
+            terminals = [token.terminal for token in tokens[start:end]]
+        plan = []
+        first = None
+        depth = 0
+        for index, terminal in enumerate(terminals, start):
+            if first is None:
+                if terminal != self.fn_id:
+                    return None
+                first = index
+            if terminal == self.left_id:
+                depth += 1
+            elif terminal == self.right_id:
+                depth -= 1
+                if depth == 0:
+                    count = index + 1 - first
+                    key = self.key(tokens, first, count)
+                    unit = self.cache.get(key)
+                    plan.append((first, count, key, unit if unit is not None and unit.token_count == count else None))
+                    first = None
+                elif depth < 0:
+                    return None
+        return plan if first is None else None
+
+    def terminal(self, tokens, index):
+        if isinstance(tokens, TokenStore):
+            return KIND_TERMINALS[tokens.kind[index]]
+        return tokens[index].terminal
+
+    def key(self, tokens, start, count):
+        '''从第start个token开始的count个token的key，见FunctionUnit'''
+        last = start + count - 1
+        if isinstance(tokens, TokenStore):
+            return tokens.source[tokens.getOffset(start):tokens.getOffset(last) + tokens.end[last] - tokens.start[last]]
+        return tuple((token.terminal, token.content) for token in tokens[start:last + 1])
+
+    def matches(self, tokens, start, limit, unit):
+        '''从第start个token开始、在第limit个token之前的unit.token_count个token是否就是unit（源代码相同）'''
+        last = start + unit.token_count - 1
+        if last >= limit:
+            return False
+        if isinstance(tokens, TokenStore):
+            if not isinstance(unit.key, str) or tokens.end[last] < 0:
+                return False
+            offset = tokens.getOffset(start)
+            return (tokens.getOffset(last) + tokens.end[last] - tokens.start[last] == offset + len(unit.key)
+                    and tokens.source.startswith(unit.key, offset))
+        return self.key(tokens, start, unit.token_count) == unit.key
+
+
+def _init_closure_worker(productions, epsilon_id, first_masks):
+    global _closure_worker
+    worker = Parser.__new__(Parser)
+    worker.productions = productions
+    worker.epsilon_id = epsilon_id
+    worker.first_masks = first_masks
+    worker.mask_bits_cache = {}
+    worker.closure_calls = 0
+    worker.index_productions()
+    _closure_worker = worker
+
+
+def _expand_kernels(kernels):
+    """
+    在工作进程中对每个核心项目集（项目的(产生式, 点位置, 展望符)元组）求闭包，
+    返回[(闭包中的项目元组, {符号: 后继的核心项目元组})]
+    """
+    results = []
+    for kernel in kernels:
+        closure = Closure()
+        for key in kernel:
+            closure.add(LR1Item(*key))
+        _closure_worker.find_closures(closure)
+        successors = _closure_worker.find_successor_kernels(closure)
+        results.append((
+            tuple(item.key for item in closure.items),
+            {symbol: tuple(item.key for item in tmp.items) for symbol, tmp in successors.items()},
+        ))
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="构造语法分析表，并可写为独立的Python模块")
+    arg_parser.add_argument("grammar", nargs="?", default="mytest.cfg", help="文法配置文件")
+    arg_parser.add_argument("--mode", choices=Parser.TABLE_MODES, default="lr1", help="分析表构造方式")
+    arg_parser.add_argument("--emit", metavar="PATH", help="将分析表写为Python模块，如myParserTables.py")
+    arg_parser.add_argument("--workers", type=int, default=1, help="构造项目集族时使用的进程数")
+    arg_parser.add_argument("--stats", action="store_true", help="输出构造各阶段的耗时、状态数与冲突等统计")
+    arg_parser.add_argument("--memory", action="store_true", help="同时用tracemalloc记录各阶段的峰值内存（构造会变慢）")
+    arg_parser.add_argument("--stats-json", metavar="PATH", help="将统计写为JSON文件（-表示标准输出）")
+    args = arg_parser.parse_args(argv)
+
+    # 统计信息输出到标准输出时，不混入构造过程中的诊断输出
+    quiet = args.stats_json == "-"
+    with open(os.devnull, "w") if quiet else contextlib.nullcontext(sys.stdout) as out:
+        with contextlib.redirect_stdout(out):
+            parser = Parser(args.grammar, table_mode=args.mode, profile=args.memory, workers=args.workers)
+            if args.stats or args.stats_json:
+                # 界面显示分析表时的耗时也计入统计
+                parser.get_action_table()
+                parser.get_goto_table()
+    if not quiet:
+        print(f"{args.grammar} ({args.mode}): {len(parser.closures)} states, {len(parser.productions)} productions")
+    if args.emit:
+        parser.write_tables_module(args.emit)
+        if not quiet:
+            print(f"tables written to {args.emit}")
+    stats = parser.get_build_statistics()
+    if args.stats:
+        print_build_statistics(stats)
+    if args.stats_json:
+        text = json.dumps(stats, ensure_ascii=False, indent=2)
+        if quiet:
+            print(text)
+        else:
+            with open(args.stats_json, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+    return 0
+
+
+def print_build_statistics(stats):
+    """以表格形式输出get_build_statistics的结果"""
+    print(f"{'phase':<26}{'ms':>10}{'peak KB':>10}")
+    for name, phase in stats["phases"].items():
+        peak = "" if phase["peak_bytes"] is None else f"{phase['peak_bytes'] / 1024:.0f}"
+        print(f"{name:<26}{phase['seconds'] * 1e3:>10.2f}{peak:>10}")
+    print(f"{'total':<26}{stats['total_seconds'] * 1e3:>10.2f}")
+    print(f"terminals {stats['terminals']}, non-terminals {stats['non_terminals']}, productions {stats['productions']}")
+    print(f"states {stats['states']}, closure calls {stats['closure_calls']}, GO edges {stats['go_edges']}")
+    if stats["items_per_state"]:
+        print(f"items per state: max {stats['items_per_state']['max']}, mean {stats['items_per_state']['mean']:.1f}")
+    print(f"packed tables {stats['packed_bytes'] / 1024:.1f} KB")
+    print(f"conflicts {len(stats['conflicts'])}, LALR(1) merge conflicts {len(stats['lalr_conflicts'])}")
+    for conflict in stats["conflicts"]:
+        actions = ", ".join(
+            f"r {action['production']}" if action["type"] == "r" else f"{action['type']} {action['target']}"
+            for action in conflict["actions"]
+        )
+        print(f"  closure {conflict['closure']} on {conflict['terminal']} ({conflict['kind']}): {actions}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
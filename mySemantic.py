@@ -59,6 +59,8 @@ class Semantic:
         self.tmp_words_table = []  # 所有的临时变量
         self.process_table = []
         self.quaternion_table = []
+        # 增量分析拼接的函数已经生成的四元式表行：{该函数第一个四元式的下标: 行}，见myParser.FunctionUnit.apply
+        self.quaternation_rows = {}
         self.productions = productions
         self.non_terminal_symbols = non_terminal_symbols
         self.terminal_symbols = terminal_symbols
@@ -645,6 +647,13 @@ class Semantic:
 
     def getQuaternationTable(self):
         ret = [["地址", "四元式"]]
-        for i, instr in enumerate(self.quaternion_table):
-            ret.append([str(i + self.start_address), str(instr)])
+        i = 0
+        while i < len(self.quaternion_table):
+            rows = self.quaternation_rows.get(i)
+            if rows is not None:
+                ret.extend(rows)
+                i += len(rows)
+                continue
+            ret.append([str(i + self.start_address), str(self.quaternion_table[i])])
+            i += 1
         return ret
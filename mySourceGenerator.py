@@ -0,0 +1,240 @@
+"""
+按mytest.cfg文法随机生成合法源程序，用于词法/语法分析器的性能测试
+生成的程序同时满足语义检查：变量先声明后使用且在函数内不重名，函数先定义后调用且参数个数一致，
+有返回值的函数以return结尾，只有返回i32的函数会出现在表达式中
+
+用法：
+    python mySourceGenerator.py [函数个数] [随机种子] > out.c
+"""
+
+import random
+import sys
+
+from tokenType import tokenKeywords
+
+# 二元运算符，与文法中的CmpOp、AddOp、MulOp对应，比较运算只用于条件
+CMP_OPS = ["<", "<=", ">", ">=", "==", "!="]
+ADD_OPS = ["+", "-"]
+MUL_OPS = ["*", "/"]
+
+# 注释中使用的单词，不包含"*/"和"//"，保证块注释只在末尾结束
+COMMENT_WORDS = ["todo", "check", "the", "value", "loop", "until", "result", "is", "ready", "see", "above",
+                 "index", "counter", "temporary", "fast", "path", "note", "keep", "in", "sync"]
+
+
+class SourceGenerator(object):
+    '''
+    源程序生成器，各参数控制生成程序的规模与形态：
+    - functions: 函数个数（最后一个函数名为main）
+    - statements: 每个函数体（及每个块）的语句数范围(min, max)
+    - identifier_length: 标识符长度范围(min, max)，在其中均匀分布
+    - comment_density: 每条语句前插入一行//注释的概率
+    - block_comment_density: 每个函数前插入/* */块注释的概率
+    - block_comment_lines: 块注释的行数范围(min, max)
+    - operator_density: 表达式中每个操作数之后继续接一个二元运算符的概率
+    - line_width: 语句超过该宽度时在token之间折行
+    - max_depth: if/while嵌套的最大深度
+    - seed: 随机种子，相同的参数与种子生成相同的程序
+    '''
+
+    def __init__(
+        self,
+        functions=10,
+        statements=(2, 8),
+        identifier_length=(1, 10),
+        comment_density=0.1,
+        block_comment_density=0.2,
+        block_comment_lines=(1, 6),
+        operator_density=0.4,
+        line_width=100,
+        max_depth=3,
+        seed=0,
+    ):
+        self.functions = functions
+        self.statements = statements
+        self.identifier_length = identifier_length
+        self.comment_density = comment_density
+        self.block_comment_density = block_comment_density
+        self.block_comment_lines = block_comment_lines
+        self.operator_density = operator_density
+        self.line_width = line_width
+        self.max_depth = max_depth
+        self.seed = seed
+
+    def generate(self):
+        '''返回生成的源程序（字符串）'''
+        return "\n".join(self.iterLines()) + "\n"
+
+    def iterLines(self):
+        '''逐行产生源程序'''
+        self.rng = random.Random(self.seed)
+        self.names = set()
+        # 已定义的函数：(函数名, 参数个数, 是否返回i32)
+        self.defined = []
+        for k in range(self.functions):
+            yield from self.genFunction(k == self.functions - 1)
+            yield ""
+
+    def newName(self):
+        '''生成一个未使用过、不是关键字的标识符'''
+        rng = self.rng
+        lo, hi = self.identifier_length
+        while True:
+            length = rng.randint(lo, hi)
+            name = rng.choice("abcdefghijklmnopqrstuvwxyz_") + "".join(
+                rng.choice("abcdefghijklmnopqrstuvwxyz_0123456789") for _ in range(length - 1)
+            )
+            if name not in tokenKeywords and name not in self.names and name != "main":
+                self.names.add(name)
+                return name
+
+    def comment(self):
+        return " ".join(self.rng.choice(COMMENT_WORDS) for _ in range(self.rng.randint(2, 8)))
+
+    def genFunction(self, is_main):
+        rng = self.rng
+        if rng.random() < self.block_comment_density:
+            lines = [self.comment() for _ in range(rng.randint(*self.block_comment_lines))]
+            if len(lines) == 1:
+                yield f"/* {lines[0]} */"
+            else:
+                yield "/*"
+                for line in lines:
+                    yield " * " + line
+                yield " */"
+
+        name = "main" if is_main else self.newName()
+        params = [] if is_main else [self.newName() for _ in range(rng.randint(0, 3))]
+        returns = not is_main and rng.random() < 0.6
+        header = f"fn {name}(" + ", ".join(f"mut {p}: i32" for p in params) + ")"
+        if returns:
+            header += " -> i32"
+        yield header + " {"
+
+        # 作用域栈，每层是当前块中可见的变量
+        self.scopes = [list(params)]
+        yield from self.genBlock(1, 0)
+        if returns:
+            yield from self.wrap(1, ["return"] + self.genExpr() + [";"])
+        yield "}"
+        self.defined.append((name, len(params), returns))
+
+    def genBlock(self, indent, depth):
+        rng = self.rng
+        for _ in range(rng.randint(*self.statements)):
+            if rng.random() < self.comment_density:
+                yield "    " * indent + "// " + self.comment()
+            yield from self.genStmt(indent, depth)
+
+    def visible(self):
+        return [name for scope in self.scopes for name in scope]
+
+    def genStmt(self, indent, depth):
+        rng = self.rng
+        pad = "    " * indent
+        choice = rng.random()
+        if depth < self.max_depth and choice < 0.15:
+            keyword = "while" if rng.random() < 0.4 else "if"
+            yield from self.wrap(indent, [keyword] + self.genCondition() + ["{"])
+            yield from self.genScope(indent + 1, depth + 1)
+            if keyword == "if" and rng.random() < 0.5:
+                yield pad + "} else {"
+                yield from self.genScope(indent + 1, depth + 1)
+            yield pad + "}"
+        elif choice < 0.5 or not self.visible():
+            name = self.newName()
+            yield from self.wrap(indent, ["let", "mut", name, ":", "i32", "="] + self.genExpr() + [";"])
+            self.scopes[-1].append(name)
+        elif choice < 0.85:
+            target = rng.choice(self.visible())
+            yield from self.wrap(indent, [target, "="] + self.genExpr() + [";"])
+        elif self.defined:
+            name, count, _ = rng.choice(self.defined)
+            yield from self.wrap(indent, self.genCall(name, count) + [";"])
+        else:
+            yield pad + ";"
+
+    def genScope(self, indent, depth):
+        self.scopes.append([])
+        yield from self.genBlock(indent, depth)
+        self.scopes.pop()
+
+    def genCall(self, name, count, depth=0):
+        tokens = [name + "("]
+        for k in range(count):
+            if k:
+                tokens.append(",")
+            tokens.extend(self.genExpr(depth + 1))
+        tokens.append(")")
+        return tokens
+
+    def genOperand(self, depth):
+        rng = self.rng
+        choice = rng.random()
+        names = self.visible()
+        callable = [f for f in self.defined if f[2]]
+        if choice < 0.1 and depth < 3:
+            return ["("] + self.genExpr(depth + 1) + [")"]
+        if choice < 0.2 and callable and depth < 3:
+            name, count, _ = rng.choice(callable)
+            return self.genCall(name, count, depth + 1)
+        if choice < 0.6 and names:
+            return [rng.choice(names)]
+        return [str(rng.randint(0, 1000))]
+
+    def genExpr(self, depth=0):
+        '''以token列表的形式返回一个算术表达式，运算符个数由operator_density控制'''
+        rng = self.rng
+        tokens = self.genOperand(depth)
+        while rng.random() < self.operator_density:
+            tokens.append(rng.choice(rng.choice((ADD_OPS, MUL_OPS))))
+            tokens.extend(self.genOperand(depth))
+        return tokens
+
+    def genCondition(self):
+        '''if/while的条件；语义分析只支持比较运算出现在条件中，不能赋值给变量'''
+        tokens = self.genExpr()
+        if self.rng.random() < 0.8:
+            tokens.append(self.rng.choice(CMP_OPS))
+            tokens.extend(self.genExpr())
+        return tokens
+
+    def wrap(self, indent, tokens):
+        '''将一条语句的token拼接为若干行，超过line_width时折行，续行多缩进一级'''
+        pad = "    " * indent
+        line = pad
+        for token in tokens:
+            glue = "" if line == pad or token in (",", ";", ")", ":") or line.endswith("(") else " "
+            if len(line) + len(glue) + len(token) > self.line_width and line.strip():
+                yield line
+                line = pad + "    " + token
+            else:
+                line += glue + token
+        yield line
+
+
+# 性能测试语料：名字到生成器参数，scale倍数作用于函数个数
+CORPUS_SHAPES = {
+    "baseline": {},
+    "many_functions": {"statements": (1, 3)},
+    "long_identifiers": {"identifier_length": (16, 40)},
+    "comment_heavy": {"comment_density": 0.6, "block_comment_density": 0.9, "block_comment_lines": (5, 30)},
+    "operator_heavy": {"operator_density": 0.75},
+    "long_lines": {"operator_density": 0.7, "line_width": 400},
+}
+
+
+def makeCorpus(scale=1, seed=0):
+    '''返回{名字: 源程序行列表}，每种形态约scale * 200个函数'''
+    corpus = {}
+    for name, options in CORPUS_SHAPES.items():
+        functions = scale * (600 if name == "many_functions" else 200)
+        generator = SourceGenerator(functions=functions, seed=seed, **options)
+        corpus[name] = list(generator.iterLines())
+    return corpus
+
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.stdout.write(SourceGenerator(functions=functions, seed=seed).generate())
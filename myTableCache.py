@@ -0,0 +1,95 @@
+"""
+语法分析表的磁盘缓存
+Parser构造时先按缓存键查找，命中则直接载入产生式、符号表与ACTION/GOTO表，跳过项目集族的构造
+缓存键由以下内容的哈希组成，任一变化都会使旧缓存失效：
+- 文法文件的内容
+- 终结符表
+- 分析表生成器版本（myParser.TABLE_GENERATOR_VERSION）与构造方式（lr1/lalr1）
+- marshal格式版本与Python版本（缓存文件用marshal序列化）
+"""
+
+import hashlib
+import marshal
+import os
+import platform
+import tempfile
+
+MAGIC = b"RTCBTBL1"
+
+
+class ParserTableCache(object):
+    '''
+    缓存目录中每个(文法, 构造方式)只保留一个文件：<文法文件名>-<绝对路径哈希前8位>-<构造方式>-<键前16位>.tables
+    路径哈希区分不同目录下的同名文法，存入新文件时只删除同一路径的过期文件
+    文件内容为MAGIC + 完整的键 + marshal序列化的分析表，写入时先写临时文件再原子替换
+    '''
+
+    def __init__(self, directory=".table_cache"):
+        self.directory = directory
+
+    def key(self, filename, terminal_symbols, table_mode, version):
+        '''计算缓存键，文法文件不存在时返回None'''
+        try:
+            with open(filename, "rb") as f:
+                grammar = f.read()
+        except FileNotFoundError:
+            return None
+        digest = hashlib.sha256()
+        for part in (
+            grammar,
+            "\0".join(terminal_symbols).encode("utf-8"),
+            f"{version}:{table_mode}:{marshal.version}:{platform.python_implementation()}:"
+            f"{platform.python_version()}".encode("utf-8"),
+        ):
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def prefix(self, filename, table_mode):
+        path_digest = hashlib.sha256(os.path.abspath(filename).encode("utf-8")).hexdigest()[:8]
+        return f"{os.path.basename(filename)}-{path_digest}-{table_mode}-"
+
+    def path(self, filename, table_mode, key):
+        return os.path.join(self.directory, f"{self.prefix(filename, table_mode)}{key[:16]}.tables")
+
+    def load(self, filename, table_mode, key):
+        '''返回缓存的分析表数据，未命中、文件损坏或键不一致时返回None'''
+        if key is None:
+            return None
+        try:
+            with open(self.path(filename, table_mode, key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = MAGIC + key.encode("ascii")
+        if not data.startswith(header):
+            return None
+        try:
+            return marshal.loads(data[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, filename, table_mode, key, tables):
+        '''原子地写入缓存文件，并删除同一文法、同一构造方式的过期文件'''
+        if key is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(filename, table_mode, key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC + key.encode("ascii"))
+                f.write(marshal.dumps(tables))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        prefix = self.prefix(filename, table_mode)
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".tables") and os.path.join(self.directory, name) != path:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
@@ -0,0 +1,276 @@
+from array import array
+from bisect import bisect_left
+from itertools import chain
+
+from tokenType import tokenType, tokenTerminalIds
+
+# tokenType在紧凑存储中以整数kind表示，kind即其在TOKEN_TYPES中的下标
+TOKEN_TYPES = list(tokenType)
+TOKEN_KINDS = {t: i for i, t in enumerate(TOKEN_TYPES)}
+UNKNOWN_KIND = TOKEN_KINDS[tokenType.UNKNOWN]
+EOF_KIND = TOKEN_KINDS[tokenType.EOF]
+# kind到语法分析器终结符id的映射，不对应终结符时为-1
+KIND_TERMINALS = [tokenTerminalIds[t] for t in TOKEN_TYPES]
+
+
+def moveGap(values, gap, target, base):
+    '''
+    values中下标不小于gap的值保存为减去base的相对值（base为总长度之类随编辑改变的量）；
+    把分界移到target，两者之间的值在绝对值与相对值之间换算，返回新的分界
+    '''
+    if target < gap:
+        values[target:gap] = array("i", map((-base).__add__, values[target:gap]))
+    elif target > gap:
+        values[gap:target] = array("i", map(base.__add__, values[gap:target]))
+    return target
+
+
+class Token(object):
+    '''
+    单个token，同时兼容原先的dict写法：token["id"]、token["content"]、token["prop"]、token["loc"]["row"]
+    无法解析的单个字符没有id与content（为None），对应的dict中也没有这两个键
+    terminal为词法分析时标注的终结符id（Parser.terminal_symbols的下标），不对应终结符时为-1
+    '''
+    __slots__ = ("id", "content", "prop", "row", "col", "terminal")
+
+    def __init__(self, id, content, prop, row, col, terminal=None):
+        self.id = id
+        self.content = content
+        self.prop = prop
+        self.row = row
+        self.col = col
+        self.terminal = tokenTerminalIds[prop] if terminal is None else terminal
+
+    @property
+    def loc(self):
+        return {"row": self.row, "col": self.col}
+
+    def keys(self):
+        if self.id is None:
+            return ["prop", "loc"]
+        return ["id", "content", "prop", "loc"]
+
+    def __getitem__(self, key):
+        if key == "loc":
+            return self.loc
+        if key in ("id", "content", "prop") and getattr(self, key) is not None:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def toDict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, (Token, dict)):
+            return self.toDict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Token({self.toDict()})"
+
+
+class TokenStore(object):
+    '''
+    以struct-of-arrays方式紧凑存储的token序列，每个token只占几个array("i")中的整数：
+    - kind: tokenType在TOKEN_TYPES中的下标
+    - row: 行号（与原实现一致，不计空行）
+    - start/end: token在所在行中的下标范围，col = start + 1；end为-1表示无法解析的单个字符
+    content不单独保存，按需从source（所有非空行拼接成的缓冲区，每行后接一个换行符）中切片得到；终结符id由kind查表得到
+    下标访问与迭代得到Token视图，可以像原先的dict一样使用
+    增量词法分析由replaceLines原地替换若干行：最近一次替换处之后各token的row保存为减去总行数的值，
+    各行的line_offset保存为减去source长度的值，插入或删除行时其后的值不必逐个修改；
+    row_gap/offset_gap为第一个保存相对值的token/行，读取时由getRow/getLineOffset换算
+    每次replaceLines使version加1；之前由它得到、之后还会从中读取文本的结果（语法树、规约过程记录）
+    记下当时的version，读取时由checkVersion检查，内容已被替换时抛出异常，而不是给出编辑后的文本
+    '''
+
+    def __init__(self):
+        self.kind = array("i")
+        self.row = array("i")
+        self.start = array("i")
+        self.end = array("i")
+        # 第row行在source中的起始偏移，下标为row - 1
+        self.line_offset = array("i")
+        # 无法解析字符条目的下标（升序），它们不占用id
+        self.unknown = []
+        self.source = ""
+        self.version = 0
+        self.row_gap = None
+        self.offset_gap = None
+        self._lines = []
+        self._size = 0
+
+    def addLine(self, line, spans):
+        '''
+        追加一个非空行的扫描结果
+        参数：
+        - line: 该行源代码
+        - spans: 扁平的[kind, start, end, kind, start, end, ...]列表
+        '''
+        row = len(self.line_offset) + 1
+        self.line_offset.append(self._size)
+        self._size += len(line) + 1
+        self._lines.append(line)
+        count = len(spans) // 3
+        if not count:
+            return
+        base = len(self.kind)
+        ends = spans[2::3]
+        self.kind.extend(spans[0::3])
+        self.start.extend(spans[1::3])
+        self.end.extend(ends)
+        self.row.extend(array("i", [row]) * count)
+        if -1 in ends:
+            self.unknown.extend(base + k for k, end in enumerate(ends) if end < 0)
+
+    def finish(self):
+        '''追加EOF并拼接source缓冲区，之后不再追加'''
+        self.kind.append(EOF_KIND)
+        self.row.append(len(self.line_offset) + 1)
+        self.start.append(0)
+        self.end.append(1)
+        self.source = "".join(line + "\n" for line in self._lines)
+        self._lines = None
+        self.row_gap = len(self.kind)
+        self.offset_gap = len(self.line_offset)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def checkVersion(self, version):
+        '''version为取得某个结果时的self.version，其后又有replaceLines时抛出RuntimeError'''
+        if version != self.version:
+            raise RuntimeError("tokens were changed by an incremental edit after this result was produced")
+
+    def getRow(self, i):
+        row = self.row[i]
+        return row + len(self.line_offset) if i >= self.row_gap else row
+
+    def getLineOffset(self, row_index):
+        '''第row_index行（下标从0开始）在source中的起始偏移，row_index为总行数时即source的长度'''
+        if row_index == len(self.line_offset):
+            return len(self.source)
+        offset = self.line_offset[row_index]
+        return offset + len(self.source) if row_index >= self.offset_gap else offset
+
+    def getOffset(self, i):
+        '''第i个token在source中的起始偏移'''
+        return self.getLineOffset(self.getRow(i) - 1) + self.start[i]
+
+    def firstToken(self, row_index):
+        '''第row_index行（下标从0开始）及之后各行的第一个token的下标（二分查找）'''
+        lo, hi = 0, len(self.kind) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.getRow(mid) <= row_index:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def moveGaps(self, token, row_index):
+        '''把row_gap移到第token个token、offset_gap移到第row_index行，两处之间的值在绝对值与相对值之间换算'''
+        self.row_gap = moveGap(self.row, self.row_gap, token, len(self.line_offset))
+        self.offset_gap = moveGap(self.line_offset, self.offset_gap, row_index, len(self.source))
+
+    def replaceLines(self, first_row, last_row, lines, spans_list):
+        '''
+        把第first_row到last_row - 1行（下标从0开始）替换为lines中各非空行的扫描结果（spans_list，格式同addLine）
+        代价与替换的token数及上次替换处到这里的距离有关，其后的token与行只整段移动
+        （行数或token数改变时各数组的整段移动，以及source的重新拼接，都与文件大小成正比，
+        但只是C中的内存复制，远小于重新扫描；source不分块保存，getContent等仍可直接切片）
+        '''
+        first_token = self.firstToken(first_row)
+        last_token = self.firstToken(last_row) if last_row > first_row else first_token
+        self.moveGaps(last_token, last_row)
+        offset = self.getLineOffset(first_row)
+        end_offset = self.getLineOffset(last_row)
+
+        kinds, starts, ends, rows = array("i"), array("i"), array("i"), array("i")
+        offsets = array("i")
+        unknown = []
+        position = offset
+        for k, (line, spans) in enumerate(zip(lines, spans_list)):
+            offsets.append(position)
+            position += len(line) + 1
+            count = len(spans) // 3
+            if not count:
+                continue
+            base = first_token + len(kinds)
+            line_ends = spans[2::3]
+            kinds.extend(spans[0::3])
+            starts.extend(spans[1::3])
+            ends.extend(line_ends)
+            rows.extend(array("i", [first_row + k + 1]) * count)
+            if -1 in line_ends:
+                unknown.extend(base + j for j, end in enumerate(line_ends) if end < 0)
+
+        self.kind[first_token:last_token] = kinds
+        self.start[first_token:last_token] = starts
+        self.end[first_token:last_token] = ends
+        self.row[first_token:last_token] = rows
+        self.line_offset[first_row:last_row] = offsets
+        self.source = self.source[:offset] + "".join(line + "\n" for line in lines) + self.source[end_offset:]
+        self.row_gap = first_token + len(kinds)
+        self.offset_gap = first_row + len(offsets)
+        delta = len(kinds) - (last_token - first_token)
+        first, last = bisect_left(self.unknown, first_token), bisect_left(self.unknown, last_token)
+        self.unknown[first:] = unknown + [index + delta for index in self.unknown[last:]]
+        self.version += 1
+
+    def getId(self, i):
+        if self.end[i] < 0:
+            return None
+        return i + 1 - bisect_left(self.unknown, i)
+
+    def getContent(self, i):
+        end = self.end[i]
+        if end < 0:
+            return None
+        if self.kind[i] == EOF_KIND:
+            return "#"
+        offset = self.getLineOffset(self.getRow(i) - 1)
+        return self.source[offset + self.start[i]:offset + end]
+
+    def getProp(self, i):
+        return TOKEN_TYPES[self.kind[i]]
+
+    def getTerminal(self, i):
+        return KIND_TERMINALS[self.kind[i]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        kind = self.kind[i]
+        return Token(self.getId(i), self.getContent(i), TOKEN_TYPES[kind], self.getRow(i), self.start[i] + 1,
+                     KIND_TERMINALS[kind])
+
+    def __iter__(self):
+        # 顺序遍历时id递增即可，不必每次二分查找；相对值先整段换算为绝对值
+        source = self.source
+        rows, size = len(self.line_offset), len(source)
+        row_values = chain(self.row[:self.row_gap], map(rows.__add__, self.row[self.row_gap:]))
+        line_offset = self.line_offset[:self.offset_gap] + array("i", map(size.__add__, self.line_offset[self.offset_gap:]))
+        id = 1
+        for kind, row, start, end in zip(self.kind, row_values, self.start, self.end):
+            if end < 0:
+                yield Token(None, None, TOKEN_TYPES[kind], row, start + 1, KIND_TERMINALS[kind])
+                continue
+            if kind == EOF_KIND:
+                content = "#"
+            else:
+                offset = line_offset[row - 1]
+                content = source[offset + start:offset + end]
+            yield Token(id, content, TOKEN_TYPES[kind], row, start + 1, KIND_TERMINALS[kind])
+            id += 1
+
+    def toDicts(self):
+        return [token.toDict() for token in self]
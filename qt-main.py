@@ -1,17 +1,18 @@
 import json
-from PyQt5.QtCore import QObject, pyqtSlot, QThread, Qt, QRectF
+from PyQt5.QtCore import QObject, pyqtSlot, QThread, Qt, QRectF, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QFont, QPalette, QColor, QPainter, QFontMetrics, QPen, QBrush
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout,
-    QTableWidget, QTableWidgetItem, QTreeWidget, QTreeWidgetItem, QLabel, QTextEdit, QPushButton, QMessageBox,
+    QTableWidget, QTableWidgetItem, QTableView, QTreeWidget, QTreeWidgetItem, QLabel, QTextEdit, QPushButton, QMessageBox,
     QAbstractScrollArea, QStyleFactory, QHeaderView, QGraphicsScene, QGraphicsView, QGraphicsSimpleTextItem,
     QGraphicsItem, QGraphicsRectItem, QFileDialog
 )
-from myLexer import Lexer
-from myParser import Parser
-from myCodeGenerator import CodeGenerator
-from myBlockDivider import BlockDivider
-from tokenType import tokenKeywords, tokenSymbols
+from myArtifact import ArtifactSink, makeSink, to_json_value
+from myLexer import Lexer, IncrementalLexer
+from myParser import Parser, IncrementalParser
+from myTableCache import ParserTableCache
+from myCodeGenerator import IncrementalCodeGenerator
+from tokenType import tokenKeywords, tokenSymbols, tokenType
 
 
 def beautify_table_widget(table: QTableWidget):
@@ -24,6 +25,48 @@ def beautify_table_widget(table: QTableWidget):
     table.setEditTriggers(QTableWidget.NoEditTriggers)  # 禁止编辑（可选）
 
 
+class ProcessTableModel(QAbstractTableModel):
+    """
+    规约过程表的数据模型：process为表头加各行（Parser.parse_process_display的ParseTrace，或普通的行列表），
+    视图显示到某一行时才按页向process取行，长输入不必一次生成全部文字
+    """
+    PAGE = 200
+
+    def __init__(self, process, parent=None):
+        super().__init__(parent)
+        self.process = process
+        self.headers = list(process[0])
+        self.row_count = len(process) - 1
+        self.pages = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def getRow(self, i):
+        page = i // self.PAGE
+        if page not in self.pages:
+            start = page * self.PAGE + 1
+            self.pages[page] = self.process[start:start + self.PAGE]
+        return self.pages[page][i % self.PAGE]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return str(self.getRow(index.row())[index.column()])
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignLeft | Qt.AlignTop
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+
 def setModernStyle(app):
     app.setStyle(QStyleFactory.create("Fusion"))
 
@@ -97,14 +140,26 @@ class AstNodeItem(QGraphicsRectItem):
 
 
 class Compiler(QObject):
-    def __init__(self, filename, parent=None):
+    def __init__(self, filename, parent=None, sink=None, cache=None, parse_mode="full"):
         super().__init__(parent)
-        self.lexer = Lexer()
-        self.parser = Parser(filename)
+        # 各阶段共用的中间产物写出层，默认不写出
+        self.sink = sink if sink is not None else ArtifactSink()
+        self.lexer = Lexer(sink=self.sink)
+        # 编辑器每次“重新分析”只重新扫描发生变化的行
+        self.incremental_lexer = IncrementalLexer(self.lexer)
+        # 分析模式见Parser.getParse：只有full模式建立语法树、记录规约过程并生成目标代码，
+        # 只需检查语法（recognize）或语法与语义（semantic）时可以跳过这些开销
+        self.parse_mode = parse_mode
+        # 分析表缓存命中时不再重新构造项目集族
+        self.parser = Parser(filename, sink=self.sink, cache=cache, parse_mode=parse_mode)
+        # 同样只重新分析发生变化的函数，其余函数拼接上次的语法树、规约过程、语义分析结果与目标代码
+        self.incremental_parser = IncrementalParser(self.parser)
+        self.code_generator = IncrementalCodeGenerator(sink=self.sink)
         self.goto_table = self.parser.get_goto_table()
         self.action_table = self.parser.get_action_table()
 
     def process(self, code_str):
+        self.sink.beginUnit()
         try:
             token_list, lexer_success = self.getLex(code_str)
         except Exception as e:
@@ -123,34 +178,38 @@ class Compiler(QObject):
                 "semantic_quaternation": [["Error"]],
             }
             lexer_success = False
+        # 规约过程不经过JSON，由界面直接按页读取
+        self.process_trace = parse_result.pop("process")
+        # 语法树为CSTNode视图，序列化时转为原先的dict格式
         return json.dumps(
             {
                 "lexer": self.dumpTokenList(token_list),
                 "lexer_success": lexer_success,
                 **parse_result,
-            }
+            },
+            default=to_json_value,
         )
 
     def dumpTokenList(self, token_list):
         def dumpToken(r):
-            r["prop"] = r["prop"].value
+            # Token视图转为普通dict，供JSON与showLexResult使用
+            r = dict(r)
+            if isinstance(r["prop"], tokenType):
+                r["prop"] = r["prop"].value
             return r
 
         return list(map(dumpToken, token_list))
 
     def getParse(self, token_list):
         if self.parser is not None:
-            parsed_result = self.parser.getParse(token_list)
-            if not self.parser.semantic_error_occur:
-                blockDivider = BlockDivider(self.parser.semantic.quaternion_table)
-                blockDivider.computeBlocks(self.parser.semantic.getFuncTable())
-                codeGenerator = CodeGenerator(blockDivider.func_blocks, self.parser.semantic.process_table,
-                                              self.parser.semantic.words_table)
-                codes = codeGenerator.getObjectCode()
-                with open("./code.asm", "w") as f:
-                    f.write("\n".join(codes))
-                code_error_occur = codeGenerator.error_occur
-                code_error_msg = codeGenerator.error_msg
+            # 界面需要显示规约过程，开启记录；记录只在显示时按页生成文字
+            full = self.parse_mode == "full"
+            parsed_result = self.incremental_parser.parse(token_list, trace=full)
+            if full and not self.parser.semantic_error_occur:
+                codes = self.code_generator.getObjectCode(self.parser.semantic, self.incremental_parser.units)
+                self.sink.dumpText("code.asm", codes)
+                code_error_occur = self.code_generator.error_occur
+                code_error_msg = self.code_generator.error_msg
             else:
                 code_error_occur = False
                 code_error_msg = []
@@ -160,7 +219,7 @@ class Compiler(QObject):
                 "ast": parsed_result,
                 "goto": self.goto_table,
                 "action": self.action_table,
-                "process": self.parser.parse_process_display,
+                "process": self.parser.parse_process_display if full else [[f"{self.parse_mode}模式不记录规约过程"]],
                 "semantic_quaternation": self.parser.semantic_quaternation,
                 "semantic_error_occur": self.parser.semantic_error_occur,
                 "semantic_error_message": self.parser.semantic_error_message,
@@ -180,7 +239,8 @@ class Compiler(QObject):
             }
 
     def getLex(self, code_str: str):
-        return self.lexer.getLex(code_str.splitlines())
+        self.incremental_lexer.update(code_str)
+        return self.incremental_lexer.getLex()
 
 
 class CompilerGUI(QMainWindow):
@@ -238,6 +298,7 @@ class CompilerGUI(QMainWindow):
         code = self.code_editor.toPlainText()
         result_json = self.compiler.process(code)
         result = json.loads(result_json)
+        result["process"] = self.compiler.process_trace
         self.updateAll(result)
 
     def loadFile(self, filepath):
@@ -294,7 +355,7 @@ class CompilerGUI(QMainWindow):
 
     def initProcessTab(self):
         layout = QVBoxLayout()
-        self.proc_table = QTableWidget()
+        self.proc_table = QTableView()
         layout.addWidget(self.proc_table)
         self.process_tab.setLayout(layout)
 
@@ -446,19 +507,12 @@ class CompilerGUI(QMainWindow):
         fill_table(self.goto_table, goto)
 
     def showProcess(self, process):
-        headers = process[0]
-        self.proc_table.setColumnCount(len(headers))
-        self.proc_table.setHorizontalHeaderLabels(headers)
-        self.proc_table.setRowCount(len(process) - 1)
-        for i, row in enumerate(process[1:]):
-            for j, val in enumerate(row):
-                item = QTableWidgetItem(str(val))
-                item.setTextAlignment(Qt.AlignLeft | Qt.AlignTop)
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                item.setToolTip(str(val))
-                self.proc_table.setItem(i, j, item)
-
-        beautify_table_widget(self.proc_table)
+        self.proc_table.setModel(ProcessTableModel(process, self.proc_table))
+        self.proc_table.setAlternatingRowColors(True)
+        self.proc_table.verticalHeader().setVisible(False)
+        # 列宽只按前一页估计，不为计算列宽生成全部行；行高保持默认，不逐行计算
+        self.proc_table.horizontalHeader().setResizeContentsPrecision(ProcessTableModel.PAGE)
+        self.proc_table.resizeColumnsToContents()
 
     def showQuad(self, quad_data):
         headers = ["地址", "四元式", "op", "arg1", "arg2", "result"]
@@ -537,8 +591,14 @@ if __name__ == "__main__":
         if not code_filename:
             code_filename = default_code_filename
 
+    # 中间产物写出模式：disabled（默认）/ json / ndjson / unit
+    artifact_mode = "disabled"
+
+    # 分析表缓存目录，文法文件改变后缓存自动失效
+    table_cache_dir = ".table_cache"
+
     # 启动编译器和GUI
-    compiler = Compiler(cfg_filename)
+    compiler = Compiler(cfg_filename, sink=makeSink(artifact_mode), cache=ParserTableCache(table_cache_dir))
     gui = CompilerGUI(compiler, code_filename)
     gui.show()
     sys.exit(app.exec_())
@@ -0,0 +1,182 @@
+"""
+增量词法分析与增量语法分析的一致性测试：任意编辑序列之后的结果都须与对编辑后的整个源代码重新分析相同
+"""
+
+import random
+import re
+
+import pytest
+
+from conftest import quietly
+from myBlockDivider import BlockDivider
+from myCodeGenerator import CodeGenerator, IncrementalCodeGenerator
+from myLexer import Lexer, IncrementalLexer
+from myParser import IncrementalParser
+from mySourceGenerator import SourceGenerator
+
+# 随机插入源代码的片段，包括各种换行符、块注释的开始与结束和非法字符
+EDIT_FRAGMENTS = ["\n", "\r\n", "\r", "/*", "*/", "//x", " ", "a", "1", "fn", "{", "}", ";", "@", "\n\n", "let", "\f", "x\r"]
+
+
+def assert_same_as_scan(incremental, text):
+    """增量扫描的TokenStore（逐个token、按下标与content）及是否成功，与对text完整扫描的结果相同"""
+    tokens = incremental.getTokens()
+    expected, success = Lexer().scan(text.splitlines())
+    assert tokens.toDicts() == expected.toDicts()
+    assert [tokens[index].toDict() for index in range(len(tokens))] == expected.toDicts()
+    assert [tokens.getContent(index) for index in range(len(tokens))] == \
+           [expected.getContent(index) for index in range(len(expected))]
+    assert incremental.success == success
+    assert incremental.failed == incremental.ok.count(False)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_lexer_matches_full_scan(seed):
+    """随机的字符编辑（update）与整行替换（edit）交替进行"""
+    rng = random.Random(seed)
+    text = "\n".join(SourceGenerator(functions=3, seed=seed).iterLines())
+    incremental = IncrementalLexer(Lexer())
+    incremental.update(text)
+    for _ in range(80):
+        if rng.random() < 0.8:
+            for _ in range(rng.randrange(1, 4)):
+                position = rng.randrange(len(text) + 1)
+                cut = rng.randrange(0, 6) if rng.random() < 0.5 else 0
+                text = text[:position] + (rng.choice(EDIT_FRAGMENTS) if rng.random() < 0.8 else "") + text[position + cut:]
+            incremental.update(text)
+        else:
+            lines = text.splitlines()
+            start = rng.randrange(len(lines) + 1)
+            end = rng.randrange(start, min(len(lines), start + 3) + 1)
+            new = [rng.choice(["", "let a = 1;", "/* x", "*/ b", "  "]) for _ in range(rng.randrange(3))]
+            incremental.edit(start, end, new)
+            lines[start:end] = new
+            text = "\n".join(lines)
+        assert_same_as_scan(incremental, text)
+
+
+def test_edit_relexes_only_changed_lines(sample_lines):
+    lines = sample_lines * 20
+    incremental = IncrementalLexer(Lexer())
+    incremental.reset("\n".join(lines))
+    middle = len(lines) // 2
+    assert incremental.edit(middle, middle + 1, [lines[middle] + " "]) == 1
+    lines[middle] += " "
+    assert_same_as_scan(incremental, "\n".join(lines))
+    # 未闭合的块注释改变其后所有行的注释状态
+    assert incremental.edit(middle, middle, ["/*"]) == len(lines) - middle + 1
+    lines.insert(middle, "/*")
+    assert_same_as_scan(incremental, "\n".join(lines))
+
+
+def test_edit_does_not_change_earlier_results(parser, sample_lines):
+    """getTokens返回的TokenStore被原地编辑后，之前的语法树与规约过程记录不会给出编辑后的文本，而是抛出异常"""
+    text = "\n".join(sample_lines)
+    incremental = IncrementalLexer(Lexer())
+    incremental.update(text)
+    tree = quietly(parser.getParse, incremental.getTokens(), trace=True)
+    trace = parser.parse_process_display
+    content = tree["content"]
+    incremental.update(text.replace("a", "zzzzzz", 3))
+    with pytest.raises(RuntimeError):
+        tree["content"]
+    with pytest.raises(RuntimeError):
+        tree.toDict()
+    with pytest.raises(RuntimeError):
+        trace[1]
+    # 编辑前已经取得的文本不受影响，重新分析编辑后的TokenStore得到新的结果
+    assert content == "".join(token.content for token in list(Lexer().scan(sample_lines)[0])[:-1])
+    assert "zzzzzz" in quietly(parser.getParse, incremental.getTokens())["content"]
+
+
+def function_ranges(lines):
+    ranges = []
+    start = None
+    for index, line in enumerate(lines):
+        if line.startswith("fn "):
+            start = index
+        elif line == "}" and start is not None:
+            ranges.append((start, index + 1))
+            start = None
+    return ranges
+
+
+def edit_program(lines, rng, original):
+    """对随机的一个函数做一种编辑：改数字、加语句、删除、复制、新增、交换、改签名、破坏括号配对等"""
+    ranges = function_ranges(lines)
+    kind = rng.randrange(10)
+    if not ranges or kind == 0:
+        return list(original)
+    first, last = ranges[rng.randrange(len(ranges))]
+    lines = list(lines)
+    if kind == 1:
+        rows = [row for row in range(first + 1, last) if re.search(r"\d+", lines[row])]
+        if rows:
+            row = rng.choice(rows)
+            lines[row] = re.sub(r"\d+", str(rng.randrange(1000)), lines[row], count=1)
+    elif kind == 2:
+        lines.insert(first + 1, f"    let mut zz{rng.randrange(99)}: i32 = {rng.randrange(9)};")
+    elif kind == 3 and "main" not in lines[first]:
+        del lines[first:last]
+    elif kind == 4:
+        lines[last:last] = lines[first:last]
+    elif kind == 5:
+        lines[first:first] = [f"fn nf{rng.randrange(999)}() -> i32 {{", "    return 1;", "}"]
+    elif kind == 6:
+        lines[first] = lines[first].replace(" -> i32", "")
+    elif kind == 7:
+        del lines[last - 1]
+    elif kind == 8:
+        lines[first:first] = ["", "// moved", ";"]
+    elif kind == 9 and "main" not in lines[first] and "(mut" not in lines[first]:
+        lines[first] = lines[first].replace("()", "(mut qq: i32)", 1)
+    return lines
+
+
+def parse_results(parser, result):
+    results = {"tree": result.toDict() if hasattr(result, "toDict") else result, "steps": parser.parse_steps,
+               "error": parser.semantic_error_occur, "messages": list(parser.semantic_error_message or []),
+               "quaternation": parser.semantic_quaternation}
+    if parser.parse_process_display is not None:
+        results["trace"] = list(parser.parse_process_display)
+    if parser.semantic is not None:
+        results["quads"] = [str(quad) for quad in parser.semantic.quaternion_table]
+    return results
+
+
+def clear_results(parser):
+    parser.semantic_quaternation = parser.semantic_error_occur = parser.semantic_error_message = None
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_reparse_matches_whole_parse(parser, seed):
+    """IncrementalParser与IncrementalCodeGenerator的结果与getParse + BlockDivider + CodeGenerator相同"""
+    rng = random.Random(seed)
+    original = list(SourceGenerator(functions=8 + seed, seed=seed).iterLines())
+    lines = original
+    lexer = IncrementalLexer(Lexer())
+    incremental = IncrementalParser(parser)
+    generator = IncrementalCodeGenerator()
+    reused = 0
+    for step in range(30):
+        if step:
+            lines = edit_program(lines, rng, original)
+        lexer.update("\n".join(lines))
+        tokens = lexer.getTokens()
+        mode = rng.choice(["recognize", "semantic", "full", "full"])
+        trace = rng.random() < 0.6
+        clear_results(parser)
+        got = parse_results(parser, quietly(incremental.parse, tokens, trace=trace, mode=mode))
+        if mode == "full" and not parser.semantic_error_occur:
+            got["code"] = quietly(generator.getObjectCode, parser.semantic, incremental.units)
+        reused += incremental.reused
+        clear_results(parser)
+        expected = parse_results(parser, quietly(parser.getParse, tokens, trace=trace, mode=mode))
+        if mode == "full" and not parser.semantic_error_occur:
+            semantic = parser.semantic
+            blockDivider = BlockDivider(semantic.quaternion_table)
+            quietly(blockDivider.computeBlocks, semantic.getFuncTable())
+            expected["code"] = quietly(CodeGenerator(blockDivider.func_blocks, semantic.process_table,
+                                                     semantic.words_table).getObjectCode)
+        assert got == expected, (step, mode, trace)
+    assert reused > 0
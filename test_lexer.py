@@ -0,0 +1,116 @@
+"""
+词法分析器的一致性测试：各backend、流式输入与多线程扫描的结果都须与原始的"dfa"实现完全相同
+"""
+
+import mmap
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import quietly
+from myBenchmark import make_word_lines
+from myLexer import Lexer
+from tokenType import tokenKeywords, tokenSymbols, tokenType_to_terminal
+
+# 随机拼接源代码时使用的片段，覆盖关键字、标识符、数字、符号前缀、注释和非法字符
+FUZZ_FRAGMENTS = (
+    list(tokenKeywords)
+    + list(tokenSymbols)
+    + ["a", "_x1", "letter", "i32x", "fn_", "main", "ifelse"]
+    + ["0", "42", "1e5", "2E+3", "7e-", "3e", "9.5", "12else", "1e+5", "3E-7x", "a1e5", "0e"]
+    + ["!", "<<", ">>", "->", "..", "...", "**/", "/**/", "/* c */", "// c", "!==", "<<==", "-->"]
+    + ["@", "$", "?", "'", "\\", "中文", "　", "\r"]
+    + [" ", " ", " ", "\t"]
+)
+
+
+def make_fuzz_lines(count, seed=0):
+    """生成count行随机拼接的源代码，其中包含空行、纯空白行和跨行注释"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        width = rng.randint(0, 12)
+        if width == 0:
+            lines.append(rng.choice(["", "   ", "\t"]))
+            continue
+        parts = []
+        for _ in range(width):
+            parts.append(rng.choice(FUZZ_FRAGMENTS))
+            if rng.random() < 0.5:
+                parts.append(" ")
+        lines.append("".join(parts))
+    return lines
+
+
+def assert_same_as_dfa(lines, backend):
+    """backend对lines的输出（token与是否成功）须与"dfa"实现完全一致"""
+    expected, expected_success = Lexer("dfa").scan(lines)
+    tokens, success = Lexer(backend).scan(lines)
+    assert success == expected_success
+    assert tokens.toDicts() == expected.toDicts()
+
+
+@pytest.mark.parametrize("backend", Lexer.BACKENDS)
+def test_backend_matches_dfa_on_sample(backend, sample_lines):
+    assert_same_as_dfa(sample_lines, backend)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("backend", Lexer.BACKENDS)
+def test_backend_matches_dfa_on_fuzz(backend, seed):
+    assert_same_as_dfa(make_fuzz_lines(2000, seed), backend)
+
+
+@pytest.mark.parametrize("keyword_dense", [True, False])
+@pytest.mark.parametrize("backend", ["compiled", "keyword"])
+def test_automaton_variants_match_dfa(backend, keyword_dense):
+    """关键字状态与标识符后查关键字表两种自动机，在关键字密集与以关键字为前缀的长标识符上"""
+    rng = random.Random(1)
+    if keyword_dense:
+        words = list(tokenKeywords)
+    else:
+        words = [w + rng.choice(["", "_", "x", "1"]) + "".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 8)))
+                 for w in list(tokenKeywords) * 4]
+    assert_same_as_dfa(make_word_lines(500, words), backend)
+
+
+@pytest.mark.parametrize("source", ["text", "binary", "mmap"])
+def test_iterLex_matches_scan(source, tmp_path):
+    """iterLex读取文本文件、二进制文件和mmap（很小的块以制造跨块的行）的结果须与scan一致"""
+    lexer = Lexer()
+    text = "\n".join(make_fuzz_lines(2000, 42))
+    expected = lexer.scan(text.splitlines())[0].toDicts()
+    path = tmp_path / "fuzz.c"
+    path.write_text(text, encoding="utf-8", newline="")
+    if source == "text":
+        with open(path, "r", encoding="utf-8") as f:
+            tokens = list(lexer.iterLex(f, chunk_size=7))
+    else:
+        with open(path, "rb") as f:
+            if source == "binary":
+                tokens = list(lexer.iterLex(f, chunk_size=7))
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    tokens = list(lexer.iterLex(mm))
+    assert [token.toDict() for token in tokens] == expected
+
+
+def test_threaded_scans_match_single_thread():
+    """多个线程同时用各backend扫描不同的输入（共享同一份自动机），结果须与单线程扫描一致"""
+    inputs = [make_fuzz_lines(1000, seed) for seed in range(4)]
+    expected = {(backend, k): Lexer(backend).scan(lines)[0].toDicts()
+                for backend in Lexer.BACKENDS for k, lines in enumerate(inputs)}
+    lexers = {backend: Lexer(backend) for backend in Lexer.BACKENDS}
+    jobs = list(expected) * 2
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda job: lexers[job[0]].scan(inputs[job[1]])[0].toDicts(), jobs))
+    for job, got in zip(jobs, results):
+        assert got == expected[job], job
+
+
+def test_terminal_ids_match_lookup(parser, sample_lines):
+    """词法分析时标注的终结符id与原先按名字查找的结果相同"""
+    tokens = list(Lexer().scan(sample_lines)[0])
+    expected = [quietly(parser.get_id_by_str, tokenType_to_terminal(token.prop)) for token in tokens]
+    assert [token.terminal for token in tokens] == expected
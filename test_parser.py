@@ -0,0 +1,282 @@
+"""
+语法分析器的一致性测试：分析表的各种构造方式、缓存与生成的模块得到相同的表，
+压缩表、各分析模式、推式分析与语法树arena的结果与原先的实现相同
+"""
+
+import hashlib
+import importlib.util
+import marshal
+import random
+import shutil
+
+import pytest
+
+from conftest import GRAMMAR, ROOT, quietly
+from myBenchmark import make_synthetic_grammar
+from myLexer import Lexer
+from myParser import Parser, PushParser, TABLE_GENERATOR_VERSION
+from myParseTables import ACTION_ACC, ACTION_S
+from mySourceGenerator import SourceGenerator
+from myTableCache import MAGIC, ParserTableCache
+
+# 原实现（逐个项目集比较、逐符号求GO）在自带文法上构造出的分析表摘要，优化后的构造必须与之一致
+EXPECTED_TABLE_DIGESTS = {"mytest.cfg": "db62f89846d1", "mytest_scan_once.cfg": "f2db887ff867"}
+
+
+def table_digest(parser):
+    """GO表、GOTO表与ACTION表的摘要，用于确认不同实现构造出的分析表完全相同"""
+    tables = ([sorted(g.items()) for g in parser.gos], [sorted(g.items()) for g in parser.goto_table],
+              [sorted(a.items()) for a in parser.action_table])
+    return hashlib.sha1(repr(tables).encode()).hexdigest()[:12]
+
+
+def mutated_programs(count, seed=5):
+    """在生成的程序中随机改动一个字符、有时再截断，得到大多有语法或语义错误的输入"""
+    rng = random.Random(seed)
+    base = list(SourceGenerator(functions=4, seed=9).iterLines())
+    programs = []
+    for k in range(count):
+        lines = list(base)
+        row = rng.randrange(len(lines))
+        line = lines[row]
+        if line:
+            col = rng.randrange(len(line) + 1)
+            lines[row] = line[:col] + rng.choice([";", "}", "{", "(", ")", "let", "=", "+", "", "fn"]) + line[col + 1:]
+        programs.append(lines[:rng.randrange(1, len(lines) + 1)] if k % 3 == 0 else lines)
+    return programs
+
+
+def semantic_results(parser):
+    return parser.semantic_error_occur, list(parser.semantic_error_message or []), str(parser.semantic_quaternation)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_TABLE_DIGESTS))
+def test_tables_match_original_construction(name):
+    assert table_digest(quietly(Parser, f"{ROOT}/{name}")) == EXPECTED_TABLE_DIGESTS[name]
+
+
+def test_parallel_construction_matches_serial(tmp_path):
+    path = tmp_path / "synthetic.cfg"
+    path.write_text(make_synthetic_grammar(8, 3))
+    serial = quietly(Parser, str(path))
+    parallel = quietly(Parser, str(path), workers=2)
+    assert table_digest(parallel) == table_digest(serial)
+
+
+@pytest.mark.parametrize("mode", Parser.TABLE_MODES)
+def test_cached_tables_match_built(mode, tmp_path):
+    cache = ParserTableCache(str(tmp_path))
+    built = quietly(Parser, GRAMMAR, table_mode=mode, cache=cache)
+    loaded = quietly(Parser, GRAMMAR, table_mode=mode, cache=cache)
+    assert (built.table_source, loaded.table_source) == ("grammar", "cache")
+    assert table_digest(loaded) == table_digest(built)
+
+
+def test_cache_keeps_same_named_grammars_apart(tmp_path):
+    cache = ParserTableCache(str(tmp_path / "cache"))
+    paths = []
+    for name, extra in (("a", ""), ("b", "\n# other\n")):
+        (tmp_path / name).mkdir()
+        path = tmp_path / name / "mytest.cfg"
+        shutil.copy(GRAMMAR, path)
+        with open(path, "a") as f:
+            f.write(extra)
+        paths.append(str(path))
+    for path in paths:
+        quietly(Parser, path, cache=cache)
+    assert all(quietly(Parser, path, cache=cache).table_source == "cache" for path in paths)
+
+
+@pytest.mark.parametrize("damage", ["missing key", "short array", "short table", "not a dict", "bad meta"])
+def test_malformed_cache_entry_is_rebuilt(damage, tmp_path):
+    cache = ParserTableCache(str(tmp_path))
+    built = quietly(Parser, GRAMMAR, cache=cache)
+    key = cache.key(GRAMMAR, Parser.terminal_symbols, "lr1", TABLE_GENERATOR_VERSION)
+    tables = cache.load(GRAMMAR, "lr1", key)
+    packed = dict(tables["packed"])
+    if damage == "missing key":
+        del tables["gos"]
+    elif damage == "short array":
+        packed["action_base"] = packed["action_base"][:-4]
+    elif damage == "short table":
+        tables["action_table"] = tables["action_table"][:-1]
+    elif damage == "not a dict":
+        tables = [1, 2]
+    else:
+        packed["meta"] = (1,)
+    if isinstance(tables, dict):
+        tables["packed"] = packed
+    with open(cache.path(GRAMMAR, "lr1", key), "wb") as f:
+        f.write(MAGIC + key.encode("ascii") + marshal.dumps(tables))
+    rebuilt = quietly(Parser, GRAMMAR, cache=cache)
+    assert rebuilt.table_source == "grammar"
+    assert table_digest(rebuilt) == table_digest(built)
+    assert quietly(Parser, GRAMMAR, cache=cache).table_source == "cache"
+
+
+def test_lalr_and_lr1_parse_alike(sample_lines):
+    tokens = Lexer().scan(sample_lines)[0]
+    trees = [quietly(quietly(Parser, GRAMMAR, table_mode=mode).getParse, tokens).toDict() for mode in Parser.TABLE_MODES]
+    assert trees[0] == trees[1]
+
+
+def test_lalr_reports_conflict_added_to_conflicting_state(tmp_path):
+    """合并同心状态时，原状态已有规约-规约冲突、合并又加入了新的产生式，也要报告"""
+    path = tmp_path / "conflict.cfg"
+    path.write_text("Program -> let A if | mut B if | let B else | mut A else | let C if | mut C else\n"
+                    "A -> fn\nB -> fn\nC -> fn\n")
+    parser = quietly(Parser, str(path), table_mode="lalr1")
+    assert sorted(conflict["terminal"] for conflict in parser.lalr_conflicts) == ["else", "if"]
+    assert all(len(conflict["productions"]) == 3 for conflict in parser.lalr_conflicts)
+
+
+def test_tables_module_parses_like_parser(parser, sample_lines, tmp_path):
+    path = tmp_path / "generated_tables.py"
+    parser.write_tables_module(str(path))
+    spec = importlib.util.spec_from_file_location("generated_tables", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sample = Lexer().scan(sample_lines)[0]
+    broken = Lexer().scan(sample_lines[:-3])[0]
+    assert module.parse([token.terminal for token in sample]) == -1
+    assert module.parse([token.terminal for token in broken]) == len(broken) - 1
+    frozen = quietly(Parser, tables_module=module)
+    assert quietly(frozen.getParse, sample).toDict() == quietly(parser.getParse, sample).toDict()
+
+
+def canonical_run(parser, terminals):
+    """按原先的dict ACTION表分析终结符序列，返回(结果, 出错或接受时的token下标, 规约次数)"""
+    epsilon = parser.epsilon_id
+    length = [0 if p.to_ids == [epsilon] else len(p.to_ids) for p in parser.productions]
+    states = [0]
+    reductions = 0
+    for index, terminal in enumerate(terminals):
+        while True:
+            actions = parser.action_table[states[-1]].get(terminal)
+            if not actions:
+                return "error", index, reductions
+            kind, target = actions[0]
+            if kind == ACTION_S:
+                states.append(target)
+                break
+            if kind == ACTION_ACC:
+                return "accept", index, reductions
+            if length[target]:
+                del states[-length[target]:]
+            states.append(parser.packed.goto(states[-1], parser.productions[target].non_terminal_symbol_id))
+            reductions += 1
+    return "end", len(terminals), reductions
+
+
+def test_packed_tables_do_not_reduce_on_erroneous_lookahead(parser, sample_lines):
+    """压缩表的默认规约不能在出错的向前看符号上先做规约：分析步数与生成的模块的规约次数都与原表相同"""
+    tokens = list(Lexer().scan(sample_lines)[0])
+    rng = random.Random(2)
+    for _ in range(100):
+        mutated = list(tokens)
+        index = rng.randrange(len(mutated) - 1)
+        if rng.random() < 0.5:
+            del mutated[index]
+        else:
+            mutated.insert(index, rng.choice(tokens[:-1]))
+        result, position, reductions = canonical_run(parser, [token.terminal for token in mutated])
+        quietly(parser.getParse, mutated, trace=True)
+        if result == "error":
+            assert parser.parse_steps == position + 1 + reductions
+            assert len(parser.parse_process_display) == position + reductions + 2
+
+
+def test_tables_module_does_not_reduce_on_erroneous_lookahead(parser, sample_lines, tmp_path):
+    path = tmp_path / "generated_tables.py"
+    parser.write_tables_module(str(path))
+    spec = importlib.util.spec_from_file_location("generated_tables", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    terminals = [token.terminal for token in Lexer().scan(sample_lines)[0]]
+    rng = random.Random(3)
+    for _ in range(100):
+        mutated = list(terminals)
+        index = rng.randrange(len(mutated) - 1)
+        if rng.random() < 0.5:
+            del mutated[index]
+        else:
+            mutated.insert(index, rng.choice(terminals[:-1]))
+        result, position, reductions = canonical_run(parser, mutated)
+        reduced = []
+        got = module.parse(mutated, reduced.append)
+        assert (got == -1) == (result == "accept")
+        if result == "error":
+            assert (got, len(reduced)) == (position, reductions)
+
+
+@pytest.mark.parametrize("program", range(45))
+def test_parse_modes_agree(parser, sample_lines, program):
+    """semantic模式的语义分析结果与full相同；recognize模式接受同样的输入，出错时给出相同的错误"""
+    programs = [sample_lines] + [list(SourceGenerator(functions=6, seed=seed).iterLines()) for seed in range(4)]
+    programs += mutated_programs(40)
+    tokens = Lexer().scan(programs[program])[0]
+    full = quietly(parser.getParse, tokens, mode="full")
+    full_semantic = semantic_results(parser)
+    semantic = quietly(parser.getParse, tokens, mode="semantic")
+    assert semantic_results(parser) == full_semantic
+    recognize = quietly(parser.getParse, tokens, mode="recognize")
+    if full.get("root") == "Program":
+        assert semantic == recognize == {"root": "Program"}
+        assert not parser.semantic_error_occur
+    else:
+        assert semantic == recognize == full
+        assert semantic_results(parser) == full_semantic
+
+
+@pytest.mark.parametrize("mode", Parser.PARSE_MODES)
+def test_push_parser_matches_getParse(parser, mode, tmp_path):
+    """边读文件边扫描、逐个token交给PushParser，与扫描整个文件后getParse的结果相同"""
+    lines = list(SourceGenerator(functions=20, seed=0).iterLines())
+    path = tmp_path / "program.c"
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    tokens = Lexer().scan(lines)[0]
+    expected = quietly(parser.getParse, tokens, mode=mode)
+    expected_semantic = semantic_results(parser)
+    push = PushParser(parser, mode=mode)
+    with open(path, encoding="utf-8") as f:
+        for token in Lexer().iterLex(f):
+            if quietly(push.feed, token):
+                break
+    result = quietly(push.finish)
+    assert result == expected
+    assert semantic_results(parser) == expected_semantic
+
+
+def test_trace_rows_are_consistent(parser):
+    """按下标、切片与倒序下标取得的规约过程行相同，迭代器输入与序列输入的各步相同"""
+    tokens = Lexer().scan(list(SourceGenerator(functions=12, seed=3).iterLines()))[0]
+    quietly(parser.getParse, tokens, trace=True)
+    trace = parser.parse_process_display
+    rows = list(trace)
+    assert len(rows) == len(trace)
+    rng = random.Random(5)
+    for _ in range(20):
+        start = rng.randrange(len(rows) + 1)
+        stop = rng.randrange(start, len(rows) + 1)
+        assert trace[start:stop] == rows[start:stop]
+        if start < len(rows):
+            assert trace[start] == rows[start] and trace[-1 - start] == rows[-1 - start]
+    quietly(parser.getParse, iter(tokens), trace=True)
+    streamed = list(parser.parse_process_display)
+    assert [row[:3] + row[4:] for row in streamed] == [row[:3] + row[4:] for row in rows]
+
+
+def test_cst_matches_dict_format(parser, sample_lines):
+    """语法树arena的结点视图与toDict一致，结点的content为其覆盖的各token的content拼接"""
+    tokens = Lexer().scan(sample_lines)[0]
+    tree = quietly(parser.getParse, tokens)
+    expected = tree.toDict()
+
+    def view_to_dict(node):
+        converted = {"root": node["root"], "children": [view_to_dict(child) for child in node["children"]]}
+        if "content" in node:
+            converted["content"] = node["content"]
+        return converted
+
+    assert view_to_dict(tree) == expected
+    assert expected["content"] == "".join(token.content for token in list(tokens)[:-1] if token.content is not None)
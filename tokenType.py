@@ -143,3 +143,71 @@ def tokenType_to_terminal(tokenType: tokenType) -> str:
             return key
     # 如identifier、numeric_constant并非固定的terminal，直接返回对应的字符串名
     return tokenType.value
+
+
+# 语法分析器使用的终结符表，下标即终结符id（Parser.terminal_symbols）
+terminalSymbols = [
+    "i32",
+    "let",
+    "if",
+    "else",
+    "while",
+    "return",
+    "mut",
+    "fn",
+    "for",
+    "in",
+    "loop",
+    "break",
+    "continue",
+
+    "identifier",
+    "integer_constant",
+    "floating_point_constant",
+
+    "=",
+    "+",
+    "-",
+    "*",
+    "/",
+    "%",
+    "+=",
+    "-=",
+    "*=",
+    "/=",
+    "%=",
+
+    ">>",
+    ">>=",
+    "<<",
+    "<<=",
+
+    "==",
+    ">",
+    ">=",
+    "<",
+    "<=",
+    "!=",
+
+    "(",
+    ")",
+    "[",
+    "]",
+    "{",
+    "}",
+
+    ",",
+    ":",
+    ";",
+
+    "->",
+    ".",
+    "..",
+    "#",
+]
+
+# 预先算好的tokenType到终结符id的映射，不对应终结符的tokenType（注释、UNKNOWN）为-1
+tokenTerminalIds = {
+    t: terminalSymbols.index(tokenType_to_terminal(t)) if tokenType_to_terminal(t) in terminalSymbols else -1
+    for t in tokenType
+}